@@ -9,17 +9,17 @@ router = APIRouter(tags=["auth"])
 
 
 @router.post("/register", response_model=UserRead, status_code=201)
-def register(user_in: UserCreate, db: Session = Depends(get_db)) -> UserRead:
+async def register(user_in: UserCreate, db: Session = Depends(get_db)) -> UserRead:
     """Create a new user account and return the persisted record."""
     service = AuthService(db)
-    user = service.register_user(user_in)
+    user = await service.register_user(user_in)
     return UserRead.model_validate(user)
 
 
 @router.post("/login", response_model=Token)
-def login(credentials: UserLogin, db: Session = Depends(get_db)) -> Token:
+async def login(credentials: UserLogin, db: Session = Depends(get_db)) -> Token:
     """Authenticate the user and issue a JWT access token."""
     service = AuthService(db)
-    user = service.authenticate(credentials.email, credentials.password)
+    user = await service.authenticate(credentials.email, credentials.password)
     token = service.create_token(user)
     return Token(access_token=token)
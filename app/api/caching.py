@@ -0,0 +1,78 @@
+"""Helpers for HTTP conditional and range requests (ETag / Last-Modified / Range)."""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+
+def http_date(value: datetime) -> str:
+    """Format a datetime as an RFC 7231 HTTP date."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Weak comparison of an ``If-None-Match`` header against ``etag``."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == wanted for candidate in header.split(","))
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Return True when the client's cached copy is still current.
+
+    ``If-None-Match`` takes precedence over ``If-Modified-Since`` as required
+    by RFC 7232.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def parse_range(header: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    """Return the inclusive ``(start, end)`` byte range requested by ``header``.
+
+    Only single ``bytes`` ranges are honoured; a missing, malformed or
+    multi-range header yields ``None`` so the full body is sent, which RFC 7233
+    permits. Ranges starting past the end raise HTTP 416.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, separator, last = header[len("bytes=") :].strip().partition("-")
+    if not separator:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else max(start, length - 1)
+            if end < start:
+                return None
+        else:
+            suffix = int(last)
+            start, end = (max(0, length - suffix), length - 1) if suffix > 0 else (length, length)
+    except ValueError:
+        return None
+    if start >= length:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{length}"},
+        )
+    return start, min(end, length - 1)
@@ -1,4 +1,8 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
 from app.api.deps import get_authenticated_user, get_chat_service
 from app.models.user import User
@@ -15,13 +19,32 @@ async def pdf_chat(
     chat_service: ChatService = Depends(get_chat_service),
 ) -> ChatMessage:
     """Send a user prompt to Gemini using the text of the selected PDF."""
-    return await chat_service.chat(current_user, payload.message)
+    return await chat_service.chat(current_user, payload.message, payload.mode)
 
 
-@router.get("/chat-history", response_model=ChatHistoryResponse)
+@router.get("/chat-history", response_model=ChatHistoryResponse, response_class=ORJSONResponse)
 def chat_history(
     current_user: User = Depends(get_authenticated_user),
     chat_service: ChatService = Depends(get_chat_service),
-) -> ChatHistoryResponse:
+) -> ORJSONResponse:
     """Return the user's chat history across all PDF sessions."""
-    return chat_service.history(current_user)
+    # Returning a response directly skips FastAPI's response_model re-validation.
+    return ORJSONResponse(chat_service.history_payload(current_user))
+
+
+@router.get("/chat-history/export", response_class=StreamingResponse)
+def export_chat_history(
+    since: Optional[datetime] = Query(default=None, description="Only messages created at or after this time"),
+    until: Optional[datetime] = Query(default=None, description="Only messages created before this time"),
+    pdf_id: Optional[str] = Query(default=None, description="Only messages from sessions over this PDF"),
+    current_user: User = Depends(get_authenticated_user),
+    chat_service: ChatService = Depends(get_chat_service),
+) -> StreamingResponse:
+    """Stream the user's chat messages as newline-delimited JSON, oldest first."""
+    if since is not None and until is not None and since >= until:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'since' must be earlier than 'until'")
+    return StreamingResponse(
+        chat_service.export_ndjson(current_user, since=since, until=until, pdf_id=pdf_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="chat-history.ndjson"'},
+    )
@@ -1,15 +1,21 @@
-from typing import cast
+import asyncio
+from typing import List, Optional, cast
+from urllib.parse import quote
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Query, Request, Response, UploadFile
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
+from app.api.caching import etag_matches, http_date, is_not_modified, parse_range
 from app.api.deps import get_authenticated_user, get_pdf_service
 from app.db.postgres import get_db
 from app.models.user import User
-from app.schemas import PDFMetadata, PDFParseRequest, PDFSelectRequest
+from app.core.config import get_settings
+from app.schemas import BulkUploadResponse, PDFMetadata, PDFMultiSelectRequest, PDFParseRequest, PDFSelectRequest
 from app.services.pdf_service import PDFService
 
 router = APIRouter(tags=["pdf"])
+settings = get_settings()
 
 
 @router.post("/pdf-upload", response_model=PDFMetadata, status_code=201)
@@ -23,42 +29,180 @@ async def upload_pdf(
     return await pdf_service.upload_pdf(file, user_id)
 
 
-@router.get("/pdf-list", response_model=list[PDFMetadata])
+@router.post("/pdf-upload-bulk", response_model=BulkUploadResponse)
+async def upload_pdfs_bulk(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(..., description="PDF files and/or ZIP archives of PDFs"),
+    parse: bool = Query(default=False, description="Parse the stored PDFs in the background"),
+    current_user: User = Depends(get_authenticated_user),
+    pdf_service: PDFService = Depends(get_pdf_service),
+) -> BulkUploadResponse:
+    """Store many PDFs at once and report the outcome of each file.
+
+    ZIP archives are expanded server-side. Invalid files are reported as
+    ``rejected`` and do not fail the rest of the batch.
+    """
+    user_id = cast(int, current_user.id)
+    results = await pdf_service.bulk_upload(files, user_id)
+    stored = [result["pdf_id"] for result in results if result["status"] == "stored"]
+    if parse and stored:
+        background_tasks.add_task(pdf_service.parse_many, stored, user_id)
+    return BulkUploadResponse(
+        results=results,
+        stored=len(stored),
+        failed=len(results) - len(stored),
+        parse_scheduled=parse and bool(stored),
+    )
+
+
+@router.get("/pdf-list", response_model=list[PDFMetadata], response_class=ORJSONResponse)
 async def list_pdfs(
+    request: Request,
+    limit: Optional[int] = Query(default=None, ge=1, le=settings.pdf_list_max_page_size),
+    cursor: Optional[str] = Query(default=None, description="Value of X-Next-Cursor from the previous page"),
+    current_user: User = Depends(get_authenticated_user),
+    pdf_service: PDFService = Depends(get_pdf_service),
+) -> Response:
+    """Return a page of PDF records owned by the authenticated user, newest first.
+
+    The next page's cursor is returned in the ``X-Next-Cursor`` header. The
+    ``ETag``/``Last-Modified`` validators track the user's latest metadata
+    change, so polling clients get ``304 Not Modified`` without any
+    ``pdf_metadata`` documents being read.
+    """
+    user_id = cast(int, current_user.id)
+    page_size = limit or settings.pdf_list_page_size
+    state = await pdf_service.get_list_state(user_id)
+    etag = f'W/"{user_id}-{state["version"]}-{page_size}-{cursor or ""}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(state["updated_at"]),
+        "Cache-Control": "private, no-cache",
+    }
+    if is_not_modified(request, etag, state["updated_at"]):
+        return Response(status_code=304, headers=headers)
+
+    items, next_cursor = await pdf_service.list_pdf_page(user_id, page_size, cursor)
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    # Returning a response directly skips FastAPI's response_model re-validation.
+    return ORJSONResponse(items, headers=headers)
+
+
+@router.get("/pdf-download/{pdf_id}", response_class=StreamingResponse)
+async def download_pdf(
+    pdf_id: str,
+    request: Request,
     current_user: User = Depends(get_authenticated_user),
     pdf_service: PDFService = Depends(get_pdf_service),
-) -> list[PDFMetadata]:
-    """Return all PDF records owned by the authenticated user."""
+) -> Response:
+    """Stream a stored PDF back from GridFS, honouring ``Range`` and ``If-None-Match``.
+
+    GridFS files are immutable, so the file ID is a strong ETag. Only one
+    GridFS chunk is held in memory at a time.
+    """
     user_id = cast(int, current_user.id)
-    return await pdf_service.list_pdfs(user_id)
+    metadata, grid_out = await pdf_service.open_pdf_file(pdf_id, user_id)
+    length = grid_out.length
+    etag = f'"{pdf_id}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(metadata.upload_date),
+        "Cache-Control": "private, no-cache",
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"inline; filename*=UTF-8''{quote(metadata.filename)}",
+    }
+    if is_not_modified(request, etag, metadata.upload_date):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    # A stale If-Range means the client's partial copy is outdated: send everything.
+    if if_range is None or etag_matches(if_range, etag) and not if_range.startswith("W/"):
+        byte_range = parse_range(request.headers.get("range"), length)
+    start, end = byte_range or (0, length - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    status_code = 200
+    if byte_range is not None:
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    return StreamingResponse(
+        pdf_service.iter_file_range(grid_out, start, end),
+        status_code=status_code,
+        media_type="application/pdf",
+        headers=headers,
+    )
 
 
 @router.post("/pdf-select")
 async def select_pdf(
     payload: PDFSelectRequest,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_authenticated_user),
     pdf_service: PDFService = Depends(get_pdf_service),
     db: Session = Depends(get_db),
 ) -> dict[str, str]:
-    """Mark a PDF as the user's active document for subsequent chats."""
+    """Mark a PDF as the user's active document for subsequent chats.
+
+    The document's parsed text is loaded into the text cache after the
+    response is sent, so the first chat turn does not pay for it.
+    """
     user_id = cast(int, current_user.id)
     await pdf_service.ensure_pdf_owned_by_user(payload.pdf_id, user_id)
+    await pdf_service.mark_selected([payload.pdf_id], user_id)
     user_record = db.get(User, user_id)
     if user_record is None:
         raise HTTPException(status_code=404, detail="User not found")
     setattr(user_record, "selected_pdf_id", payload.pdf_id)
+    setattr(user_record, "selected_pdf_ids", None)
     db.commit()
     db.refresh(user_record)
+    if settings.pdf_select_warm_enabled:
+        background_tasks.add_task(pdf_service.warm_documents, [payload.pdf_id], user_id)
     return {"message": "PDF selected", "pdf_id": payload.pdf_id}
 
 
+@router.post("/pdf-select-multiple")
+async def select_pdfs(
+    payload: PDFMultiSelectRequest,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_authenticated_user),
+    pdf_service: PDFService = Depends(get_pdf_service),
+    db: Session = Depends(get_db),
+) -> dict[str, str | list[str]]:
+    """Mark a set of PDFs as the user's active documents for subsequent chats."""
+    user_id = cast(int, current_user.id)
+    pdf_ids = list(dict.fromkeys(payload.pdf_ids))
+    if len(pdf_ids) > settings.max_selected_pdfs:
+        raise HTTPException(status_code=400, detail=f"At most {settings.max_selected_pdfs} PDFs can be selected")
+    await asyncio.gather(*(pdf_service.ensure_pdf_owned_by_user(pdf_id, user_id) for pdf_id in pdf_ids))
+    await pdf_service.mark_selected(pdf_ids, user_id)
+    user_record = db.get(User, user_id)
+    if user_record is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    setattr(user_record, "selected_pdf_id", pdf_ids[0])
+    setattr(user_record, "selected_pdf_ids", pdf_ids if len(pdf_ids) > 1 else None)
+    db.commit()
+    db.refresh(user_record)
+    if settings.pdf_select_warm_enabled:
+        background_tasks.add_task(pdf_service.warm_documents, pdf_ids, user_id)
+    return {"message": "PDFs selected", "pdf_ids": pdf_ids}
+
+
 @router.post("/pdf-parse")
 async def parse_pdf(
     payload: PDFParseRequest,
     current_user: User = Depends(get_authenticated_user),
     pdf_service: PDFService = Depends(get_pdf_service),
 ) -> dict[str, int | str | bool]:
-    """Trigger parsing for the selected PDF and report its text length."""
+    """Trigger parsing for the selected PDF and report its text length and normalization savings."""
     user_id = cast(int, current_user.id)
-    text = await pdf_service.parse_pdf(payload.pdf_id, user_id)
-    return {"pdf_id": payload.pdf_id, "parsed": True, "text_length": len(text)}
+    document = await pdf_service.parse_pdf(payload.pdf_id, user_id)
+    stats = document.normalization
+    return {
+        "pdf_id": payload.pdf_id,
+        "parsed": True,
+        "text_length": len(document.text),
+        "bytes_saved": stats.bytes_saved if stats else 0,
+        "tokens_saved": stats.tokens_saved if stats else 0,
+    }
@@ -0,0 +1,173 @@
+"""Concurrency helpers shared across services."""
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, List, Optional, TypeVar
+
+from fastapi import HTTPException, status
+
+from app.core.metrics import metrics
+
+T = TypeVar("T")
+
+
+async def gather_or_cancel(awaitables: Iterable[Awaitable[T]]) -> List[T]:
+    """Like ``asyncio.gather``, but cancel the remaining jobs as soon as one fails.
+
+    Plain ``gather`` leaves the siblings of a failed job running (and still
+    spending LLM quota) after the exception has reached the caller.
+    """
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+class BoundedExecutor:
+    """Dedicated thread pool with admission control.
+
+    At most ``max_workers`` jobs run at once and at most ``max_pending`` jobs
+    may be running or queued; further submissions fail fast with HTTP 503 so
+    a burst cannot pile up unbounded work or starve other thread pools. A job
+    counts against ``max_pending`` until its thread returns, even when the
+    caller timed out or was cancelled, because the thread cannot be stopped.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int) -> None:
+        self.name = name
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, func: Callable[..., T], *args: object, timeout: Optional[float] = None) -> T:
+        """Run ``func(*args)`` in the pool.
+
+        ``timeout`` bounds the time spent running, not waiting in the queue;
+        on expiry ``asyncio.TimeoutError`` is raised and the result is
+        discarded when the thread eventually returns.
+        """
+        if self._pending >= self.max_pending:
+            metrics.inc("executor_rejected_total", executor=self.name)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, retry later",
+                headers={"Retry-After": "1"},
+            )
+        loop = asyncio.get_running_loop()
+        started = loop.create_future()
+
+        def call() -> T:
+            loop.call_soon_threadsafe(_resolve, started)
+            return func(*args)
+
+        def finished(_: "Future[T]") -> None:
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:  # pragma: no cover - the loop is already closed
+                pass
+
+        self._pending += 1
+        metrics.set_gauge("executor_pending", self._pending, executor=self.name)
+        job = self._executor.submit(call)
+        job.add_done_callback(finished)
+        result = asyncio.wrap_future(job, loop=loop)
+        try:
+            if timeout is None:
+                return await result
+            await asyncio.wait({started, result}, return_when=asyncio.FIRST_COMPLETED)
+            return await asyncio.wait_for(asyncio.shield(result), timeout)
+        except BaseException:
+            # Drops a job still in the queue; a running one keeps its slot until it returns.
+            job.cancel()
+            result.add_done_callback(_discard)
+            raise
+
+    def _release(self) -> None:
+        self._pending -= 1
+        metrics.set_gauge("executor_pending", self._pending, executor=self.name)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _resolve(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _discard(future: "asyncio.Future[Any]") -> None:
+    # Retrieve the outcome of an abandoned job so asyncio does not log it as unhandled.
+    if not future.cancelled():
+        future.exception()
+
+
+class ByteBudget:
+    """Process-wide cap on bytes held by in-flight work, such as upload bodies.
+
+    ``reserve`` waits up to ``wait_timeout`` seconds for room and then fails
+    with HTTP 503 and ``Retry-After``. A reservation larger than the whole
+    budget is clamped to ``capacity`` so it can still run, alone. The share is
+    returned when the block exits, including on errors and cancellation.
+    """
+
+    def __init__(self, name: str, capacity: int, wait_timeout: float) -> None:
+        self.name = name
+        self.capacity = capacity
+        self.wait_timeout = wait_timeout
+        self._in_use = 0
+        self._waiters: List[asyncio.Future[None]] = []
+        metrics.set_gauge("byte_budget_capacity_bytes", capacity, budget=name)
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int) -> AsyncIterator[int]:
+        nbytes = min(max(nbytes, 0), self.capacity)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._acquire(nbytes), timeout=self.wait_timeout)
+        except asyncio.TimeoutError:
+            metrics.inc("byte_budget_rejected_total", budget=self.name)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, retry later",
+                headers={"Retry-After": str(max(1, round(self.wait_timeout)))},
+            )
+        metrics.observe("byte_budget_wait_seconds", time.perf_counter() - started, budget=self.name)
+        try:
+            yield nbytes
+        finally:
+            self._release(nbytes)
+
+    async def _acquire(self, nbytes: int) -> None:
+        while self._in_use + nbytes > self.capacity:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                self._waiters.remove(waiter)
+        self._in_use += nbytes
+        metrics.set_gauge("byte_budget_in_use_bytes", self._in_use, budget=self.name)
+
+    def _release(self, nbytes: int) -> None:
+        # Synchronous on purpose: a cancelled task must not skip the release
+        # while waiting for a lock.
+        self._in_use -= nbytes
+        metrics.set_gauge("byte_budget_in_use_bytes", self._in_use, budget=self.name)
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
@@ -1,9 +1,13 @@
 from functools import lru_cache
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+# Chat sessions are keyed by the sorted, comma-joined ObjectIds of the selected
+# PDFs, stored in ChatSession.pdf_id (String(255)).
+OBJECT_ID_LENGTH = 24
+SESSION_KEY_MAX_LENGTH = 255
 
 class Settings(BaseSettings):
     """Application configuration sourced from environment variables."""
@@ -13,11 +17,19 @@ class Settings(BaseSettings):
     version: str = "0.1.0"
     debug: bool = False
     log_level: str = "INFO"
+    log_json: bool = Field(default=False, description="Emit JSON logs written from a background thread")
+    log_sample_rate: float = Field(
+        default=100.0,
+        description="Max DEBUG/INFO records per second per logger and route (0 disables sampling)",
+    )
 
     # Security & auth
     secret_key: str = "change-me"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    bcrypt_rounds: int = Field(default=12, ge=4, le=31, description="bcrypt cost factor for new hashes")
+    password_hash_workers: int = Field(default=2, description="Threads dedicated to bcrypt")
+    password_hash_max_pending: int = Field(default=32, description="Running plus queued bcrypt jobs before 503")
 
     # Database configuration
     postgres_url: str = Field(
@@ -34,9 +46,114 @@ class Settings(BaseSettings):
         description="Default Google Gemini model identifier",
     )
 
+    # LLM scheduling
+    llm_max_concurrency: int = Field(default=4, description="Max in-flight LLM calls per process")
+    llm_max_queue_depth: int = Field(default=64, description="Queued LLM calls before rejecting with 429")
+    llm_requests_per_minute: float = Field(default=60, description="LLM request rate limit")
+    llm_tokens_per_minute: float = Field(default=1_000_000, description="Estimated prompt token rate limit")
+    llm_user_weights: Dict[str, float] = Field(
+        default_factory=dict,
+        description="Fair-queuing weights keyed by user id; unspecified users weigh 1.0",
+    )
+    llm_queue_timeout_seconds: float = Field(default=30.0, description="Max time a request waits for an LLM slot")
+
+    # Chat context
+    max_selected_pdfs: int = Field(default=10, description="Max PDFs a user can chat over at once")
+    chat_context_max_chars: int = Field(default=400_000, description="Cap for merged document context per prompt")
+
+    # Map-reduce answering for documents larger than one prompt
+    chat_map_group_chars: int = Field(default=100_000, description="Max characters of chunks per map prompt")
+    chat_map_concurrency: int = Field(default=4, description="Concurrent map/reduce calls per chat request")
+    chat_map_cache_entries: int = Field(default=1024, description="Cached map-stage answers per process")
+
+    # Conversation memory
+    chat_memory_turns: int = Field(default=4, description="Recent turns included verbatim in prompts")
+    chat_memory_summary_batch_turns: int = Field(default=4, description="Turns folded into the summary at once")
+    chat_memory_max_message_chars: int = Field(default=1000, description="Per-message cap in the verbatim window")
+    chat_memory_summary_max_chars: int = Field(default=2000, description="Cap for the rolling session summary")
+
+    # Shared parsed-text cache (memory-mapped files shared by all workers on a host)
+    text_cache_enabled: bool = True
+    text_cache_dir: Optional[str] = Field(
+        default=None, description="Private (0700) directory; defaults to <tmp>/chat-docs-text-cache-<uid>"
+    )
+    text_cache_max_bytes: int = Field(default=1024 * 1024 * 1024, description="LRU budget for cached files")
+    pdf_metadata_cache_entries: int = Field(default=4096, description="Cached pdf_metadata documents per process (0 disables)")
+    pdf_metadata_cache_ttl_seconds: float = Field(default=30.0, description="Max age of a cached metadata document")
+    pdf_select_warm_enabled: bool = Field(default=True, description="Load selected PDFs into the cache after /pdf-select")
+
+    # PDF text extraction
+    pdf_extraction_backends: List[str] = Field(
+        default_factory=lambda: ["pypdfium2", "pdfminer", "pypdf2"],
+        description="Backends tried in order; missing optional ones are skipped",
+    )
+    pdf_extraction_timeout_seconds: float = Field(default=60.0, description="Time box per backend attempt")
+    pdf_extraction_min_quality: float = Field(default=0.5, description="Output score (0-1) accepted without fallback")
+    pdf_extraction_min_chars_per_page: int = Field(default=100, description="Pages with less text score lower")
+    pdf_spool_dir: Optional[str] = Field(default=None, description="Temp dir for PDFs being parsed (system default)")
+    pdf_extraction_workers: int = Field(default=2, description="Threads dedicated to PDF text extraction")
+    pdf_extraction_max_pending: int = Field(default=16, description="Running plus queued extractions before 503")
+
+    # Text normalization at parse time
+    pdf_normalize_text: bool = Field(default=True, description="Strip repeated headers/footers and page numbers")
+    pdf_keep_raw_text: bool = Field(default=False, description="Also store the unnormalized text as raw_text")
+    pdf_boilerplate_min_pages: int = Field(default=3, description="Min pages a line must repeat on to be stripped")
+    pdf_boilerplate_page_ratio: float = Field(default=0.5, description="Min share of pages a line must repeat on")
+
+    # PDF listing
+    pdf_list_page_size: int = Field(default=100, description="Default /pdf-list page size")
+    pdf_list_max_page_size: int = Field(default=500, description="Largest page size a client may request")
+    pdf_list_batch_size: int = Field(default=100, description="Motor cursor batch size for /pdf-list")
+
     # File upload constraints
     max_file_size: int = Field(default=10 * 1024 * 1024, description="Max upload size in bytes")
     allowed_file_types: List[str] = Field(default_factory=lambda: ["application/pdf"])
+    upload_memory_budget_bytes: int = Field(
+        default=256 * 1024 * 1024, description="Bytes of upload data held in memory across all requests"
+    )
+    upload_budget_wait_seconds: float = Field(
+        default=5.0, description="How long an upload waits for budget before returning 503"
+    )
+    bulk_upload_max_files: int = Field(default=500, description="Max PDFs (including ZIP entries) per bulk upload")
+    bulk_upload_concurrency: int = Field(default=4, description="Concurrent GridFS writes per bulk upload")
+
+    # Tracing: "none", "console", "file" or "module:Class" for a custom SpanExporter
+    tracing_exporter: str = Field(default="none", description="Where finished spans are sent")
+    tracing_file: str = Field(default="traces.jsonl", description="Output path for the file exporter")
+    tracing_sample_rate: float = Field(default=1.0, description="Fraction of new traces recorded")
+
+    # Event-loop lag monitor (logs and counts code that blocks the loop)
+    loop_monitor_enabled: bool = False
+    loop_monitor_threshold_seconds: float = Field(default=0.1, description="Loop stall reported as blocking")
+    loop_monitor_interval_seconds: float = Field(default=0.05, description="Heartbeat period for lag sampling")
+    loop_monitor_stack_limit: int = Field(default=20, description="Innermost frames kept from a blocking stack")
+
+    # Write-behind persistence of chat messages (answers return before the insert)
+    chat_write_behind_enabled: bool = False
+    chat_write_behind_flush_seconds: float = Field(default=0.2, description="Max delay before buffered rows are written")
+    chat_write_behind_max_batch: int = Field(default=500, description="Rows per multi-row INSERT")
+    chat_write_behind_max_pending: int = Field(default=5000, description="Buffered rows before writers wait")
+    chat_write_behind_max_retries: int = Field(
+        default=5, description="Failed flushes before a batch is inserted row by row and rejected rows are dropped"
+    )
+    chat_write_behind_flush_on_shutdown: bool = Field(default=True, description="Drain the buffer on shutdown")
+
+    # Chat history export
+    chat_export_batch_size: int = Field(default=500, description="Rows fetched per server-side cursor batch")
+
+    # Retention and compaction (0 disables the corresponding policy)
+    retention_chat_days: int = Field(default=0, description="Delete chat messages older than this many days")
+    retention_archive_dir: Optional[str] = Field(default=None, description="Archive purged messages here first")
+    retention_text_idle_days: int = Field(default=0, description="Drop parsed text not selected for this many days")
+    retention_orphan_grace_minutes: int = Field(default=60, description="Min age of GridFS files before GC")
+    retention_batch_size: int = Field(default=1000, description="Rows or documents handled per retention batch")
+    retention_interval_minutes: int = Field(default=0, description="Run retention in-process on this interval")
+
+    # Responses at least this large are gzip-compressed when the client accepts it
+    gzip_minimum_size: int = Field(default=1024, description="Minimum response size in bytes to compress")
+    gzip_compress_level: int = Field(
+        default=5, ge=1, le=9, description="zlib level; 9 costs several times the CPU for a few percent smaller bodies"
+    )
 
     # CORS configuration
     allowed_origins: List[str] = Field(default_factory=lambda: ["*"])
@@ -50,6 +167,20 @@ class Settings(BaseSettings):
             return [item.strip() for item in value.split(",") if item.strip()]
         return value
 
+    @field_validator("max_selected_pdfs")
+    @classmethod
+    def check_max_selected_pdfs(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("max_selected_pdfs must be at least 1")
+        key_length = value * (OBJECT_ID_LENGTH + 1) - 1
+        if key_length > SESSION_KEY_MAX_LENGTH:
+            limit = (SESSION_KEY_MAX_LENGTH + 1) // (OBJECT_ID_LENGTH + 1)
+            raise ValueError(
+                f"max_selected_pdfs={value} builds {key_length}-character chat session keys; "
+                f"the column holds {SESSION_KEY_MAX_LENGTH} (at most {limit} PDFs)"
+            )
+        return value
+
     @field_validator("allowed_origins", mode="before")
     @classmethod
     def parse_allowed_origins(cls, value: str | List[str]) -> List[str]:
@@ -1,10 +1,22 @@
 from __future__ import annotations
 
+import json
 import logging
+import queue
 import sys
-from typing import Optional
+import threading
+import time
+from typing import Any, Dict, Optional, TextIO, Tuple
+from uuid import uuid4
 
 from loguru import logger
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import metrics
+from app.core.tracing import route_template
+
+REQUEST_ID_HEADER = "X-Request-ID"
 
 
 class InterceptHandler(logging.Handler):
@@ -24,22 +36,192 @@ class InterceptHandler(logging.Handler):
         logger.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
 
 
-def configure_logging(level: Optional[str] = None) -> None:
-    """Configure application-wide logging."""
+class RateSampler:
+    """Loguru filter that caps DEBUG/INFO records per logger and route.
+
+    Each ``(logger name, route)`` pair gets a token bucket refilled at
+    ``rate`` records per second; records beyond it are dropped and counted.
+    Warnings and errors always pass.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self._buckets: Dict[Tuple[str, str], list[float]] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record: Dict[str, Any]) -> bool:
+        if self.rate <= 0 or record["level"].no >= logging.WARNING:
+            return True
+        key = (record["name"] or "", record["extra"].get("route", "-"))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                allowed = False
+            else:
+                bucket[0] = tokens - 1
+                allowed = True
+        if not allowed:
+            metrics.inc("log_records_sampled_out_total", logger=key[0], route=key[1])
+        return allowed
+
+
+class QueuedJsonSink:
+    """Loguru sink that hands records to a background thread for JSON encoding.
+
+    The calling thread only enqueues the already-built message; serialisation
+    and the write to ``stream`` happen on a daemon writer thread. When the
+    bounded queue is full, records are dropped and counted rather than
+    blocking the event loop.
+    """
+
+    def __init__(self, stream: TextIO, max_queue: int = 10_000) -> None:
+        self.stream = stream
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def __call__(self, message: Any) -> None:
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            metrics.inc("log_records_dropped_total")
+
+    def _run(self) -> None:
+        while True:
+            message = self._queue.get()
+            try:
+                if message is None:
+                    return
+                self.stream.write(self._encode(message))
+                if self._queue.empty():
+                    self.stream.flush()
+            except Exception:  # pragma: no cover - never let the writer thread die
+                pass
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _encode(message: Any) -> str:
+        record = message.record
+        payload: Dict[str, Any] = {
+            "time": record["time"].isoformat(),
+            "level": record["level"].name,
+            "logger": record["name"],
+            "function": record["function"],
+            "line": record["line"],
+            "message": record["message"],
+        }
+        payload.update(record["extra"])
+        if record["exception"] is not None:
+            # The formatted message carries the rendered traceback after the text.
+            payload["exception"] = str(message)[len(record["message"]) :].strip()
+        return json.dumps(payload, default=str) + "\n"
+
+    def flush(self) -> None:
+        """Block until every queued record has been written."""
+        self._queue.join()
+        self.stream.flush()
+
+    def stop(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+
+_json_sink: Optional[QueuedJsonSink] = None
+
+
+def configure_logging(
+    level: Optional[str] = None,
+    json_logs: bool = False,
+    sample_rate: float = 0.0,
+    sink: Optional[TextIO] = None,
+) -> None:
+    """Configure application-wide logging.
+
+    ``json_logs`` switches to structured output that is queued and written on
+    a background thread, so the event loop never blocks on stdout.
+    ``sample_rate`` caps DEBUG/INFO records per logger and route per second
+    (0 disables sampling).
+    """
+
+    global _json_sink
+
+    level = level or "INFO"
+    stream = sink or sys.stdout
+    log_filter = RateSampler(sample_rate) if sample_rate > 0 else None
 
     logger.remove()
-    logger.add(
-        sys.stdout,
-        colorize=True,
-        backtrace=False,
-        diagnose=False,
-        format=(
-            "<green>{time:YYYY-MM-DD HH:mm:ss}</green> "
-            "| <level>{level:<8}</level> "
-            "| <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> "
-            "- <level>{message}</level>"
-        ),
-        level=level or "INFO",
-    )
-
-    logging.basicConfig(handlers=[InterceptHandler()], level=0, force=True)
+    if _json_sink is not None:
+        _json_sink.stop()
+        _json_sink = None
+    logger.configure(extra={"request_id": "-", "route": "-"})
+    if json_logs:
+        _json_sink = QueuedJsonSink(stream)
+        logger.add(
+            _json_sink,
+            backtrace=False,
+            diagnose=False,
+            format="{message}",
+            filter=log_filter,
+            level=level,
+        )
+    else:
+        logger.add(
+            stream,
+            colorize=sink is None,
+            backtrace=False,
+            diagnose=False,
+            format=(
+                "<green>{time:YYYY-MM-DD HH:mm:ss}</green> "
+                "| <level>{level:<8}</level> "
+                "| <magenta>{extra[request_id]}</magenta> "
+                "| <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> "
+                "- <level>{message}</level>"
+            ),
+            filter=log_filter,
+            level=level,
+        )
+
+    # Drop stdlib records below the configured level before they reach the
+    # frame-walking InterceptHandler.
+    logging.basicConfig(handlers=[InterceptHandler()], level=logging.getLevelName(level), force=True)
+
+
+class RequestContextMiddleware:
+    """Tags every log record of a request with its request ID and route template.
+
+    The template (``/pdf-download/{pdf_id}``) rather than the raw path keeps
+    the sampler's per-route buckets bounded. The ID is echoed in the
+    ``X-Request-ID`` response header.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = Headers(scope=scope).get(REQUEST_ID_HEADER) or uuid4().hex
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        with logger.contextualize(request_id=request_id, route=route_template(scope)):
+            await self.app(scope, receive, send_with_request_id)
+
+
+def flush_logging() -> None:
+    """Wait until queued log records have been written."""
+
+    if _json_sink is not None:
+        _json_sink.flush()
@@ -0,0 +1,194 @@
+"""Event-loop lag monitoring and blocking-call detection."""
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+from loguru import logger
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.core.tracing import route_template
+
+settings = get_settings()
+
+
+@dataclass
+class LoopBlock:
+    """One episode of the event loop being blocked past the threshold."""
+
+    route: str
+    seconds: float
+    stack: str
+
+
+class LoopMonitor:
+    """Measures event-loop lag and reports code that blocks the loop.
+
+    A heartbeat task sleeps for ``interval`` seconds and records how late it
+    wakes up. A watchdog thread notices when the heartbeat is overdue by more
+    than ``threshold`` and, while the loop is still stuck, captures the loop
+    thread's stack and the route of the request being served. The cost is
+    one timer per ``interval`` on the loop plus a sleeping thread, so it is
+    safe to leave on in production.
+    """
+
+    def __init__(self, threshold: float, interval: float = 0.05, stack_limit: int = 20, history: int = 100) -> None:
+        self.threshold = threshold
+        self.interval = interval
+        self.stack_limit = stack_limit
+        self.violations: Deque[LoopBlock] = deque(maxlen=history)
+        self._scopes: Dict[asyncio.Task[Any], Scope] = {}
+        self._lock = threading.Lock()
+        self._current: Optional[LoopBlock] = None
+        self._beat = time.perf_counter()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread = 0
+        self._heartbeat: Optional[asyncio.Task[None]] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        if self._heartbeat is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._stopped.clear()
+        self._heartbeat = asyncio.create_task(self._run_heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self.violations.clear()
+
+    def assert_no_blocking(self) -> None:
+        """Fail with the offending stacks if the loop was blocked; meant for tests."""
+        with self._lock:
+            blocks: List[LoopBlock] = list(self.violations)
+        if blocks:
+            details = "\n".join(
+                f"--- blocked {block.seconds * 1000:.0f} ms in route {block.route}\n{block.stack}" for block in blocks
+            )
+            raise AssertionError(f"Event loop was blocked {len(blocks)} time(s):\n{details}")
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[LoopMonitor]:
+        """Monitor the enclosed block and fail if it blocked the loop; for tests and CI."""
+        self.reset()
+        self.start()
+        try:
+            yield self
+            # Let the heartbeat observe the end of a block that just finished.
+            await asyncio.sleep(self.interval * 2)
+        finally:
+            await self.stop()
+        self.assert_no_blocking()
+
+    def bind(self, task: asyncio.Task[Any], scope: Scope) -> None:
+        self._scopes[task] = scope
+
+    def unbind(self, task: asyncio.Task[Any]) -> None:
+        self._scopes.pop(task, None)
+
+    async def _run_heartbeat(self) -> None:
+        # ``_beat`` is first set by start(), so a stall before this task's first
+        # step is measured too.
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - self._beat - self.interval)
+            self._beat = now
+            metrics.observe("event_loop_lag_seconds", lag)
+            metrics.set_gauge("event_loop_lag_seconds_last", lag)
+            with self._lock:
+                block, self._current = self._current, None
+            if block is not None:
+                block.seconds = lag
+                metrics.observe("event_loop_blocked_seconds", lag, route=block.route)
+                logger.warning("Event loop unblocked after {:.0f} ms route={}", lag * 1000, block.route)
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval / 2):
+            stalled = time.perf_counter() - self._beat - self.interval
+            if stalled < self.threshold or self._current is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame, limit=self.stack_limit)) if frame is not None else ""
+            block = LoopBlock(route=self._current_route(), seconds=stalled, stack=stack)
+            with self._lock:
+                if self._heartbeat is None or self._stopped.is_set():
+                    return
+                self._current = block
+                self.violations.append(block)
+            metrics.inc("event_loop_blocked_total", route=block.route)
+            logger.warning(
+                "Event loop blocked for over {:.0f} ms route={}\n{}", stalled * 1000, block.route, block.stack
+            )
+
+    def _current_route(self) -> str:
+        task = asyncio.current_task(self._loop) if self._loop is not None else None
+        scope = self._scopes.get(task) if task is not None else None
+        if scope is None:
+            return "-"
+        return route_template(scope)
+
+
+class LoopMonitorMiddleware:
+    """Records which request each task is serving so blocking can be attributed to a route.
+
+    Add it innermost (before any ``BaseHTTPMiddleware``), because those run
+    the rest of the stack in a separate task.
+    """
+
+    def __init__(self, app: ASGIApp, monitor: LoopMonitor) -> None:
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        task = asyncio.current_task()
+        if scope["type"] != "http" or task is None:
+            await self.app(scope, receive, send)
+            return
+        self.monitor.bind(task, scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.unbind(task)
+
+
+_loop_monitor: Optional[LoopMonitor] = None
+
+
+def get_loop_monitor() -> Optional[LoopMonitor]:
+    """Return the process-wide loop monitor, or None when disabled."""
+    global _loop_monitor
+    if _loop_monitor is None and settings.loop_monitor_enabled:
+        _loop_monitor = LoopMonitor(
+            threshold=settings.loop_monitor_threshold_seconds,
+            interval=settings.loop_monitor_interval_seconds,
+            stack_limit=settings.loop_monitor_stack_limit,
+        )
+    return _loop_monitor
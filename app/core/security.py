@@ -9,13 +9,22 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 
+from app.core.concurrency import BoundedExecutor
 from app.core.config import get_settings
+from app.core.tracing import current_span, traced
 from app.db.postgres import get_db
 from app.models.user import User
 
 settings = get_settings()
 security = HTTPBearer()
 
+# bcrypt is deliberately slow; keep it off Starlette's shared threadpool.
+password_executor = BoundedExecutor(
+    "bcrypt",
+    max_workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+)
+
 
 def _ensure_password_length(password: str) -> bytes:
     password_bytes = password.encode("utf-8")
@@ -33,10 +42,27 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     password_bytes = _ensure_password_length(password)
-    hashed = bcrypt.hashpw(password_bytes, bcrypt.gensalt())
+    hashed = bcrypt.hashpw(password_bytes, bcrypt.gensalt(rounds=settings.bcrypt_rounds))
     return hashed.decode("utf-8")
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Return True when the hash was produced with a different bcrypt cost factor."""
+    try:
+        return int(hashed_password.split("$")[2]) != settings.bcrypt_rounds
+    except (IndexError, ValueError):
+        return False
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_executor.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    _ensure_password_length(password)
+    return await password_executor.run(get_password_hash, password)
+
+
 def create_access_token(data: dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     token_data: dict[str, Any] = data.copy()
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=settings.access_token_expire_minutes))
@@ -52,6 +78,7 @@ def decode_token(token: str) -> dict[str, str]:
     return payload
 
 
+@traced("auth.current_user")
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db),
@@ -64,4 +91,5 @@ def get_current_user(
     user = db.query(User).filter(User.email == email).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    current_span().set_attribute("user_id", user.id)
     return user
@@ -0,0 +1,341 @@
+"""Request tracing with nested spans and pluggable exporters.
+
+Spans nest through a context variable, so they follow ``await`` chains,
+``asyncio.gather`` children and ``asyncio.to_thread`` calls. Finished spans
+go to the configured exporter: ``console`` (log lines), ``file`` (JSON lines)
+or any ``module:Class`` implementing ``SpanExporter``, for example an adapter
+to an OpenTelemetry collector. With no exporter configured, spans are
+no-ops.
+"""
+from __future__ import annotations
+
+import functools
+import importlib
+import inspect
+import os
+import queue
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, ContextManager, Dict, Iterator, Optional, TypeVar, cast
+
+import orjson
+from loguru import logger
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+settings = get_settings()
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Route label of requests no route matches, so scanners probing random URLs
+# cannot create unbounded span names, log-sampler buckets or metric labels.
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    start_time: float = field(default_factory=time.time)
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    duration: Optional[float] = None
+    status: str = "ok"
+    error: Optional[str] = None
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+
+    @property
+    def recording(self) -> bool:
+        return True
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NonRecordingSpan(Span):
+    """Stands in when tracing is off or the trace was not sampled; drops everything."""
+
+    @property
+    def recording(self) -> bool:
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+
+NON_RECORDING_SPAN = _NonRecordingSpan(name="", trace_id="0" * 32, span_id="0" * 16)
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class SpanExporter(ABC):
+    """Receives every finished span. Implementations must be thread-safe."""
+
+    @abstractmethod
+    def export(self, span: Span) -> None:
+        """Handle one finished span; called on the thread that ended it."""
+
+    def shutdown(self) -> None:
+        pass
+
+
+class ConsoleSpanExporter(SpanExporter):
+    def export(self, span: Span) -> None:
+        attributes = " ".join(f"{key}={value}" for key, value in span.attributes.items())
+        logger.info(
+            "span name={} trace_id={} span_id={} parent_id={} duration_ms={:.2f} status={} {}",
+            span.name,
+            span.trace_id,
+            span.span_id,
+            span.parent_id or "-",
+            (span.duration or 0.0) * 1000,
+            span.status,
+            attributes,
+        )
+
+
+class FileSpanExporter(SpanExporter):
+    """Appends one JSON object per finished span to ``path``.
+
+    ``export`` only enqueues the span; encoding and file writes happen on a
+    daemon writer thread, which flushes whenever the queue runs empty. When
+    the bounded queue is full, spans are dropped and counted rather than
+    blocking the caller.
+    """
+
+    def __init__(self, path: str, max_queue: int = 10_000) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._handle = open(path, "ab")
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name="span-writer", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            metrics.inc("trace_spans_dropped_total")
+
+    def _run(self) -> None:
+        while True:
+            span = self._queue.get()
+            if span is None:
+                return
+            try:
+                self._handle.write(orjson.dumps(span.as_dict(), default=str) + b"\n")
+                if self._queue.empty():
+                    self._handle.flush()
+            except Exception:  # pragma: no cover - never let the writer thread die
+                pass
+
+    def shutdown(self) -> None:
+        """Write every queued span, then close the file."""
+        self._queue.put(None)
+        self._thread.join()
+        self._handle.close()
+
+
+class Tracer:
+    def __init__(self, exporter: Optional[SpanExporter] = None, sample_rate: float = 1.0) -> None:
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def start_span(
+        self,
+        name: str,
+        trace_id: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        **attributes: Any,
+    ) -> Span:
+        """Create a child of the current span without making it current.
+
+        ``trace_id``/``parent_id`` continue a trace started elsewhere, such as
+        an incoming ``traceparent`` header.
+        """
+        parent = _current_span.get()
+        if self.exporter is None or parent is NON_RECORDING_SPAN:
+            return NON_RECORDING_SPAN
+        if parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        elif trace_id is None:
+            if random.random() >= self.sample_rate:
+                return NON_RECORDING_SPAN
+            trace_id = os.urandom(16).hex()
+        return Span(name=name, trace_id=trace_id, span_id=os.urandom(8).hex(), parent_id=parent_id, attributes=attributes)
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None) -> None:
+        if not span.recording or self.exporter is None:
+            return
+        span.duration = time.perf_counter() - span._started
+        if error is not None:
+            span.status = "error"
+            span.error = f"{type(error).__name__}: {error}"
+        try:
+            self.exporter.export(span)
+        except Exception as exc:  # pragma: no cover - never let tracing break a request
+            logger.warning("Span export failed name={} error={}", span.name, exc)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Run the block inside a new span that nests under the current one."""
+        current = self.start_span(name, **attributes)
+        token = _current_span.set(current)
+        try:
+            yield current
+        except BaseException as exc:
+            self.end_span(current, exc)
+            raise
+        else:
+            self.end_span(current)
+        finally:
+            _current_span.reset(token)
+
+    def shutdown(self) -> None:
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+def build_exporter(name: str, path: str) -> Optional[SpanExporter]:
+    """Return the exporter selected by ``TRACING_EXPORTER``."""
+    if name in ("", "none"):
+        return None
+    if name == "console":
+        return ConsoleSpanExporter()
+    if name == "file":
+        return FileSpanExporter(path)
+    module_name, _, class_name = name.partition(":")
+    exporter_class = getattr(importlib.import_module(module_name), class_name)
+    return cast(SpanExporter, exporter_class())
+
+
+tracer = Tracer(build_exporter(settings.tracing_exporter, settings.tracing_file), settings.tracing_sample_rate)
+
+
+def current_span() -> Span:
+    """Return the active span, or a no-op span when nothing is being traced."""
+    return _current_span.get() or NON_RECORDING_SPAN
+
+
+def span(name: str, **attributes: Any) -> ContextManager[Span]:
+    return tracer.span(name, **attributes)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorator running a sync or async function inside a span called ``name``."""
+
+    def decorate(func: F) -> F:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not tracer.enabled:
+                    return await func(*args, **kwargs)
+                with tracer.span(name):
+                    return await func(*args, **kwargs)
+
+            return cast(F, async_wrapper)
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(name):
+                return func(*args, **kwargs)
+
+        return cast(F, wrapper)
+
+    return decorate
+
+
+def route_template(scope: Scope) -> str:
+    """Return the path template (``/pdf-download/{pdf_id}``) of the route matching ``scope``.
+
+    Requests matching no route get ``UNMATCHED_ROUTE``.
+    """
+    router = getattr(scope.get("app"), "router", None)
+    for route in getattr(router, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return str(getattr(route, "path", UNMATCHED_ROUTE))
+    return UNMATCHED_ROUTE
+
+
+def _parse_traceparent(value: str) -> tuple[Optional[str], Optional[str]]:
+    parts = value.strip().split("-")
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+        return parts[1], parts[2]
+    return None, None
+
+
+class TracingMiddleware:
+    """Opens the root span of each HTTP request, continuing an incoming W3C ``traceparent``."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        trace_id, parent_id = _parse_traceparent(headers.get(b"traceparent", b"").decode("latin-1"))
+        root = tracer.start_span(
+            f"HTTP {scope['method']}", trace_id=trace_id, parent_id=parent_id, **{"http.method": scope["method"]}
+        )
+        token = _current_span.set(root)
+
+        async def send_with_status(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+            await send(message)
+
+        error: Optional[BaseException] = None
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            _current_span.reset(token)
+            if root.recording:
+                route = route_template(scope)
+                root.name = f"HTTP {scope['method']} {route}"
+                root.set_attribute("http.route", route)
+                if root.attributes.get("http.status_code", 500) >= 500:
+                    root.status = "error"
+            tracer.end_span(root, error)
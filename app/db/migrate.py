@@ -0,0 +1,39 @@
+"""Apply database schema changes outside the request-serving startup path.
+
+Run once per deploy, before starting the API workers::
+
+    python -m app.db.migrate
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from app.core.config import get_settings
+from app.core.logging import configure_logging
+from app.db.mongodb import close_mongo_connection, connect_to_mongo, ensure_indexes
+from app.db.postgres import init_db
+
+logger = logging.getLogger(__name__)
+
+
+async def _ensure_mongo_indexes() -> None:
+    await connect_to_mongo()
+    try:
+        await ensure_indexes()
+    finally:
+        await close_mongo_connection()
+
+
+def main() -> None:
+    settings = get_settings()
+    configure_logging("DEBUG" if settings.debug else "INFO")
+    logger.info("Applying database migrations")
+    init_db()
+    logger.info("Ensuring MongoDB indexes")
+    asyncio.run(_ensure_mongo_indexes())
+    logger.info("Database schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Versioned schema migrations for the PostgreSQL database.
+
+Each migration is a module exposing ``VERSION``, ``NAME`` and
+``upgrade(connection)``. Applied versions are recorded in the
+``schema_migrations`` table, so every deploy only runs what is new.
+Add a migration by creating the next ``vNNNN_<name>.py`` module and
+listing it in ``MIGRATIONS``; never edit one that has shipped.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from types import ModuleType
+from typing import List, Optional, Set
+
+from loguru import logger
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.db.migrations import v0001_initial, v0002_chat_memory_and_multi_select, v0003_chat_query_indexes
+
+MIGRATIONS: List[ModuleType] = [
+    v0001_initial,
+    v0002_chat_memory_and_multi_select,
+    v0003_chat_query_indexes,
+]
+
+# Arbitrary application-wide key for the PostgreSQL advisory lock.
+_ADVISORY_LOCK_KEY = 7_340_221
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def applied_versions(connection: Connection) -> Set[int]:
+    schema_migrations.create(connection, checkfirst=True)
+    return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def upgrade(engine: Engine, target: Optional[int] = None) -> List[int]:
+    """Apply pending migrations up to ``target`` (default: latest) and return their versions."""
+    applied: List[int] = []
+    for migration in sorted(MIGRATIONS, key=lambda module: module.VERSION):
+        if target is not None and migration.VERSION > target:
+            break
+        with engine.begin() as connection:
+            if connection.dialect.name == "postgresql":
+                # Serialise concurrent migrate runs; released at commit.
+                connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _ADVISORY_LOCK_KEY})
+            if migration.VERSION in applied_versions(connection):
+                continue
+            logger.info("Applying migration version={} name={}", migration.VERSION, migration.NAME)
+            migration.upgrade(connection)
+            connection.execute(
+                schema_migrations.insert().values(
+                    version=migration.VERSION, name=migration.NAME, applied_at=datetime.now(timezone.utc)
+                )
+            )
+        applied.append(migration.VERSION)
+    return applied
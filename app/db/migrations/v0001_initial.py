@@ -0,0 +1,50 @@
+"""Initial schema, as previously created by ``Base.metadata.create_all``.
+
+Tables are defined here rather than taken from the models so the migration
+stays fixed as the models evolve. ``checkfirst`` lets it adopt databases
+that were created before migrations existed.
+"""
+from __future__ import annotations
+
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, MetaData, String, Table
+from sqlalchemy.engine import Connection
+
+VERSION = 1
+NAME = "initial"
+
+metadata = MetaData()
+
+Table(
+    "users",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("email", String(255), unique=True, nullable=False, index=True),
+    Column("password_hash", String(255), nullable=False),
+    Column("selected_pdf_id", String(255), nullable=True),
+    Column("is_active", Boolean, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+Table(
+    "chat_sessions",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True),
+    Column("pdf_id", String(255), nullable=True),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+Table(
+    "chat_messages",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("session_id", Integer, ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False, index=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True),
+    Column("role", String(50), nullable=False),
+    Column("content", String, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def upgrade(connection: Connection) -> None:
+    metadata.create_all(connection, checkfirst=True)
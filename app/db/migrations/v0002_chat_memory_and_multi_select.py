@@ -0,0 +1,28 @@
+"""Columns added for conversation summaries and multi-PDF selection.
+
+``create_all`` never altered existing tables, so databases created before
+these features may lack the columns; only missing ones are added.
+"""
+from __future__ import annotations
+
+from sqlalchemy import JSON, Integer, Text, inspect, text
+from sqlalchemy.engine import Connection
+
+VERSION = 2
+NAME = "chat_memory_and_multi_select"
+
+_COLUMNS = [
+    ("users", "selected_pdf_ids", JSON(), ""),
+    ("chat_sessions", "summary", Text(), ""),
+    ("chat_sessions", "summarized_count", Integer(), " NOT NULL DEFAULT 0"),
+]
+
+
+def upgrade(connection: Connection) -> None:
+    inspector = inspect(connection)
+    for table, column, type_, constraints in _COLUMNS:
+        existing = {info["name"] for info in inspector.get_columns(table)}
+        if column in existing:
+            continue
+        ddl_type = type_.compile(dialect=connection.dialect)
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}{constraints}"))
@@ -0,0 +1,36 @@
+"""Composite indexes matching the chat query shapes.
+
+* ``(user_id, pdf_id, created_at)`` serves the latest-session lookup per
+  user and PDF set without a sort.
+* ``(session_id, created_at, id)`` returns a session's messages already in
+  conversation order.
+
+The single-column indexes they supersede are dropped, since each composite
+index also serves lookups on its leading column.
+"""
+from __future__ import annotations
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+VERSION = 3
+NAME = "chat_query_indexes"
+
+_CREATE = [
+    ("ix_chat_sessions_user_pdf_created", "chat_sessions", "user_id, pdf_id, created_at"),
+    ("ix_chat_messages_session_created_id", "chat_messages", "session_id, created_at, id"),
+]
+_DROP = [
+    ("ix_chat_sessions_user_id", "chat_sessions"),
+    ("ix_chat_messages_session_id", "chat_messages"),
+]
+
+
+def upgrade(connection: Connection) -> None:
+    inspector = inspect(connection)
+    for name, table, columns in _CREATE:
+        if name not in {index["name"] for index in inspector.get_indexes(table)}:
+            connection.execute(text(f"CREATE INDEX {name} ON {table} ({columns})"))
+    for name, table in _DROP:
+        if name in {index["name"] for index in inspector.get_indexes(table)}:
+            connection.execute(text(f"DROP INDEX {name}"))
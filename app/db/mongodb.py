@@ -3,6 +3,7 @@ from __future__ import annotations
 from typing import Any, Optional
 
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from pymongo import ASCENDING, DESCENDING
 
 from app.core.config import get_settings
 
@@ -48,3 +49,15 @@ async def close_mongo_connection() -> None:
         MongoDB.client = None
         MongoDB.database = None
         MongoDB.grid_fs = None
+
+
+async def ensure_indexes() -> None:
+    """Create the indexes the API's hot queries rely on (idempotent)."""
+
+    database = get_database()
+    # Serves /pdf-list: equality on user_id, then the keyset sort used for cursors.
+    await database.pdf_metadata.create_index(
+        [("user_id", ASCENDING), ("upload_date", DESCENDING), ("pdf_id", DESCENDING)],
+        name="user_upload_date_pdf_id",
+    )
+    await database.pdf_list_state.create_index([("user_id", ASCENDING)], name="user_id_unique", unique=True)
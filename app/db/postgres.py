@@ -1,12 +1,13 @@
 from __future__ import annotations
 
 from contextlib import contextmanager
-from typing import Generator
+from typing import Any, Generator
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 from app.core.config import get_settings
+from app.core.tracing import tracer
 
 settings = get_settings()
 
@@ -15,14 +16,38 @@ SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, futu
 Base = declarative_base()
 
 
-def init_db() -> None:
-    """Create database tables if they do not already exist."""
+def trace_queries(target: Any) -> None:
+    """Record every statement run through ``target`` (an engine) as a ``postgres.query`` span."""
+
+    @event.listens_for(target, "before_cursor_execute")
+    def _start(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        context._trace_span = tracer.start_span("postgres.query", statement=statement[:200], executemany=executemany)
+
+    @event.listens_for(target, "after_cursor_execute")
+    def _end(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        query_span = getattr(context, "_trace_span", None)
+        if query_span is not None:
+            query_span.set_attribute("rows", cursor.rowcount)
+            tracer.end_span(query_span)
+
+    @event.listens_for(target, "handle_error")
+    def _error(exception_context: Any) -> None:
+        context = exception_context.execution_context
+        query_span = getattr(context, "_trace_span", None) if context is not None else None
+        if query_span is not None:
+            tracer.end_span(query_span, exception_context.original_exception)
 
-    import app.models as models_module
 
-    _ = models_module.__all__  # ensure module is referenced
+if tracer.enabled:
+    trace_queries(engine)
+
+
+def init_db() -> None:
+    """Bring the database schema up to date by applying pending migrations."""
+
+    from app.db.migrations import upgrade
 
-    Base.metadata.create_all(bind=engine)
+    upgrade(engine)
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -1,19 +1,28 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any
+from typing import Any, Optional
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api import router as api_router
+from app.core.compression import SelectiveGZipMiddleware
 from app.core.config import get_settings
-from app.core.logging import configure_logging
+from app.core.logging import RequestContextMiddleware, configure_logging, flush_logging
+from app.core.loop_monitor import LoopMonitorMiddleware, get_loop_monitor
+from app.core.metrics import metrics
+from app.core.tracing import TracingMiddleware, tracer
 from app.db.mongodb import close_mongo_connection, connect_to_mongo
-from app.db.postgres import init_db
+from app.services.chat_writer import get_chat_writer
 
 settings = get_settings()
-configure_logging("DEBUG" if settings.debug else "INFO")
+configure_logging(
+    "DEBUG" if settings.debug else "INFO",
+    json_logs=settings.log_json,
+    sample_rate=settings.log_sample_rate,
+)
 logger = logging.getLogger(__name__)
 
 app = FastAPI(
@@ -23,22 +32,53 @@ app = FastAPI(
     redoc_url="/redoc",
 )
 
+loop_monitor = get_loop_monitor()
+if loop_monitor is not None:
+    # Innermost, so it runs in the same task as the endpoint.
+    app.add_middleware(LoopMonitorMiddleware, monitor=loop_monitor)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allowed_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let browser clients read the pagination cursor and revalidate /pdf-list.
+    expose_headers=["X-Next-Cursor", "ETag"],
+)
+app.add_middleware(
+    SelectiveGZipMiddleware,
+    minimum_size=settings.gzip_minimum_size,
+    compresslevel=settings.gzip_compress_level,
+    exclude_prefixes=("/pdf-download",),
 )
+app.add_middleware(RequestContextMiddleware)
+# Outermost, so the root span covers every other middleware.
+app.add_middleware(TracingMiddleware)
+
+_retention_task: Optional[asyncio.Task[None]] = None
 
 
 @app.on_event("startup")
 async def on_startup() -> None:
-    """Initialise database connections."""
+    """Initialise database connections.
+
+    Schema changes are applied separately with ``python -m app.db.migrate``
+    so worker restarts do not pay for them.
+    """
+
+    global _retention_task
 
     logger.info("Starting Document Chat Assistant")
-    init_db()
     await connect_to_mongo()
+    if loop_monitor is not None:
+        loop_monitor.start()
+    chat_writer = get_chat_writer()
+    if chat_writer is not None:
+        chat_writer.start()
+    if settings.retention_interval_minutes > 0:
+        from app.services.retention import run_periodically
+
+        _retention_task = asyncio.create_task(run_periodically(settings.retention_interval_minutes))
 
 
 @app.on_event("shutdown")
@@ -46,7 +86,16 @@ async def on_shutdown() -> None:
     """Cleanly close resources on shutdown."""
 
     logger.info("Shutting down Document Chat Assistant")
+    if _retention_task is not None:
+        _retention_task.cancel()
+    chat_writer = get_chat_writer()
+    if chat_writer is not None:
+        await chat_writer.close()
     await close_mongo_connection()
+    if loop_monitor is not None:
+        await loop_monitor.stop()
+    tracer.shutdown()
+    flush_logging()
 
 
 @app.get("/health", tags=["system"])
@@ -60,4 +109,11 @@ async def health_check() -> dict[str, Any]:
     }
 
 
+@app.get("/metrics", tags=["system"])
+async def metrics_snapshot() -> dict[str, Any]:
+    """Expose in-process counters, gauges and latency summaries."""
+
+    return metrics.snapshot()
+
+
 app.include_router(api_router)
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime, timezone
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.orm import relationship
 
 from app.db.postgres import Base
@@ -10,11 +10,16 @@ from app.db.postgres import Base
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
+    # Indexes are created by migrations (app/db/migrations); keep these in sync.
+    __table_args__ = (Index("ix_chat_sessions_user_pdf_created", "user_id", "pdf_id", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     pdf_id = Column(String(255), nullable=True)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    # Rolling summary of turns that fell out of the verbatim memory window.
+    summary = Column(Text, nullable=True)
+    summarized_count = Column(Integer, default=0, nullable=False)
 
     user = relationship("User", back_populates="chat_sessions")
     messages = relationship(
@@ -27,9 +32,10 @@ class ChatSession(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (Index("ix_chat_messages_session_created_id", "session_id", "created_at", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(Integer, ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False, index=True)
+    session_id = Column(Integer, ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     role = Column(String(50), nullable=False, default="user")
     content = Column(String, nullable=False)
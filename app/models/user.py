@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone
+from typing import List
 
-from sqlalchemy import Boolean, Column, DateTime, Integer, String
+from sqlalchemy import JSON, Boolean, Column, DateTime, Integer, String
 from sqlalchemy.orm import relationship
 
 from app.db.postgres import Base
@@ -15,6 +16,8 @@ class User(Base):
     email = Column(String(255), unique=True, nullable=False, index=True)
     password_hash = Column(String(255), nullable=False)
     selected_pdf_id = Column(String(255), nullable=True)
+    # Set when the user chats over several PDFs at once; ``selected_pdf_id`` then holds the first one.
+    selected_pdf_ids = Column(JSON, nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
 
@@ -30,3 +33,12 @@ class User(Base):
         cascade="all, delete-orphan",
         order_by="ChatMessage.created_at",
     )
+
+    @property
+    def active_pdf_ids(self) -> List[str]:
+        """Return the PDFs the next chat turn should draw context from."""
+        if self.selected_pdf_ids:
+            return list(self.selected_pdf_ids)
+        if self.selected_pdf_id:
+            return [self.selected_pdf_id]
+        return []
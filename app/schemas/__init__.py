@@ -2,7 +2,7 @@
 
 from app.schemas.auth import Token, TokenPayload
 from app.schemas.chat import ChatHistoryResponse, ChatMessage, ChatRequest
-from app.schemas.pdf import PDFMetadata, PDFParseRequest, PDFSelectRequest
+from app.schemas.pdf import BulkUploadResponse, BulkUploadResult, PDFMetadata, PDFMultiSelectRequest, PDFParseRequest, PDFSelectRequest
 from app.schemas.user import UserCreate, UserLogin, UserRead
 
 __all__ = [
@@ -11,7 +11,10 @@ __all__ = [
 	"ChatHistoryResponse",
 	"ChatMessage",
 	"ChatRequest",
+	"BulkUploadResponse",
+	"BulkUploadResult",
 	"PDFMetadata",
+	"PDFMultiSelectRequest",
 	"PDFParseRequest",
 	"PDFSelectRequest",
 	"PDFSelectRequest",
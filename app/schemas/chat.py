@@ -1,13 +1,14 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import List
+from typing import List, Literal
 
 from pydantic import BaseModel
 
 
 class ChatRequest(BaseModel):
     message: str
+    mode: Literal["auto", "single", "map_reduce"] = "auto"
 
 
 class ChatMessage(BaseModel):
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -18,3 +19,21 @@ class PDFParseRequest(BaseModel):
 
 class PDFSelectRequest(BaseModel):
     pdf_id: str = Field(..., description="MongoDB ObjectId of the PDF to select")
+
+
+class PDFMultiSelectRequest(BaseModel):
+    pdf_ids: List[str] = Field(..., min_length=1, description="MongoDB ObjectIds of the PDFs to chat over")
+
+
+class BulkUploadResult(BaseModel):
+    filename: str
+    status: Literal["stored", "rejected", "failed"]
+    pdf_id: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class BulkUploadResponse(BaseModel):
+    results: List[BulkUploadResult]
+    stored: int
+    failed: int
+    parse_scheduled: bool = False
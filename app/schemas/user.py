@@ -22,5 +22,6 @@ class UserRead(UserBase):
     is_active: bool
     created_at: datetime
     selected_pdf_id: str | None = None
+    selected_pdf_ids: list[str] | None = None
 
     model_config = ConfigDict(from_attributes=True)
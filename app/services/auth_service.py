@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import timedelta
-from typing import cast
+from typing import Optional, cast
 
 from loguru import logger
 
@@ -9,7 +10,12 @@ from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
-from app.core.security import create_access_token, get_password_hash, verify_password
+from app.core.security import (
+    create_access_token,
+    get_password_hash_async,
+    password_needs_rehash,
+    verify_password_async,
+)
 from app.models.user import User
 from app.schemas.user import UserCreate
 
@@ -17,34 +23,62 @@ settings = get_settings()
 
 
 class AuthService:
-    """Business logic for authentication and user management."""
+    """Business logic for authentication and user management.
+
+    The session is synchronous, so queries and commits run in a worker thread
+    rather than on the event loop.
+    """
 
     def __init__(self, db: Session) -> None:
         self.db = db
 
-    def register_user(self, user_in: UserCreate) -> User:
+    def _find_by_email(self, email: str) -> Optional[User]:
+        return self.db.query(User).filter(User.email == email).first()
+
+    def _discard_changes(self, user: User) -> None:
+        self.db.rollback()
+        self.db.refresh(user)
+
+    def _save(self, user: User) -> None:
+        self.db.add(user)
+        self.db.commit()
+        self.db.refresh(user)
+
+    async def register_user(self, user_in: UserCreate) -> User:
         logger.info("Registering user email={}", user_in.email)
-        existing = self.db.query(User).filter(User.email == user_in.email).first()
+        existing = await asyncio.to_thread(self._find_by_email, user_in.email)
         if existing:
             logger.warning("Registration denied for existing email={}", user_in.email)
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
-        user = User(email=user_in.email, password_hash=get_password_hash(user_in.password))
-        self.db.add(user)
-        self.db.commit()
-        self.db.refresh(user)
+        user = User(email=user_in.email, password_hash=await get_password_hash_async(user_in.password))
+        await asyncio.to_thread(self._save, user)
         logger.info("User registered id={} email={}", user.id, user.email)
         return user
 
-    def authenticate(self, email: str, password: str) -> User:
+    async def authenticate(self, email: str, password: str) -> User:
         logger.info("Authenticating user email={}", email)
-        user = self.db.query(User).filter(User.email == email).first()
-        if not user or not verify_password(password, cast(str, user.password_hash)):
+        user = await asyncio.to_thread(self._find_by_email, email)
+        if not user or not await verify_password_async(password, cast(str, user.password_hash)):
             logger.warning("Authentication failed for email={}", email)
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+        if password_needs_rehash(cast(str, user.password_hash)):
+            await self._upgrade_hash(user, password)
         logger.info("Authentication succeeded for user_id={} email={}", user.id, email)
         return user
 
+    async def _upgrade_hash(self, user: User, password: str) -> None:
+        """Re-hash with the current cost factor; best-effort, so a busy hasher or failed commit never blocks login."""
+        try:
+            setattr(user, "password_hash", await get_password_hash_async(password))
+            await asyncio.to_thread(self.db.commit)
+        except Exception as exc:
+            # Rolling back and reloading restores the stored (old) hash on ``user``.
+            await asyncio.to_thread(self._discard_changes, user)
+            logger.warning("Password rehash skipped for user_id={} error={}", user.id, exc)
+            return
+        logger.info("Rehashed password with updated cost for user_id={}", user.id)
+
     def create_token(self, user: User) -> str:
         logger.debug("Issuing access token for user_id={} email={}", user.id, user.email)
         return create_access_token({"sub": user.email}, expires_delta=timedelta(minutes=settings.access_token_expire_minutes))
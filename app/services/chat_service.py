@@ -1,79 +1,334 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import List, cast
+import asyncio
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Callable, Iterator, List, Optional, Tuple, cast
 
+import orjson
 from fastapi import HTTPException, status
 from loguru import logger
+from sqlalchemy import literal
 from sqlalchemy.orm import Session
 
+from app.core.concurrency import gather_or_cancel
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.core.tracing import current_span, span, traced
 from app.models.chat import ChatMessage, ChatSession
 from app.models.user import User
 from app.schemas.chat import ChatHistoryResponse, ChatMessage as ChatMessageSchema
-from app.services.llm_service import ask_gemini, chunk_text
+from app.services.chat_writer import ChatMessageWriter, get_chat_writer
+from app.services.chunking import ChunkIndex, TextSpan
+from app.services.llm_scheduler import LLMScheduler, get_llm_scheduler
+from app.services.llm_service import (
+    NO_RELEVANT_CONTENT,
+    answer_chunk_group,
+    ask_gemini,
+    combine_answers,
+    estimate_tokens,
+    rank_chunks,
+    summarize_conversation,
+)
+from app.services.map_reduce import PartialAnswerCache, get_partial_answer_cache, group_chunks
 from app.services.pdf_service import PDFService
 
+settings = get_settings()
+
+_ROLE_LABELS = {"user": "User", "assistant": "Assistant"}
+
+# (pdf_id, chunk spans over the document text, chunk positions ordered by relevance)
+RankedDocument = Tuple[str, ChunkIndex, List[int]]
+
+
+def _format_turns(messages: List[ChatMessage], max_chars: int) -> str:
+    """Render messages as a plain transcript, truncating each one to ``max_chars``."""
+    lines = []
+    for msg in messages:
+        content = cast(str, msg.content)
+        if len(content) > max_chars:
+            content = content[:max_chars] + "..."
+        lines.append(f"{_ROLE_LABELS.get(cast(str, msg.role), msg.role)}: {content}")
+    return "\n".join(lines)
+
+
+def _merge_contexts(documents: List[RankedDocument], max_chars: int) -> List[str]:
+    """Merge ranked chunks from several documents into one size-capped context.
+
+    Chunks are picked round-robin by rank so every document contributes its
+    most relevant passages before any document contributes its weaker ones.
+    Picked chunks are emitted in their original order within each document,
+    and only picked chunks are ever sliced out of the document text.
+    """
+    picked: List[set[int]] = [set() for _ in documents]
+    budget = max_chars
+    depth = max((len(ranking) for _, _, ranking in documents), default=0)
+    for rank in range(depth):
+        for doc_index, (_, chunks, ranking) in enumerate(documents):
+            if rank >= len(ranking):
+                continue
+            chunk_index = ranking[rank]
+            size = chunks.size(chunk_index)
+            if size <= budget:
+                picked[doc_index].add(chunk_index)
+                budget -= size
+
+    if len(documents) == 1:
+        _, chunks, _ = documents[0]
+        return [chunks.chunk(index) for index in sorted(picked[0])]
+
+    sections: List[str] = []
+    for (pdf_id, chunks, _), indices in zip(documents, picked):
+        if indices:
+            body = "\n\n".join(chunks.chunk(index) for index in sorted(indices))
+            sections.append(f"[Document {pdf_id}]\n{body}")
+    return sections
+
 
 class ChatService:
     """Provide conversational interactions over PDFs for a specific user."""
 
-    def __init__(self, db: Session, pdf_service: PDFService) -> None:
+    def __init__(
+        self,
+        db: Session,
+        pdf_service: PDFService,
+        scheduler: Optional[LLMScheduler] = None,
+        partial_cache: Optional[PartialAnswerCache] = None,
+        writer: Optional[ChatMessageWriter] = None,
+    ) -> None:
         self.db = db
         self.pdf_service = pdf_service
+        self.scheduler = scheduler or get_llm_scheduler()
+        self.partial_cache = partial_cache or get_partial_answer_cache()
+        self.writer = writer or get_chat_writer()
 
-    def _get_session(self, user: User) -> ChatSession:
-        """Return the most recent chat session for the user's selected PDF.
+    async def _call_llm(self, user_id: int, estimated_tokens: int, func: Callable[..., str], *args: Any) -> str:
+        """Run a blocking Gemini helper in a worker thread once the scheduler grants a slot."""
+        # The scheduler enforces global concurrency, rate limits and per-user fairness.
+        with span("llm.call", function=func.__name__, estimated_tokens=estimated_tokens):
+            async with self.scheduler.slot(user_id, estimated_tokens):
+                return await asyncio.to_thread(func, *args)
+
+    @traced("postgres.chat_session")
+    def _get_session(self, user: User, pdf_key: str) -> ChatSession:
+        """Return the most recent chat session for the user's selected PDFs.
 
         A new session is created when the user has not chatted with the
-        currently selected document yet. Persisting the session ID ensures
-        that chat history is tied to the combination of user and PDF.
+        currently selected document set yet. Persisting the session ID ensures
+        that chat history is tied to the combination of user and PDFs;
+        ``pdf_key`` is the PDF ID, or the sorted comma-joined IDs for a set.
         """
         session = (
             self.db.query(ChatSession)
-            .filter(ChatSession.user_id == user.id, ChatSession.pdf_id == user.selected_pdf_id)
+            .filter(ChatSession.user_id == user.id, ChatSession.pdf_id == pdf_key)
             .order_by(ChatSession.created_at.desc())
             .first()
         )
         if not session:
-            # First interaction with this PDF; create a fresh session bucket.
-            session = ChatSession(user_id=user.id, pdf_id=user.selected_pdf_id)
+            # First interaction with this PDF set; create a fresh session bucket.
+            session = ChatSession(user_id=user.id, pdf_id=pdf_key)
             self.db.add(session)
             self.db.commit()
             self.db.refresh(session)
-            logger.info("Created new chat session session_id={} user_id={} pdf_id={}", session.id, user.id, user.selected_pdf_id)
+            logger.info("Created new chat session session_id={} user_id={} pdf_id={}", session.id, user.id, pdf_key)
         return session
 
-    async def chat(self, user: User, message: str) -> ChatMessageSchema:
+    @traced("chat.load_document")
+    async def _load_document_context(self, pdf_id: str, user_id: int, question: str) -> RankedDocument:
+        """Fetch, chunk and rank one document's text against the question."""
+        chunks = await self.pdf_service.get_chunk_index(pdf_id, user_id)
+        ranking = await asyncio.to_thread(rank_chunks, chunks, question)
+        current_span().set_attributes(pdf_id=pdf_id, chunks=len(chunks), chars=chunks.total_chars)
+        return pdf_id, chunks, ranking
+
+    async def _fold_into_summary(self, session: ChatSession, messages: List[ChatMessage], user_id: int) -> None:
+        """Merge turns that left the verbatim window into the session summary."""
+        max_chars = settings.chat_memory_summary_max_chars
+        summary = cast(Optional[str], session.summary) or ""
+        transcript = _format_turns(messages, settings.chat_memory_max_message_chars)
+        try:
+            estimated_tokens = estimate_tokens(summary) + estimate_tokens(transcript)
+            summary = await self._call_llm(user_id, estimated_tokens, summarize_conversation, summary, transcript, max_chars)
+        except Exception as exc:
+            # Keep memory bounded even when Gemini is unavailable by retaining the latest text.
+            logger.warning("Conversation summarisation failed session_id={} error={}", session.id, exc)
+            summary = f"{summary}\n{transcript}".strip()[-max_chars:]
+
+        setattr(session, "summary", summary)
+        setattr(session, "summarized_count", (session.summarized_count or 0) + len(messages))
+        self.db.commit()
+        logger.info(
+            "Conversation summary updated session_id={} folded={} summary_length={}",
+            session.id,
+            len(messages),
+            len(summary),
+        )
+
+    @traced("chat.memory")
+    async def _conversation_memory(self, session: ChatSession, user_id: int) -> str:
+        """Return the summary plus recent turns to prepend to the next prompt.
+
+        Only messages not yet folded into ``ChatSession.summary`` are loaded.
+        Once more than ``chat_memory_summary_batch_turns`` turns have fallen out
+        of the verbatim window they are summarised together, so the history
+        block stays bounded no matter how long the session runs. With
+        write-behind enabled, turns still buffered in memory are included but
+        only persisted ones are folded, as ``summarized_count`` offsets rows.
+        """
+
+        def load() -> List[ChatMessage]:
+            return (
+                self.db.query(ChatMessage)
+                .filter(ChatMessage.session_id == session.id)
+                .order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc())
+                .offset(session.summarized_count or 0)
+                .all()
+            )
+
+        if self.writer is not None:
+            persisted, buffered = await self.writer.read_consistent(cast(int, session.id), load)
+        else:
+            persisted, buffered = load(), []
+        pending = persisted + [ChatMessage(**row) for row in buffered]
+        current_span().set_attributes(persisted=len(persisted), buffered=len(buffered))
+        overflow = len(pending) - 2 * settings.chat_memory_turns
+        if overflow >= 2 * settings.chat_memory_summary_batch_turns:
+            folded = min(overflow, len(persisted))
+            await self._fold_into_summary(session, pending[:folded], user_id)
+            pending = pending[folded:]
+
+        sections = []
+        if session.summary:
+            sections.append(f"Summary of earlier conversation:\n{session.summary}")
+        if pending:
+            sections.append(f"Recent turns:\n{_format_turns(pending, settings.chat_memory_max_message_chars)}")
+        return "\n\n".join(sections)
+
+    async def _map_reduce_answer(
+        self,
+        documents: List[RankedDocument],
+        question: str,
+        history: str,
+        user_id: int,
+    ) -> str:
+        """Answer over documents too large for one prompt.
+
+        Chunks are packed into groups that each fit in a prompt and every
+        group is answered concurrently (bounded by ``chat_map_concurrency``).
+        Partial answers are cached per group and question, so repeated
+        questions on the same document skip the map stage. The reduce step
+        merges the partial answers, recursing when they are themselves too
+        large for one prompt.
+        """
+        max_chars = settings.chat_map_group_chars
+        semaphore = asyncio.Semaphore(settings.chat_map_concurrency)
+
+        async def run_map(pdf_id: str, chunks: ChunkIndex, spans: List[TextSpan]) -> str:
+            async with semaphore:
+                # Materialise the group only once it holds a slot, so at most
+                # ``chat_map_concurrency`` groups are in memory at a time.
+                group = [chunks.materialize(span) for span in spans]
+                key = self.partial_cache.key(pdf_id, group, question)
+                cached = self.partial_cache.get(key)
+                if cached is not None:
+                    metrics.inc("chat_map_cache_total", result="hit")
+                    return cached
+                metrics.inc("chat_map_cache_total", result="miss")
+                tokens = estimate_tokens(question) + sum(estimate_tokens(chunk) for chunk in group)
+                partial = await self._call_llm(user_id, tokens, answer_chunk_group, group, question)
+            self.partial_cache.set(key, partial)
+            return partial
+
+        jobs = [
+            run_map(pdf_id, chunks, spans)
+            for pdf_id, chunks, _ in documents
+            for spans in group_chunks(list(chunks), max_chars)
+        ]
+        partials = [answer for answer in await gather_or_cancel(jobs) if answer.strip() != NO_RELEVANT_CONTENT]
+        logger.info("Map stage finished user_id={} groups={} relevant={}", user_id, len(jobs), len(partials))
+        if not partials:
+            partials = ["None of the document excerpts contained information relevant to the question."]
+
+        async def run_reduce(batch: List[str], conversation: str) -> str:
+            tokens = estimate_tokens(question) + estimate_tokens(conversation) + sum(estimate_tokens(p) for p in batch)
+            async with semaphore:
+                return await self._call_llm(user_id, tokens, combine_answers, batch, question, conversation)
+
+        while sum(len(partial) for partial in partials) > max_chars:
+            batches = group_chunks(partials, max_chars)
+            if len(batches) == len(partials):
+                break
+            partials = await gather_or_cancel(run_reduce(batch, "") for batch in batches)
+        return await run_reduce(partials, history)
+
+    @traced("chat.turn")
+    async def chat(self, user: User, message: str, mode: str = "auto") -> ChatMessageSchema:
         """Generate an AI response for the provided message.
 
-        The PDF must be selected beforehand to scope the chat context.
-        Parsed PDF text is chunked for Gemini, and both user and assistant
-        messages are persisted for later retrieval.
+        One or more PDFs must be selected beforehand to scope the chat context.
+        Parsed PDF text is chunked for Gemini together with the session's
+        conversation memory, and both user and assistant messages are
+        persisted for later retrieval. ``mode`` selects a single prompt
+        (``"single"``), map-reduce over chunk groups (``"map_reduce"``) or lets
+        the document size decide (``"auto"``).
         """
-        if user.selected_pdf_id is None:
+        pdf_ids = user.active_pdf_ids
+        if not pdf_ids:
             logger.warning("Chat requested without selected PDF user_id={}", user.id)
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No PDF selected")
 
-        session = self._get_session(user)
-        pdf_id = cast(str, user.selected_pdf_id)
+        pdf_id = ",".join(sorted(pdf_ids))
+        session = self._get_session(user, pdf_id)
         user_id = cast(int, user.id)
         logger.info("Chat request started session_id={} user_id={} pdf_id={}", session.id, user_id, pdf_id)
-        text = await self.pdf_service.get_parsed_text(pdf_id, user_id)
-        context_chunks = chunk_text(text)
+        # Documents load concurrently so latency tracks the slowest one, not the sum.
+        documents = await asyncio.gather(
+            *(self._load_document_context(doc_id, user_id, message) for doc_id in pdf_ids)
+        )
+        history = await self._conversation_memory(session, user_id)
+        total_chars = sum(chunks.total_chars for _, chunks, _ in documents)
+        use_map_reduce = mode == "map_reduce" or (mode == "auto" and total_chars > settings.chat_context_max_chars)
+        current_span().set_attributes(pdfs=len(pdf_ids), chars=total_chars, map_reduce=use_map_reduce)
 
         try:
-            response_text = ask_gemini(context_chunks, message)
+            if use_map_reduce:
+                logger.info("Using map-reduce answering session_id={} total_chars={}", session.id, total_chars)
+                response_text = await self._map_reduce_answer(list(documents), message, history, user_id)
+            else:
+                context_chunks = _merge_contexts(list(documents), settings.chat_context_max_chars)
+                estimated_tokens = (
+                    estimate_tokens(message)
+                    + estimate_tokens(history)
+                    + sum(estimate_tokens(chunk) for chunk in context_chunks)
+                )
+                current_span().set_attributes(chunks=len(context_chunks), estimated_tokens=estimated_tokens)
+                response_text = await self._call_llm(user_id, estimated_tokens, ask_gemini, context_chunks, message, history)
+        except HTTPException:
+            raise
         except Exception as exc:  # pragma: no cover - network/service errors
             logger.error("Gemini request failed session_id={} user_id={} pdf_id={} error={}", session.id, user_id, pdf_id, exc)
             raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(exc)) from exc
 
+        if self.writer is not None:
+            # Write-behind: persisted by the background writer after we respond.
+            created_at = datetime.now(timezone.utc)
+            await self.writer.write(
+                [
+                    {"session_id": session.id, "user_id": user_id, "role": role, "content": content, "created_at": created_at}
+                    for role, content in (("user", message), ("assistant", response_text))
+                ]
+            )
+            logger.info("Chat response queued session_id={} user_id={}", session.id, user_id)
+            return ChatMessageSchema(role="assistant", content=response_text, created_at=created_at)
+
         # Store both sides of the conversation to keep chronology intact.
         user_msg = ChatMessage(session_id=session.id, user_id=user.id, role="user", content=message)
         bot_msg = ChatMessage(session_id=session.id, user_id=user.id, role="assistant", content=response_text)
-        self.db.add_all([user_msg, bot_msg])
-        self.db.commit()
-        self.db.refresh(user_msg)
-        self.db.refresh(bot_msg)
+        with span("postgres.chat_messages.insert", rows=2):
+            self.db.add_all([user_msg, bot_msg])
+            self.db.commit()
+            self.db.refresh(user_msg)
+            self.db.refresh(bot_msg)
         logger.info(
             "Chat response stored session_id={} user_id={} user_msg_id={} bot_msg_id={}",
             session.id,
@@ -88,19 +343,94 @@ class ChatService:
             created_at=cast(datetime, bot_msg.created_at),
         )
 
-    def history(self, user: User) -> ChatHistoryResponse:
-        """Return all chat messages for the user across PDFs."""
-        sessions = (
-            self.db.query(ChatSession)
+    def _history_rows(self, user: User) -> List[Any]:
+        """Fetch ``(role, content, created_at)`` rows for all of the user's sessions in one query."""
+        return (
+            self.db.query(ChatMessage.role, ChatMessage.content, ChatMessage.created_at)
+            .join(ChatSession, ChatMessage.session_id == ChatSession.id)
             .filter(ChatSession.user_id == user.id)
-            .order_by(ChatSession.created_at.asc())
+            # Sessions in creation order, then messages chronologically within each session.
+            .order_by(ChatSession.created_at.asc(), ChatSession.id.asc(), ChatMessage.created_at.asc(), ChatMessage.id.asc())
             .all()
         )
-        messages: List[ChatMessageSchema] = []
-        for session in sessions:
-            # Aggregate all messages from each session to preserve ordering.
-            for msg in session.messages:
-                messages.append(ChatMessageSchema(role=msg.role, content=msg.content, created_at=msg.created_at))
 
+    def history(self, user: User) -> ChatHistoryResponse:
+        """Return all chat messages for the user across PDFs."""
+        messages = [
+            ChatMessageSchema(role=role, content=content, created_at=created_at)
+            for role, content, created_at in self._history_rows(user)
+        ]
         logger.info("Chat history retrieved user_id={} total_messages={}", user.id, len(messages))
         return ChatHistoryResponse(messages=messages, total=len(messages))
+
+    def history_payload(self, user: User) -> dict[str, Any]:
+        """Return the chat history as plain dicts shaped like ``ChatHistoryResponse``.
+
+        Rows come straight from our own database, so the per-message Pydantic
+        models (and FastAPI's second validation pass) are skipped.
+        """
+        messages = [
+            {"role": role, "content": content, "created_at": created_at}
+            for role, content, created_at in self._history_rows(user)
+        ]
+        logger.info("Chat history retrieved user_id={} total_messages={}", user.id, len(messages))
+        return {"messages": messages, "total": len(messages)}
+
+    def export_ndjson(
+        self,
+        user: User,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        pdf_id: Optional[str] = None,
+        batch_size: Optional[int] = None,
+    ) -> Iterator[bytes]:
+        """Yield the user's messages as NDJSON, one encoded batch at a time.
+
+        Rows are read through a server-side cursor (``yield_per``) and each
+        batch is serialized and released before the next one is fetched, so
+        memory stays bounded by ``batch_size`` regardless of history length.
+        ``since`` is inclusive and ``until`` exclusive; ``pdf_id`` also
+        matches multi-document sessions that include the PDF.
+        """
+        batch_size = batch_size or settings.chat_export_batch_size
+        query = (
+            self.db.query(
+                ChatMessage.id,
+                ChatMessage.session_id,
+                ChatSession.pdf_id,
+                ChatMessage.role,
+                ChatMessage.content,
+                ChatMessage.created_at,
+            )
+            .join(ChatSession, ChatMessage.session_id == ChatSession.id)
+            .filter(ChatMessage.user_id == user.id)
+        )
+        if since is not None:
+            query = query.filter(ChatMessage.created_at >= since)
+        if until is not None:
+            query = query.filter(ChatMessage.created_at < until)
+        if pdf_id is not None:
+            # Multi-document sessions store the sorted comma-joined PDF IDs.
+            padded_key = literal(",") + ChatSession.pdf_id + literal(",")
+            query = query.filter(padded_key.contains(f",{pdf_id},", autoescape=True))
+        rows = query.order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc()).yield_per(batch_size)
+
+        exported = 0
+        iterator = iter(rows)
+        while partition := list(islice(iterator, batch_size)):
+            yield b"".join(
+                orjson.dumps(
+                    {
+                        "id": message_id,
+                        "session_id": session_id,
+                        "pdf_id": session_pdf_id,
+                        "role": role,
+                        "content": content,
+                        "created_at": created_at,
+                    }
+                )
+                + b"\n"
+                for message_id, session_id, session_pdf_id, role, content, created_at in partition
+            )
+            exported += len(partition)
+        logger.info("Chat history exported user_id={} pdf_id={} total_messages={}", user.id, pdf_id, exported)
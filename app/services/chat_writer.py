@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional, Tuple, TypeVar
+
+from loguru import logger
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.db.postgres import SessionLocal
+from app.models.chat import ChatMessage
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+
+class ChatMessageWriter:
+    """Write-behind buffer that persists chat messages off the response path.
+
+    Rows are appended in memory and inserted by a background task with one
+    multi-row ``INSERT`` per batch, at least every ``flush_interval``
+    seconds or as soon as ``max_batch`` rows are waiting. While
+    ``max_pending`` rows are buffered, writers wait for a flush before adding
+    more. A batch that fails ``max_retries`` flushes in a row is inserted one
+    row at a time and rows the database rejects are moved to
+    ``dead_letters``. Rows still buffered when the process dies are lost, so
+    ``flush_interval`` bounds the window of unpersisted messages;
+    ``close()`` drains the buffer on shutdown unless ``flush_on_shutdown``
+    is disabled.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        flush_interval: float,
+        max_batch: int,
+        max_pending: int,
+        max_retries: int = 5,
+        flush_on_shutdown: bool = True,
+        dead_letter_size: int = 1000,
+    ) -> None:
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.flush_on_shutdown = flush_on_shutdown
+        self.dead_letters: Deque[dict[str, Any]] = deque(maxlen=dead_letter_size)
+        self._buffer: List[dict[str, Any]] = []
+        self._inflight: List[dict[str, Any]] = []
+        self._failures = 0
+        # Bumped before and after every commit (odd while one is running), so
+        # readers can tell whether a commit overlapped their database read.
+        self._version = 0
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task[None]] = None
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._buffer) + len(self._inflight)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.flush_on_shutdown:
+            await self.flush()
+        if self.pending:
+            logger.error("Chat writer stopped with unpersisted messages count={}", self.pending)
+
+    async def write(self, rows: List[dict[str, Any]]) -> None:
+        """Queue ``ChatMessage`` column dicts for insertion, waiting while the buffer is full."""
+        while self.pending >= self.max_pending:
+            metrics.inc("chat_writer_backpressure_total")
+            await self.flush()
+            if self.pending >= self.max_pending:
+                # The flush failed; back off instead of retrying in a tight loop.
+                await asyncio.sleep(self.flush_interval)
+        with self._lock:
+            self._buffer.extend(rows)
+            buffered = len(self._buffer)
+        metrics.set_gauge("chat_writer_pending", buffered)
+        if buffered >= self.max_batch:
+            self._wake.set()
+
+    async def read_consistent(
+        self, session_id: int, read: Callable[[], T], retry_delay: float = 0.005
+    ) -> Tuple[T, List[dict[str, Any]]]:
+        """Run ``read`` against the database and return it with the session's unpersisted rows.
+
+        ``read`` runs without the lock. If a commit started or finished while
+        it ran, a row could show up both in its result and in memory (or in
+        neither), so the read is repeated until no commit overlapped it.
+        """
+        while True:
+            with self._lock:
+                version = self._version
+            if version % 2 == 0:
+                persisted = read()
+                with self._lock:
+                    if self._version == version:
+                        unpersisted = [row for row in self._inflight + self._buffer if row["session_id"] == session_id]
+                        return persisted, unpersisted
+            metrics.inc("chat_writer_read_retries_total")
+            await asyncio.sleep(retry_delay)
+
+    async def flush(self) -> None:
+        """Persist everything buffered so far."""
+        async with self._flush_lock:
+            while True:
+                with self._lock:
+                    if not self._buffer:
+                        break
+                    batch = self._buffer[: self.max_batch]
+                    del self._buffer[: len(batch)]
+                    self._inflight = list(batch)
+                insert_batch: Callable[[List[dict[str, Any]]], None] = self._insert
+                if self._failures >= self.max_retries:
+                    insert_batch = self._insert_each
+                try:
+                    await asyncio.to_thread(insert_batch, batch)
+                except Exception as exc:
+                    self._failures += 1
+                    with self._lock:
+                        self._buffer[:0] = self._inflight
+                        self._inflight = []
+                    metrics.inc("chat_writer_errors_total")
+                    logger.error(
+                        "Chat message flush failed rows={} attempt={} error={}", len(batch), self._failures, exc
+                    )
+                    break
+                self._failures = 0
+                metrics.inc("chat_writer_batches_total")
+            metrics.set_gauge("chat_writer_pending", self.pending)
+
+    def _insert(self, rows: List[dict[str, Any]]) -> None:
+        """Insert ``rows``, the head of ``_inflight``, and drop them from it once committed."""
+        session = self.session_factory()
+        try:
+            session.execute(insert(ChatMessage), rows)
+            with self._lock:
+                self._version += 1
+            committed = False
+            try:
+                session.commit()
+                committed = True
+            finally:
+                with self._lock:
+                    self._version += 1
+                    if committed:
+                        del self._inflight[: len(rows)]
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+        metrics.inc("chat_writer_rows_total", len(rows))
+        logger.debug("Persisted chat messages rows={}", len(rows))
+
+    def _insert_each(self, batch: List[dict[str, Any]]) -> None:
+        """Insert a batch that keeps failing row by row, dead-lettering rows the database rejects.
+
+        Connection errors are re-raised so an outage does not discard rows;
+        the rows not yet inserted stay in ``_inflight`` and are requeued.
+        """
+        for row in batch:
+            try:
+                self._insert([row])
+            except OperationalError:
+                raise
+            except Exception as exc:
+                with self._lock:
+                    del self._inflight[:1]
+                self.dead_letters.append(row)
+                metrics.inc("chat_writer_dead_letters_total")
+                logger.error(
+                    "Dropped chat message the database rejected session_id={} role={} error={}",
+                    row.get("session_id"),
+                    row.get("role"),
+                    exc,
+                )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+
+_chat_writer: Optional[ChatMessageWriter] = None
+
+
+def get_chat_writer() -> Optional[ChatMessageWriter]:
+    """Return the process-wide chat writer, or None when write-behind is disabled."""
+    global _chat_writer
+    if _chat_writer is None and settings.chat_write_behind_enabled:
+        _chat_writer = ChatMessageWriter(
+            SessionLocal,
+            flush_interval=settings.chat_write_behind_flush_seconds,
+            max_batch=settings.chat_write_behind_max_batch,
+            max_pending=settings.chat_write_behind_max_pending,
+            max_retries=settings.chat_write_behind_max_retries,
+            flush_on_shutdown=settings.chat_write_behind_flush_on_shutdown,
+        )
+    return _chat_writer
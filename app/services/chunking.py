@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_right
+from mmap import mmap
+from typing import Iterable, Iterator, Match, Optional, Pattern, Sequence, Union
+
+TextBuffer = Union[str, mmap]
+OffsetArray = Union["array[int]", memoryview]
+
+# Cut points in order of preference; the chunk ends right after the separator.
+_PARAGRAPH_BREAKS = ("\n\n",)
+_SENTENCE_BREAKS = (". ", "! ", "? ", ".\n", "!\n", "?\n")
+_WORD_BREAKS = (" ", "\n", "\t")
+
+
+class TextSpan:
+    """A ``[start, end)`` slice of a shared text buffer and the page it starts on."""
+
+    __slots__ = ("start", "end", "page")
+
+    def __init__(self, start: int, end: int, page: int = 0) -> None:
+        self.start = start
+        self.end = end
+        self.page = page
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __iter__(self) -> Iterator[int]:
+        return iter((self.start, self.end, self.page))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TextSpan):
+            return NotImplemented
+        return (self.start, self.end, self.page) == (other.start, other.end, other.page)
+
+    def __repr__(self) -> str:
+        return f"TextSpan(start={self.start}, end={self.end}, page={self.page})"
+
+
+def _find_cut(text: str, low: int, high: int) -> int:
+    """Return the best boundary in ``(low, high]`` or ``high`` when none exists."""
+    for separators in (_PARAGRAPH_BREAKS, _SENTENCE_BREAKS, _WORD_BREAKS):
+        best = -1
+        for separator in separators:
+            position = text.rfind(separator, low, high)
+            if position >= 0:
+                best = max(best, position + len(separator))
+        if best > low:
+            return best
+    return high
+
+
+def iter_chunk_spans(
+    text: str,
+    chunk_size: int = 2000,
+    overlap: int = 200,
+    tolerance: int = 200,
+    page_starts: Optional[Sequence[int]] = None,
+) -> Iterator[TextSpan]:
+    """Yield overlapping chunk spans over ``text`` without copying it.
+
+    Each chunk ends at the last paragraph, sentence or word boundary within
+    ``tolerance`` characters before ``chunk_size``; text without boundaries is
+    cut at the fixed size. The next chunk starts ``overlap`` characters before
+    the previous end. ``page_starts`` holds the offset at which each page
+    begins and is used to tag spans with a zero-based page number.
+    """
+    length = len(text)
+    if length == 0:
+        return
+    overlap = min(overlap, chunk_size - 1)
+    start = 0
+    while True:
+        page = bisect_right(page_starts, start) - 1 if page_starts else 0
+        target = start + chunk_size
+        if target >= length:
+            yield TextSpan(start, length, max(page, 0))
+            return
+        # Never cut so early that the next chunk would fail to advance.
+        low = max(start + overlap, target - tolerance)
+        end = _find_cut(text, low, target)
+        yield TextSpan(start, end, max(page, 0))
+        start = end - overlap
+
+
+class ChunkIndex:
+    """Compact, array-backed list of chunk spans over one shared text buffer.
+
+    Storing offsets instead of chunk strings keeps memory proportional to the
+    number of chunks rather than the document size; chunk text is sliced out
+    only when a prompt is built. The buffer is normally a ``str``; it may also
+    be a UTF-8 ``mmap`` with byte offsets, in which case chunks are decoded on
+    demand (see :mod:`app.services.text_cache`).
+    """
+
+    __slots__ = ("text", "_chars", "_starts", "_ends", "_pages")
+
+    def __init__(self, text: TextBuffer, spans: Iterable[TextSpan] = (), chars: Optional[int] = None) -> None:
+        self.text = text
+        self._chars = chars
+        self._starts: OffsetArray = array("q")
+        self._ends: OffsetArray = array("q")
+        self._pages: OffsetArray = array("q")
+        for span in spans:
+            self._starts.append(span.start)
+            self._ends.append(span.end)
+            self._pages.append(span.page)
+
+    @classmethod
+    def build(
+        cls,
+        text: str,
+        chunk_size: int = 2000,
+        overlap: int = 200,
+        tolerance: int = 200,
+        page_starts: Optional[Sequence[int]] = None,
+    ) -> "ChunkIndex":
+        return cls(text, iter_chunk_spans(text, chunk_size, overlap, tolerance, page_starts))
+
+    @classmethod
+    def from_buffers(
+        cls,
+        text: TextBuffer,
+        starts: OffsetArray,
+        ends: OffsetArray,
+        pages: OffsetArray,
+        chars: Optional[int] = None,
+    ) -> "ChunkIndex":
+        """Wrap pre-computed offset buffers (e.g. memoryviews over an mmap) without copying.
+
+        ``chars`` is the character length of a UTF-8 ``mmap`` buffer, whose
+        own length is in bytes.
+        """
+        index = cls(text, chars=chars)
+        index._starts, index._ends, index._pages = starts, ends, pages
+        return index
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __getitem__(self, index: int) -> TextSpan:
+        return TextSpan(self._starts[index], self._ends[index], self._pages[index])
+
+    def __iter__(self) -> Iterator[TextSpan]:
+        for index in range(len(self._starts)):
+            yield self[index]
+
+    def size(self, index: int) -> int:
+        return self._ends[index] - self._starts[index]
+
+    def materialize(self, span: TextSpan) -> str:
+        """Return the text covered by ``span``."""
+        if isinstance(self.text, str):
+            return self.text[span.start : span.end]
+        return self.text[span.start : span.end].decode("utf-8")
+
+    def chunk(self, index: int) -> str:
+        """Materialise the text of one chunk."""
+        return self.materialize(self[index])
+
+    def finditer(self, pattern: Pattern[str], index: int) -> Iterator[Match[str]]:
+        """Run ``pattern`` over one chunk, without copying when the buffer is a ``str``."""
+        if isinstance(self.text, str):
+            return pattern.finditer(self.text, self._starts[index], self._ends[index])
+        return pattern.finditer(self.chunk(index))
+
+    @property
+    def total_chars(self) -> int:
+        """Characters in the source text; overlapping chunks are not counted twice."""
+        if isinstance(self.text, str):
+            return len(self.text)
+        if self._chars is None:
+            raise ValueError("character length of a byte buffer is unknown")
+        return self._chars
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from loguru import logger
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+settings = get_settings()
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate`` units per second."""
+
+    def __init__(self, capacity: float, rate: float) -> None:
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay_for(self, amount: float) -> float:
+        """Return seconds until ``amount`` units are available (0 when ready)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+@dataclass(order=True)
+class _Waiter:
+    finish_tag: float
+    sequence: int
+    user_id: int = field(compare=False)
+    cost: float = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    future: "asyncio.Future[None]" = field(compare=False)
+
+
+class LLMScheduler:
+    """Admission control in front of the LLM provider.
+
+    Requests are granted a slot only when a global concurrency slot is free
+    and both the request-rate and prompt-token buckets have capacity. Queued
+    requests are ordered by weighted fair queuing: each user accrues virtual
+    time proportional to the tokens they request divided by their weight, so
+    a user scripting hundreds of calls cannot starve everybody else. When the
+    queue is full new requests are rejected immediately with HTTP 429.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue_depth: int,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        user_weights: Optional[Dict[int, float]] = None,
+        queue_timeout: Optional[float] = None,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.user_weights = user_weights or {}
+        self.queue_timeout = queue_timeout
+        self.request_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self._queue: list[_Waiter] = []
+        self._active = 0
+        self._virtual_time = 0.0
+        self._last_finish: Dict[int, float] = {}
+        # (finish tag, user) min-heap, so users whose last tag the virtual
+        # clock has passed can be forgotten without scanning every user.
+        self._finish_heap: List[Tuple[float, int]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def _weight(self, user_id: int) -> float:
+        return max(self.user_weights.get(user_id, 1.0), 1e-6)
+
+    def _publish_gauges(self) -> None:
+        metrics.set_gauge("llm_queue_depth", len(self._queue))
+        metrics.set_gauge("llm_active_requests", self._active)
+
+    def _dispatch(self) -> None:
+        """Grant slots to queued waiters in fair order while capacity allows."""
+        self._timer = None
+        while self._queue and self._active < self.max_concurrency:
+            waiter = min(self._queue)
+            if waiter.future.done():
+                self._queue.remove(waiter)
+                continue
+            delay = max(self.request_bucket.delay_for(1), self.token_bucket.delay_for(waiter.cost))
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                break
+            self._queue.remove(waiter)
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(waiter.cost)
+            self._advance_virtual_time(waiter.finish_tag)
+            self._active += 1
+            waiter.future.set_result(None)
+        self._publish_gauges()
+
+    def _advance_virtual_time(self, virtual_time: float) -> None:
+        """Move the virtual clock and drop finish tags it has caught up with.
+
+        A tag at or before the clock no longer affects ``start_tag``, so
+        ``_last_finish`` only holds users with work still ahead of it.
+        """
+        self._virtual_time = virtual_time
+        while self._finish_heap and self._finish_heap[0][0] <= virtual_time:
+            finish_tag, user_id = heapq.heappop(self._finish_heap)
+            if self._last_finish.get(user_id) == finish_tag:
+                del self._last_finish[user_id]
+
+    def _release(self) -> None:
+        self._active -= 1
+        if self._timer is None:
+            self._dispatch()
+        else:
+            self._publish_gauges()
+
+    @asynccontextmanager
+    async def slot(self, user_id: int, estimated_tokens: int) -> AsyncIterator[None]:
+        """Wait for permission to call the LLM on behalf of ``user_id``."""
+        if len(self._queue) >= self.max_queue_depth:
+            metrics.inc("llm_requests_rejected_total", reason="queue_full")
+            logger.warning("LLM queue full user_id={} depth={}", user_id, len(self._queue))
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="LLM request queue is full, retry later",
+                headers={"Retry-After": "1"},
+            )
+
+        loop = asyncio.get_running_loop()
+        cost = float(max(estimated_tokens, 1))
+        start_tag = max(self._virtual_time, self._last_finish.get(user_id, 0.0))
+        finish_tag = start_tag + cost / self._weight(user_id)
+        self._last_finish[user_id] = finish_tag
+        heapq.heappush(self._finish_heap, (finish_tag, user_id))
+        waiter = _Waiter(finish_tag, next(self._sequence), user_id, cost, time.monotonic(), loop.create_future())
+        self._queue.append(waiter)
+        if self._timer is None:
+            self._dispatch()
+        else:
+            self._publish_gauges()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError as exc:
+            self._abandon(waiter)
+            metrics.inc("llm_requests_rejected_total", reason="queue_timeout")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Timed out waiting for LLM capacity",
+                headers={"Retry-After": "5"},
+            ) from exc
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+        waited = time.monotonic() - waiter.enqueued_at
+        metrics.observe("llm_queue_wait_seconds", waited)
+        logger.debug("LLM slot granted user_id={} waited={:.3f}s tokens={}", user_id, waited, int(cost))
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """Drop a waiter that gave up; hand back its slot if one was granted."""
+        if waiter.future.done() and not waiter.future.cancelled():
+            self._release()
+            return
+        waiter.future.cancel()
+        if waiter in self._queue:
+            self._queue.remove(waiter)
+        self._publish_gauges()
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Return the process-wide LLM scheduler, creating it on first use."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler(
+            max_concurrency=settings.llm_max_concurrency,
+            max_queue_depth=settings.llm_max_queue_depth,
+            requests_per_minute=settings.llm_requests_per_minute,
+            tokens_per_minute=settings.llm_tokens_per_minute,
+            user_weights={int(key): value for key, value in settings.llm_user_weights.items()},
+            queue_timeout=settings.llm_queue_timeout_seconds,
+        )
+    return _scheduler
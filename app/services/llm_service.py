@@ -1,27 +1,45 @@
 from __future__ import annotations
 
-from typing import List
+import re
+from typing import Any, List
 
-import google.generativeai as genai
 from loguru import logger
 
 from app.core.config import get_settings
+from app.core.tracing import current_span, traced
+from app.services.chunking import ChunkIndex, iter_chunk_spans
 
 settings = get_settings()
 
+_TERM_RE = re.compile(r"\w{3,}")
 
-def _ensure_client_initialised() -> None:
-    """Initialise the Gemini client lazily the first time it is required."""
+# Sentinel the map stage returns for excerpts that do not address the question.
+NO_RELEVANT_CONTENT = "NONE"
+
+
+def _ensure_client_initialised() -> Any:
+    """Import and initialise the Gemini SDK lazily the first time it is required.
+
+    The SDK pulls in gRPC and protobuf, so importing it on first use keeps
+    application startup fast.
+    """
     if not settings.gemini_api_key:
         raise RuntimeError("Gemini API key is not configured")
 
+    import google.generativeai as genai
+
     if not getattr(genai, "_client_configured", False):
         genai.configure(api_key=settings.gemini_api_key)
         setattr(genai, "_client_configured", True)
+    return genai
 
 
 def chunk_text(text: str, chunk_size: int = 2000, overlap: int = 200) -> List[str]:
-    """Split text into overlapping chunks so Gemini can handle long documents."""
+    """Split text into overlapping chunks so Gemini can handle long documents.
+
+    Prefer :class:`~app.services.chunking.ChunkIndex`, which keeps offsets
+    instead of copies; this helper materialises every chunk up front.
+    """
     logger.debug(
         "Chunking text for LLM processing length={} chunk_size={} overlap={}",
         len(text),
@@ -30,37 +48,92 @@ def chunk_text(text: str, chunk_size: int = 2000, overlap: int = 200) -> List[st
     )
     if len(text) <= chunk_size:
         return [text]
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = min(len(text), start + chunk_size)
-        chunks.append(text[start:end])
-        if end == len(text):
-            break
-        start = end - overlap
-    return chunks
-
-
-def build_prompt(context: str, question: str) -> str:
+    return [text[span.start : span.end] for span in iter_chunk_spans(text, chunk_size, overlap)]
+
+
+def rank_chunks(index: ChunkIndex, question: str) -> List[int]:
+    """Return chunk indices ordered by lexical overlap with the question, best first."""
+    terms = {term.lower() for term in _TERM_RE.findall(question)}
+    scores = [
+        sum(1 for match in index.finditer(_TERM_RE, position) if match.group().lower() in terms)
+        for position in range(len(index))
+    ]
+    return sorted(range(len(scores)), key=lambda position: (-scores[position], position))
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the Gemini token count of ``text`` (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def build_prompt(context: str, question: str, history: str = "") -> str:
     """Create a prompt for Gemini that embeds the document context and user question."""
+    conversation = f"Conversation so far:\n{history}\n" if history else ""
     return (
         "You are a helpful assistant that answers questions about the provided document.\n"
         "Document context:\n"
         f"{context}\n"
+        f"{conversation}"
         "User question:\n"
         f"{question}\n"
         "Provide a concise and accurate answer referencing the document."
     )
 
 
-def ask_gemini(context_chunks: List[str], question: str) -> str:
-    """Send a question to Gemini and normalise the returned content to plain text."""
-    _ensure_client_initialised()
-    prompt = build_prompt("\n\n".join(context_chunks), question)
+def build_summary_prompt(summary: str, transcript: str, max_chars: int) -> str:
+    """Create a prompt that folds new conversation turns into an existing summary."""
+    return (
+        "You maintain a running summary of a conversation about a document.\n"
+        "Current summary:\n"
+        f"{summary or '(empty)'}\n"
+        "New conversation turns:\n"
+        f"{transcript}\n"
+        f"Return an updated summary of at most {max_chars} characters that keeps facts, "
+        "names and open questions the user may refer back to."
+    )
+
+
+def build_map_prompt(context: str, question: str) -> str:
+    """Create a prompt that answers the question from a single excerpt of a larger document."""
+    return (
+        "You are reading one excerpt of a larger document.\n"
+        "Document excerpt:\n"
+        f"{context}\n"
+        "User question:\n"
+        f"{question}\n"
+        f"Answer using only this excerpt. If it contains nothing relevant, reply exactly {NO_RELEVANT_CONTENT}."
+    )
+
+
+def build_reduce_prompt(partial_answers: List[str], question: str, history: str = "") -> str:
+    """Create a prompt that combines partial answers from document excerpts into one answer."""
+    conversation = f"Conversation so far:\n{history}\n" if history else ""
+    numbered = "\n\n".join(f"Partial answer {index}:\n{answer}" for index, answer in enumerate(partial_answers, 1))
+    return (
+        "You are a helpful assistant that answers questions about the provided document.\n"
+        "The document was too large to read at once, so excerpts were answered separately.\n"
+        f"{numbered}\n"
+        f"{conversation}"
+        "User question:\n"
+        f"{question}\n"
+        "Combine the partial answers into one concise and accurate answer, resolving overlaps and contradictions."
+    )
+
+
+@traced("gemini.generate_content")
+def _generate(prompt: str) -> str:
+    """Run a single Gemini completion and normalise the returned content to plain text."""
+    genai = _ensure_client_initialised()
     model_name = settings.gemini_model or "gemini-1.5-flash-latest"
     model = genai.GenerativeModel(model_name)
-    logger.info("Sending prompt to Gemini model={} chunks={} question_length={}", model_name, len(context_chunks), len(question))
     response = model.generate_content(prompt)
+    usage = getattr(response, "usage_metadata", None)
+    current_span().set_attributes(
+        model=model_name,
+        prompt_chars=len(prompt),
+        prompt_tokens=getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt),
+        output_tokens=getattr(usage, "candidates_token_count", None),
+    )
 
     if getattr(response, "text", None):
         logger.debug("Received direct text response from Gemini length={}", len(response.text))
@@ -80,5 +153,39 @@ def ask_gemini(context_chunks: List[str], question: str) -> str:
             logger.debug("Aggregated {} parts from Gemini candidates", len(parts))
             return "\n".join(parts)
 
-    logger.error("Gemini response did not contain usable text model={} question_length={} chunks={}", model_name, len(question), len(context_chunks))
+    logger.error("Gemini response did not contain usable text model={} prompt_length={}", model_name, len(prompt))
     raise RuntimeError("Failed to generate response from Gemini")
+
+
+def ask_gemini(context_chunks: List[str], question: str, history: str = "") -> str:
+    """Send a question to Gemini and normalise the returned content to plain text."""
+    prompt = build_prompt("\n\n".join(context_chunks), question, history)
+    logger.info(
+        "Sending prompt to Gemini model={} chunks={} question_length={} history_length={}",
+        settings.gemini_model,
+        len(context_chunks),
+        len(question),
+        len(history),
+    )
+    return _generate(prompt)
+
+
+def summarize_conversation(summary: str, transcript: str, max_chars: int) -> str:
+    """Fold ``transcript`` into ``summary`` with Gemini, capping the result at ``max_chars``."""
+    prompt = build_summary_prompt(summary, transcript, max_chars)
+    logger.info("Summarising conversation summary_length={} transcript_length={}", len(summary), len(transcript))
+    return _generate(prompt).strip()[:max_chars]
+
+
+def answer_chunk_group(chunks: List[str], question: str) -> str:
+    """Map step: answer the question from one group of chunks."""
+    prompt = build_map_prompt("\n\n".join(chunks), question)
+    logger.debug("Sending map prompt to Gemini chunks={} prompt_length={}", len(chunks), len(prompt))
+    return _generate(prompt).strip()
+
+
+def combine_answers(partial_answers: List[str], question: str, history: str = "") -> str:
+    """Reduce step: merge partial answers into a single response."""
+    prompt = build_reduce_prompt(partial_answers, question, history)
+    logger.info("Sending reduce prompt to Gemini partials={} prompt_length={}", len(partial_answers), len(prompt))
+    return _generate(prompt)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Sized, TypeVar
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+T = TypeVar("T", bound=Sized)
+
+
+def group_chunks(chunks: Sequence[T], max_chars: int) -> List[List[T]]:
+    """Pack consecutive chunks into groups of at most ``max_chars`` characters.
+
+    Works on chunk strings as well as :class:`~app.services.chunking.TextSpan`
+    objects. A chunk longer than ``max_chars`` forms a group on its own.
+    """
+    groups: List[List[T]] = []
+    current: List[T] = []
+    size = 0
+    for chunk in chunks:
+        if current and size + len(chunk) > max_chars:
+            groups.append(current)
+            current, size = [], 0
+        current.append(chunk)
+        size += len(chunk)
+    if current:
+        groups.append(current)
+    return groups
+
+
+class PartialAnswerCache:
+    """LRU cache of map-stage answers keyed by chunk group content and question."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(pdf_id: str, chunks: List[str], question: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(pdf_id.encode("utf-8"))
+        for chunk in chunks:
+            digest.update(b"\0")
+            digest.update(chunk.encode("utf-8"))
+        digest.update(b"\1")
+        digest.update(" ".join(question.lower().split()).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_partial_answer_cache: Optional[PartialAnswerCache] = None
+
+
+def get_partial_answer_cache() -> PartialAnswerCache:
+    """Return the process-wide map-stage cache, creating it on first use."""
+    global _partial_answer_cache
+    if _partial_answer_cache is None:
+        _partial_answer_cache = PartialAnswerCache(settings.chat_map_cache_entries)
+    return _partial_answer_cache
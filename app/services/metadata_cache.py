@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+
+settings = get_settings()
+
+MetadataKey = Tuple[str, int]
+
+
+class MetadataCache:
+    """Process-local TTL + LRU cache of ``pdf_metadata`` documents keyed by ``(pdf_id, user_id)``.
+
+    ``PDFService`` replaces or drops an entry whenever it changes the
+    document. Entries also expire after ``ttl`` seconds, which bounds how
+    long a change made by another worker process can go unnoticed. Missing
+    documents are not cached, so a fresh upload is visible immediately.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[MetadataKey, Tuple[float, dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, pdf_id: str, user_id: int) -> Optional[dict[str, Any]]:
+        key = (pdf_id, user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self.clock():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                metrics.inc("pdf_metadata_cache_total", result="miss")
+                return None
+            self._entries.move_to_end(key)
+        metrics.inc("pdf_metadata_cache_total", result="hit")
+        return dict(entry[1])
+
+    def put(self, doc: dict[str, Any]) -> None:
+        value = {key: item for key, item in doc.items() if key != "_id"}
+        with self._lock:
+            key = (value["pdf_id"], value["user_id"])
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, pdf_id: str, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop((pdf_id, user_id), None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_metadata_cache: Optional[MetadataCache] = None
+
+
+def get_metadata_cache() -> Optional[MetadataCache]:
+    """Return the process-wide metadata cache, or None when disabled."""
+    global _metadata_cache
+    if _metadata_cache is None and settings.pdf_metadata_cache_entries > 0:
+        _metadata_cache = MetadataCache(settings.pdf_metadata_cache_entries, settings.pdf_metadata_cache_ttl_seconds)
+    return _metadata_cache
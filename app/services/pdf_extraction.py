@@ -0,0 +1,278 @@
+"""PDF text-extraction backends and the per-document fallback chain.
+
+PyPDF2 is always installed; ``pypdfium2`` and ``pdfminer.six`` are optional
+and are skipped when missing. Backends are tried in the configured order:
+a backend that raises or runs past the time box is abandoned, and one whose
+output looks empty or garbled is kept only as a last resort, so each
+document ends up with the first backend that handles it well.
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import io
+import mmap
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, List, Optional, Sequence, Set, cast
+
+from fastapi import HTTPException, status
+from loguru import logger
+
+from app.core.concurrency import BoundedExecutor
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.core.tracing import current_span, span, traced
+
+settings = get_settings()
+
+SourceOpener = Callable[[], BinaryIO]
+
+
+class MappedReader(io.RawIOBase):
+    """Seekable read-only stream over a shared memory map, with its own position.
+
+    Reads copy only the requested range, so several backends can read the
+    same mapping independently while the OS pages it in on demand.
+    ``on_close`` is called once the reader has let go of the mapping.
+    """
+
+    def __init__(self, buffer: mmap.mmap, on_close: Optional[Callable[["MappedReader"], None]] = None) -> None:
+        self._view = memoryview(buffer)
+        self._position = 0
+        self._on_close = on_close
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def readinto(self, target: Any) -> int:
+        chunk = self._view[self._position : self._position + len(target)]
+        target[: len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self._view.release()
+        super().close()
+        if self._on_close is not None:
+            self._on_close(self)
+
+
+@asynccontextmanager
+async def spooled_source(download: Any, directory: Optional[str] = None) -> AsyncIterator[SourceOpener]:
+    """Stream a GridFS download into an unlinked temp file and map it read-only.
+
+    Yields a ``SourceOpener`` for ``extract_pages``. Only one GridFS chunk is
+    held in Python memory at a time and the parsers read the file through
+    the page cache, so peak RSS no longer grows with the PDF size. The
+    mapping (and with it the unlinked spool file) is closed on exit, or,
+    if a backend abandoned after a timeout is still reading, as soon as its
+    reader is closed.
+    """
+    with tempfile.TemporaryFile(dir=directory, prefix="pdf-spool-") as spool:
+        size = 0
+        with span("gridfs.download") as download_span:
+            while chunk := await download.readchunk():
+                spool.write(chunk)
+                size += len(chunk)
+            download_span.set_attribute("bytes", size)
+        spool.flush()
+        if size == 0:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="PDF file is empty")
+        buffer = mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ)
+    metrics.observe("pdf_spool_bytes", size)
+    readers: Set[MappedReader] = set()
+    lock = threading.Lock()
+    exited = False
+
+    def release(reader: MappedReader) -> None:
+        with lock:
+            readers.discard(reader)
+            close_now = exited and not readers
+        if close_now:
+            buffer.close()
+
+    def open_source() -> BinaryIO:
+        reader = MappedReader(buffer, on_close=release)
+        with lock:
+            readers.add(reader)
+        return cast(BinaryIO, io.BufferedReader(reader))
+
+    try:
+        yield open_source
+    finally:
+        with lock:
+            exited = True
+            abandoned = len(readers)
+        if abandoned:
+            logger.debug("Keeping PDF spool mapped for abandoned extraction readers count={}", abandoned)
+        else:
+            buffer.close()
+
+
+class ExtractionBackend(ABC):
+    """Turns a PDF into one string per page. Subclasses import their library lazily."""
+
+    name = ""
+    module = ""
+
+    def available(self) -> bool:
+        return importlib.util.find_spec(self.module) is not None
+
+    @abstractmethod
+    def extract_pages(self, source: BinaryIO) -> List[str]:
+        """Return the text of each page of the PDF read from ``source``."""
+
+
+class PyPDF2Backend(ExtractionBackend):
+    name = "pypdf2"
+    module = "PyPDF2"
+
+    def extract_pages(self, source: BinaryIO) -> List[str]:
+        import PyPDF2
+
+        return [page.extract_text() or "" for page in PyPDF2.PdfReader(source).pages]
+
+
+class PdfiumBackend(ExtractionBackend):
+    name = "pypdfium2"
+    module = "pypdfium2"
+
+    def extract_pages(self, source: BinaryIO) -> List[str]:
+        import pypdfium2
+
+        document = pypdfium2.PdfDocument(source)
+        try:
+            pages = []
+            for page in document:
+                text_page = page.get_textpage()
+                pages.append(text_page.get_text_range().replace("\r\n", "\n"))
+                text_page.close()
+                page.close()
+            return pages
+        finally:
+            document.close()
+
+
+class PdfMinerBackend(ExtractionBackend):
+    name = "pdfminer"
+    module = "pdfminer"
+
+    def extract_pages(self, source: BinaryIO) -> List[str]:
+        from pdfminer.high_level import extract_pages
+        from pdfminer.layout import LTTextContainer
+
+        return [
+            "".join(element.get_text() for element in layout if isinstance(element, LTTextContainer))
+            for layout in extract_pages(source)
+        ]
+
+
+BACKENDS: Dict[str, ExtractionBackend] = {
+    backend.name: backend for backend in (PdfiumBackend(), PdfMinerBackend(), PyPDF2Backend())
+}
+
+
+@dataclass
+class ExtractionResult:
+    backend: str
+    pages: List[str]
+    seconds: float
+
+
+def text_quality(pages: List[str]) -> float:
+    """Score extracted text from 0 (empty or garbage) to 1 (plausible prose)."""
+    text = "".join(pages)
+    if not text.strip():
+        return 0.0
+    readable = sum(1 for char in text if char.isalnum() or char.isspace() or char in ".,;:'\"()-%$&/")
+    density = min(1.0, len(text.strip()) / (max(1, len(pages)) * settings.pdf_extraction_min_chars_per_page))
+    return density * readable / len(text)
+
+
+def _run_backend(backend: ExtractionBackend, open_source: SourceOpener) -> List[str]:
+    # Closing the stream releases its view of the mapping even if the
+    # backend's document object outlives this call.
+    with open_source() as source:
+        return backend.extract_pages(source)
+
+
+extraction_executor = BoundedExecutor(
+    "pdf-extract",
+    max_workers=settings.pdf_extraction_workers,
+    max_pending=settings.pdf_extraction_max_pending,
+)
+
+
+@traced("pdf.extract")
+async def extract_pages(
+    open_source: SourceOpener,
+    chain: Optional[Sequence[str]] = None,
+    timeout: Optional[float] = None,
+    min_quality: Optional[float] = None,
+) -> ExtractionResult:
+    """Extract page texts with the first backend in ``chain`` that succeeds with good output.
+
+    ``open_source`` must return a fresh binary stream on every call, because
+    an abandoned backend may still be reading its stream in the background.
+    ``timeout`` covers a backend's run time, not time spent queued for a
+    worker. Timed-out work cannot be interrupted; its thread finishes on its
+    own, keeping its executor slot until then, and the result is discarded.
+    """
+    chain = list(chain or settings.pdf_extraction_backends)
+    timeout = timeout if timeout is not None else settings.pdf_extraction_timeout_seconds
+    min_quality = min_quality if min_quality is not None else settings.pdf_extraction_min_quality
+    best: Optional[ExtractionResult] = None
+    best_quality = -1.0
+
+    for name in chain:
+        backend = BACKENDS.get(name)
+        if backend is None or not backend.available():
+            logger.debug("Skipping unavailable PDF extraction backend name={}", name)
+            continue
+        started = time.perf_counter()
+        try:
+            pages = await extraction_executor.run(_run_backend, backend, open_source, timeout=timeout)
+        except HTTPException:
+            raise
+        except asyncio.TimeoutError:
+            metrics.inc("pdf_extraction_failures_total", backend=name, reason="timeout")
+            logger.warning("PDF extraction timed out backend={} timeout={}s", name, timeout)
+            continue
+        except Exception as exc:
+            metrics.inc("pdf_extraction_failures_total", backend=name, reason="error")
+            logger.warning("PDF extraction failed backend={} error={}", name, exc)
+            continue
+        elapsed = time.perf_counter() - started
+        metrics.observe("pdf_extraction_seconds", elapsed, backend=name)
+
+        result = ExtractionResult(backend=name, pages=pages, seconds=elapsed)
+        quality = text_quality(pages)
+        current_span().set_attributes(backend=name, pages=len(pages), quality=round(quality, 3))
+        if quality >= min_quality:
+            return result
+        logger.info("PDF extraction output below quality threshold backend={} quality={:.2f}", name, quality)
+        if quality > best_quality:
+            best, best_quality = result, quality
+
+    if best is not None:
+        current_span().set_attributes(backend=best.backend, pages=len(best.pages), quality=round(best_quality, 3))
+        return best
+    raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Could not extract text from PDF")
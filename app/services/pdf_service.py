@@ -1,28 +1,112 @@
 from __future__ import annotations
 
+import asyncio
+import base64
+import json
+import posixpath
+import zipfile
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from io import BytesIO
-from typing import Any, List
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, List, Optional, Tuple, cast
 
-import PyPDF2
 from loguru import logger
 from bson import ObjectId
 from bson.errors import InvalidId
+from gridfs.errors import NoFile
 from fastapi import HTTPException, UploadFile, status
 
+from app.core.concurrency import ByteBudget
 from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.core.tracing import current_span, span, traced
 from app.schemas.pdf import PDFMetadata
+from app.services.chunking import ChunkIndex
+from app.services.metadata_cache import MetadataCache, get_metadata_cache
+from app.services.pdf_extraction import extract_pages, spooled_source
+from app.services.text_cache import SharedTextCache, get_text_cache
+from app.services.text_normalization import NormalizationStats, normalize_pages
 
 settings = get_settings()
 
+upload_budget = ByteBudget(
+    "upload",
+    capacity=settings.upload_memory_budget_bytes,
+    wait_timeout=settings.upload_budget_wait_seconds,
+)
+
+# Chunk-index loads in progress, shared so a chat arriving while /pdf-select is
+# still warming the document waits for that load instead of starting another.
+_loading: Dict[Tuple[str, int], "asyncio.Future[ChunkIndex]"] = {}
+
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed", "multipart/x-zip"}
+
+
+def _has_pdf_magic(source: BinaryIO) -> bool:
+    """Check the ``%PDF-`` signature and leave ``source`` positioned at the start.
+
+    Members of an archive read from a non-seekable stream cannot seek, so those are peeked.
+    """
+    if source.seekable():
+        source.seek(0)
+        magic = source.read(5)
+        source.seek(0)
+        return magic == b"%PDF-"
+    peek = getattr(source, "peek", None)
+    return peek is not None and peek(5)[:5] == b"%PDF-"
+
+# Only the fields exposed by ``PDFMetadata``; keeps ``_id`` and future large fields off the wire.
+PDF_METADATA_PROJECTION = {"_id": 0, "pdf_id": 1, "filename": 1, "upload_date": 1, "is_parsed": 1}
+
+
+@dataclass
+class ParsedDocument:
+    """Parsed PDF text plus the offset at which each page starts."""
+
+    text: str
+    page_offsets: List[int] = field(default_factory=list)
+    normalization: Optional[NormalizationStats] = None
+
+
+def _encode_cursor(upload_date: datetime, pdf_id: str) -> str:
+    raw = json.dumps([upload_date.isoformat(), pdf_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        upload_date, pdf_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(upload_date), str(pdf_id)
+    except (ValueError, TypeError) as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor") from exc
+
+
+
+async def touch_list_state(db: Any, user_id: int) -> None:
+    """Record that the user's PDF metadata changed so cached list responses go stale."""
+    await db.pdf_list_state.update_one(
+        {"user_id": user_id},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
 
 class PDFService:
     """Handle PDF storage and parsing operations."""
 
-    def __init__(self, db: Any, grid_fs: Any) -> None:
+    def __init__(
+        self,
+        db: Any,
+        grid_fs: Any,
+        text_cache: Optional[SharedTextCache] = None,
+        metadata_cache: Optional[MetadataCache] = None,
+    ) -> None:
         self.db = db
         self.grid_fs = grid_fs
+        self.text_cache = text_cache if text_cache is not None else get_text_cache()
+        self.metadata_cache = metadata_cache if metadata_cache is not None else get_metadata_cache()
 
+    @traced("pdf.upload")
     async def upload_pdf(self, file: UploadFile, user_id: int) -> PDFMetadata:
         logger.info("PDF upload requested filename={} user_id={}", file.filename, user_id)
         if file.content_type not in settings.allowed_file_types:
@@ -35,32 +119,26 @@ class PDFService:
             )
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Only PDF files are allowed")
 
-        contents = await file.read()
-        file_size = len(contents)
-        if file_size > settings.max_file_size:
-            logger.warning(
-                "Rejected upload exceeding size limit filename={} user_id={} size={} limit={}",
-                file.filename,
-                user_id,
-                file_size,
-                settings.max_file_size,
-            )
+        if file.size is not None and file.size > settings.max_file_size:
+            self._log_oversized(file.filename, user_id, file.size)
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File exceeds size limit")
 
-        file_id = await self.grid_fs.upload_from_stream(
-            file.filename,
-            BytesIO(contents),
-            metadata={"user_id": user_id, "filename": file.filename},
-        )
-
-        metadata = {
-            "pdf_id": str(file_id),
-            "user_id": user_id,
-            "filename": file.filename,
-            "upload_date": datetime.now(timezone.utc),
-            "is_parsed": False,
-        }
+        # Hold a share of the upload budget while the body sits in memory, so a
+        # burst of uploads waits (or gets a 503) instead of exhausting RAM.
+        reservation = file.size if file.size is not None else settings.max_file_size + 1
+        async with upload_budget.reserve(reservation):
+            contents = await file.read(settings.max_file_size + 1)
+            file_size = len(contents)
+            if file_size > settings.max_file_size:
+                self._log_oversized(file.filename, user_id, file_size)
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File exceeds size limit")
+            metadata = await self._store_file(cast(str, file.filename), BytesIO(contents), user_id)
+            del contents
+        current_span().set_attributes(bytes=file_size, pdf_id=metadata["pdf_id"])
         await self.db.pdf_metadata.insert_one(metadata)
+        await self._touch_list_state(user_id)
+        if self.metadata_cache is not None:
+            self.metadata_cache.put(metadata)
         logger.info(
             "Stored PDF pdf_id={} filename={} user_id={} size={} bytes",
             metadata["pdf_id"],
@@ -70,17 +148,209 @@ class PDFService:
         )
         return PDFMetadata(**metadata)
 
-    async def list_pdfs(self, user_id: int) -> List[PDFMetadata]:
-        cursor = self.db.pdf_metadata.find({"user_id": user_id})
-        results: List[PDFMetadata] = []
-        async for doc in cursor:
-            doc.pop("_id", None)
-            results.append(PDFMetadata(**doc))
-        logger.info("Retrieved {} PDFs for user_id={}", len(results), user_id)
+    @staticmethod
+    def _log_oversized(filename: Optional[str], user_id: int, size: int) -> None:
+        logger.warning(
+            "Rejected upload exceeding size limit filename={} user_id={} size={} limit={}",
+            filename,
+            user_id,
+            size,
+            settings.max_file_size,
+        )
+
+    async def _store_file(self, filename: str, source: BinaryIO, user_id: int) -> dict[str, Any]:
+        """Stream ``source`` into GridFS and return the metadata document to insert."""
+        with span("gridfs.upload", filename=filename):
+            file_id = await self.grid_fs.upload_from_stream(
+                filename,
+                source,
+                metadata={"user_id": user_id, "filename": filename},
+            )
+        return {
+            "pdf_id": str(file_id),
+            "user_id": user_id,
+            "filename": filename,
+            "upload_date": datetime.now(timezone.utc),
+            "is_parsed": False,
+        }
+
+    @traced("pdf.upload_bulk")
+    async def bulk_upload(self, files: List[UploadFile], user_id: int) -> List[dict[str, Any]]:
+        """Store many PDFs, given directly or inside ZIP archives, and report per-file results.
+
+        Files stream into GridFS from the request's spooled temp files (or
+        straight out of the archive) with at most ``bulk_upload_concurrency``
+        writes in flight; the metadata of every stored file is then inserted
+        with a single ``insert_many``. Invalid entries are reported as
+        ``rejected`` without failing the batch.
+        """
+        results: List[dict[str, Any]] = []
+        # (index into results, filename, size, opener, whether we own and must close the stream)
+        pending: List[Tuple[int, str, int, Callable[[], BinaryIO], bool]] = []
+
+        def reject(filename: str, detail: str) -> None:
+            results.append({"filename": filename, "status": "rejected", "pdf_id": None, "detail": detail})
+
+        for upload in files:
+            filename = upload.filename or "upload.pdf"
+            if upload.content_type in ZIP_CONTENT_TYPES or filename.lower().endswith(".zip"):
+                try:
+                    archive = zipfile.ZipFile(upload.file)
+                except zipfile.BadZipFile:
+                    reject(filename, "Invalid ZIP archive")
+                    continue
+                for info in archive.infolist():
+                    name = posixpath.basename(info.filename)
+                    if info.is_dir() or info.filename.startswith("__MACOSX/") or not name:
+                        continue
+                    if not name.lower().endswith(".pdf"):
+                        reject(name, "Only PDF files are allowed")
+                    elif info.file_size > settings.max_file_size:
+                        reject(name, "File exceeds size limit")
+                    else:
+                        opener = lambda archive=archive, info=info: cast(BinaryIO, archive.open(info))  # noqa: E731
+                        pending.append((len(results), name, info.file_size, opener, True))
+                        results.append({"filename": name, "status": "pending", "pdf_id": None, "detail": None})
+            elif upload.content_type not in settings.allowed_file_types:
+                reject(filename, "Only PDF files are allowed")
+            elif (upload.size or 0) > settings.max_file_size:
+                reject(filename, "File exceeds size limit")
+            else:
+                pending.append((len(results), filename, upload.size or 0, lambda upload=upload: upload.file, False))
+                results.append({"filename": filename, "status": "pending", "pdf_id": None, "detail": None})
+
+        if len(results) > settings.bulk_upload_max_files:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {settings.bulk_upload_max_files} files can be uploaded at once",
+            )
+
+        semaphore = asyncio.Semaphore(settings.bulk_upload_concurrency)
+
+        async def store(
+            index: int, filename: str, size: int, opener: Callable[[], BinaryIO], owned: bool
+        ) -> Optional[dict[str, Any]]:
+            async with semaphore:
+                try:
+                    async with upload_budget.reserve(size):
+                        source = opener()
+                        try:
+                            if not _has_pdf_magic(source):
+                                results[index].update(status="rejected", detail="Not a PDF file")
+                                return None
+                            return await self._store_file(filename, source, user_id)
+                        finally:
+                            if owned:
+                                source.close()
+                except HTTPException as exc:
+                    results[index].update(status="failed", detail=exc.detail)
+                except Exception as exc:
+                    logger.warning("Bulk upload entry failed filename={} user_id={} error={}", filename, user_id, exc)
+                    results[index].update(status="failed", detail="Could not store file")
+                return None
+
+        stored = await asyncio.gather(*(store(*item) for item in pending))
+        documents = [(index, doc) for (index, *_), doc in zip(pending, stored) if doc is not None]
+        if documents:
+            try:
+                await self.db.pdf_metadata.insert_many([doc for _, doc in documents], ordered=True)
+            except Exception as exc:
+                logger.error("Bulk metadata insert failed user_id={} files={} error={}", user_id, len(documents), exc)
+                for index, doc in documents:
+                    results[index].update(status="failed", detail="Could not store metadata")
+                    await self._delete_gridfs_file(doc["pdf_id"])
+                documents = []
+            else:
+                await self._touch_list_state(user_id)
+                if self.metadata_cache is not None:
+                    for _, doc in documents:
+                        self.metadata_cache.put(doc)
+        for index, doc in documents:
+            results[index].update(status="stored", pdf_id=doc["pdf_id"])
+        current_span().set_attributes(files=len(results), stored=len(documents))
+        logger.info(
+            "Bulk upload finished user_id={} files={} stored={}",
+            user_id,
+            len(results),
+            len(documents),
+        )
         return results
 
-    async def parse_pdf(self, pdf_id: str, user_id: int) -> str:
-        metadata = await self.db.pdf_metadata.find_one({"pdf_id": pdf_id, "user_id": user_id})
+    async def _delete_gridfs_file(self, pdf_id: str) -> None:
+        try:
+            await self.grid_fs.delete(ObjectId(pdf_id))
+        except Exception as exc:  # pragma: no cover - retention GC removes leftovers
+            logger.warning("Could not remove GridFS file pdf_id={} error={}", pdf_id, exc)
+
+    async def parse_many(self, pdf_ids: List[str], user_id: int) -> None:
+        """Parse PDFs one after another, logging failures; meant for background tasks."""
+        for pdf_id in pdf_ids:
+            try:
+                await self.parse_pdf(pdf_id, user_id)
+            except Exception as exc:
+                logger.warning("Background parse failed pdf_id={} user_id={} error={}", pdf_id, user_id, exc)
+
+    @traced("mongo.pdf_metadata.find")
+    async def list_pdf_page(
+        self,
+        user_id: int,
+        limit: int,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[dict[str, Any]], Optional[str]]:
+        """Return one page of the user's PDFs, newest first, and the cursor for the next page."""
+        query: dict[str, Any] = {"user_id": user_id}
+        if cursor is not None:
+            upload_date, last_pdf_id = _decode_cursor(cursor)
+            query["$or"] = [
+                {"upload_date": {"$lt": upload_date}},
+                {"upload_date": upload_date, "pdf_id": {"$lt": last_pdf_id}},
+            ]
+        mongo_cursor = (
+            self.db.pdf_metadata.find(query, PDF_METADATA_PROJECTION)
+            .sort([("upload_date", -1), ("pdf_id", -1)])
+            .limit(limit + 1)
+            .batch_size(min(settings.pdf_list_batch_size, limit + 1))
+        )
+        results = [doc async for doc in mongo_cursor]
+        next_cursor = None
+        if len(results) > limit:
+            results = results[:limit]
+            next_cursor = _encode_cursor(results[-1]["upload_date"], results[-1]["pdf_id"])
+        for doc in results:
+            doc.setdefault("is_parsed", False)
+        logger.info("Retrieved {} PDFs for user_id={} has_more={}", len(results), user_id, next_cursor is not None)
+        current_span().set_attribute("items", len(results))
+        return results, next_cursor
+
+    async def get_list_state(self, user_id: int) -> dict[str, Any]:
+        """Return the user's PDF list version and last-change time for conditional requests."""
+        state = await self.db.pdf_list_state.find_one({"user_id": user_id})
+        if state is None:
+            # Users whose PDFs predate change tracking start at version 0.
+            now = datetime.now(timezone.utc)
+            await self.db.pdf_list_state.update_one(
+                {"user_id": user_id},
+                {"$setOnInsert": {"version": 0, "updated_at": now}},
+                upsert=True,
+            )
+            state = await self.db.pdf_list_state.find_one({"user_id": user_id}) or {"version": 0, "updated_at": now}
+        updated_at = state["updated_at"]
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        return {"version": state.get("version", 0), "updated_at": updated_at}
+
+    async def _touch_list_state(self, user_id: int) -> None:
+        await touch_list_state(self.db, user_id)
+
+    @traced("pdf.parse")
+    async def parse_pdf(self, pdf_id: str, user_id: int) -> ParsedDocument:
+        """Extract, normalize and store the PDF's text.
+
+        Repeated headers/footers, page numbers and hyphenated line breaks are
+        stripped unless ``pdf_normalize_text`` is off; ``pdf_keep_raw_text``
+        additionally stores the unmodified extraction as ``raw_text``.
+        """
+        metadata = await self._get_metadata(pdf_id, user_id)
         if not metadata:
             logger.warning("Parse requested for missing PDF pdf_id={} user_id={}", pdf_id, user_id)
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="PDF not found")
@@ -92,32 +362,202 @@ class PDFService:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid PDF identifier") from exc
 
         stream = await self.grid_fs.open_download_stream(object_id)
-        contents = await stream.read()
-        reader = PyPDF2.PdfReader(BytesIO(contents))
-        text = "\n".join(page.extract_text() or "" for page in reader.pages)
-
-        await self.db.pdf_texts.update_one(
-            {"pdf_id": pdf_id, "user_id": user_id},
-            {"$set": {"text": text, "parsed_at": datetime.now(timezone.utc)}},
-            upsert=True,
-        )
+        async with spooled_source(stream, settings.pdf_spool_dir) as open_source:
+            extraction = await extract_pages(open_source)
+        raw_pages = extraction.pages
+        stats: Optional[NormalizationStats] = None
+        pages = raw_pages
+        if settings.pdf_normalize_text:
+            normalized = normalize_pages(
+                raw_pages,
+                min_pages=settings.pdf_boilerplate_min_pages,
+                page_ratio=settings.pdf_boilerplate_page_ratio,
+            )
+            pages, stats = normalized.pages, normalized.stats
+        page_offsets: List[int] = []
+        offset = 0
+        for page_text in pages:
+            page_offsets.append(offset)
+            offset += len(page_text) + 1
+        text = "\n".join(pages)
+
+        fields: dict[str, Any] = {
+            "text": text,
+            "page_offsets": page_offsets,
+            "parsed_at": datetime.now(timezone.utc),
+            "extraction_backend": extraction.backend,
+        }
+        update: dict[str, Any] = {"$set": fields}
+        if stats is not None:
+            fields["normalization"] = stats.as_dict()
+        if settings.pdf_keep_raw_text and stats is not None:
+            fields["raw_text"] = "\n".join(raw_pages)
+        else:
+            update["$unset"] = {"raw_text": ""}
+        with span("mongo.pdf_texts.update_one", chars=len(text)):
+            await self.db.pdf_texts.update_one({"pdf_id": pdf_id, "user_id": user_id}, update, upsert=True)
         await self.db.pdf_metadata.update_one({"pdf_id": pdf_id}, {"$set": {"is_parsed": True}})
-        logger.info("Parsed PDF successfully pdf_id={} user_id={} text_length={}", pdf_id, user_id, len(text))
-        return text
+        await self._touch_list_state(user_id)
+        if self.metadata_cache is not None:
+            self.metadata_cache.invalidate(pdf_id, user_id)
+        if self.text_cache is not None:
+            self.text_cache.invalidate(pdf_id, user_id)
+        # Later requests must not join a load that may have read the old text.
+        _loading.pop((pdf_id, user_id), None)
+        current_span().set_attributes(
+            pdf_id=pdf_id,
+            backend=extraction.backend,
+            pages=len(raw_pages),
+            chars=len(text),
+            bytes_saved=stats.bytes_saved if stats else 0,
+        )
+        if stats is not None:
+            metrics.inc("pdf_normalization_bytes_saved_total", stats.bytes_saved)
+            metrics.inc("pdf_normalization_tokens_saved_total", stats.tokens_saved)
+        logger.info(
+            "Parsed PDF successfully pdf_id={} user_id={} backend={} pages={} seconds={:.3f} text_length={} "
+            "bytes_saved={} tokens_saved={}",
+            pdf_id,
+            user_id,
+            extraction.backend,
+            len(raw_pages),
+            extraction.seconds,
+            len(text),
+            stats.bytes_saved if stats else 0,
+            stats.tokens_saved if stats else 0,
+        )
+        return ParsedDocument(text=text, page_offsets=page_offsets, normalization=stats)
 
-    async def get_parsed_text(self, pdf_id: str, user_id: int) -> str:
+    @traced("mongo.pdf_texts.find_one")
+    async def get_parsed_document(self, pdf_id: str, user_id: int) -> ParsedDocument:
         doc = await self.db.pdf_texts.find_one({"pdf_id": pdf_id, "user_id": user_id})
         if not doc:
             logger.warning("Parsed text requested before parsing pdf_id={} user_id={}", pdf_id, user_id)
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="PDF not parsed yet")
         logger.debug("Retrieved parsed text for pdf_id={} user_id={}", pdf_id, user_id)
-        return doc["text"]
+        current_span().set_attributes(pdf_id=pdf_id, chars=len(doc["text"]))
+        return ParsedDocument(text=doc["text"], page_offsets=doc.get("page_offsets") or [])
+
+    @traced("pdf.chunk_index")
+    async def get_chunk_index(self, pdf_id: str, user_id: int) -> ChunkIndex:
+        """Return chunk spans over the parsed text, served from the shared cache when possible."""
+        if self.text_cache is not None:
+            cached = self.text_cache.get(pdf_id, user_id)
+            if cached is not None:
+                logger.debug("Serving parsed text from shared cache pdf_id={} user_id={}", pdf_id, user_id)
+                current_span().set_attributes(pdf_id=pdf_id, cache_hit=True, chunks=len(cached))
+                return cached
+
+        key = (pdf_id, user_id)
+        load = _loading.get(key)
+        if load is None:
+            load = asyncio.ensure_future(self._load_chunk_index(pdf_id, user_id))
+            _loading[key] = load
+            load.add_done_callback(lambda done: _loading.pop(key) if _loading.get(key) is done else None)
+        else:
+            metrics.inc("pdf_chunk_index_loads_joined_total")
+        # Shielded so one cancelled request does not abort a load others wait on.
+        index = await asyncio.shield(load)
+        current_span().set_attributes(pdf_id=pdf_id, cache_hit=False, chunks=len(index))
+        return index
+
+    async def _load_chunk_index(self, pdf_id: str, user_id: int) -> ChunkIndex:
+        # Read before the text, so a reparse finishing mid-load is detected on put.
+        generation = self.text_cache.generation(pdf_id, user_id) if self.text_cache is not None else 0
+        document = await self.get_parsed_document(pdf_id, user_id)
+        index = ChunkIndex.build(document.text, page_starts=document.page_offsets)
+        if self.text_cache is not None:
+            try:
+                await asyncio.to_thread(self.text_cache.put, pdf_id, user_id, index, generation)
+            except OSError as exc:
+                logger.warning("Could not cache parsed text pdf_id={} user_id={} error={}", pdf_id, user_id, exc)
+        return index
+
+    async def warm_documents(self, pdf_ids: List[str], user_id: int) -> None:
+        """Load selected PDFs into the text cache ahead of the first chat; meant for background tasks.
+
+        After warming, each document's chunk index is mapped in this process,
+        so the next ``get_chunk_index`` needs no Mongo round-trip. Unparsed
+        documents are skipped.
+        """
+        if self.text_cache is None:
+            return
+        for pdf_id in pdf_ids:
+            if self.text_cache.get(pdf_id, user_id) is not None:
+                metrics.inc("pdf_warm_total", result="cached")
+                continue
+            try:
+                await self.get_chunk_index(pdf_id, user_id)
+            except HTTPException:
+                metrics.inc("pdf_warm_total", result="skipped")
+                logger.debug("Skipped warming unparsed PDF pdf_id={} user_id={}", pdf_id, user_id)
+                continue
+            except Exception as exc:
+                metrics.inc("pdf_warm_total", result="error")
+                logger.warning("Warming PDF text failed pdf_id={} user_id={} error={}", pdf_id, user_id, exc)
+                continue
+            # Map the freshly written file now rather than on the first chat.
+            self.text_cache.get(pdf_id, user_id)
+            metrics.inc("pdf_warm_total", result="loaded")
+            logger.debug("Warmed parsed text pdf_id={} user_id={}", pdf_id, user_id)
+
+    async def mark_selected(self, pdf_ids: List[str], user_id: int) -> None:
+        """Record when PDFs were last selected; retention uses it to find idle parsed text.
 
+        Only retention reads ``last_selected_at``, straight from MongoDB, so
+        cached metadata stays valid.
+        """
+        await self.db.pdf_metadata.update_many(
+            {"user_id": user_id, "pdf_id": {"$in": pdf_ids}},
+            {"$set": {"last_selected_at": datetime.now(timezone.utc)}},
+        )
+
+    async def open_pdf_file(self, pdf_id: str, user_id: int) -> Tuple[PDFMetadata, Any]:
+        """Return the PDF's metadata and an open GridFS stream, after checking ownership."""
+        metadata = await self.ensure_pdf_owned_by_user(pdf_id, user_id)
+        try:
+            return metadata, await self.grid_fs.open_download_stream(ObjectId(pdf_id))
+        except InvalidId as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid PDF identifier") from exc
+        except NoFile as exc:
+            logger.error("PDF metadata without GridFS file pdf_id={} user_id={}", pdf_id, user_id)
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="PDF not found") from exc
+
+    @staticmethod
+    async def iter_file_range(grid_out: Any, start: int, end: int) -> AsyncIterator[bytes]:
+        """Yield bytes ``start..end`` (inclusive) of a GridFS file, one stored chunk at a time."""
+        grid_out.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            # readchunk returns the rest of the GridFS chunk holding the current position.
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            if len(chunk) > remaining:
+                chunk = chunk[:remaining]
+            remaining -= len(chunk)
+            yield chunk
+
+    async def _get_metadata(self, pdf_id: str, user_id: int) -> Optional[dict[str, Any]]:
+        """Return the user's metadata document for ``pdf_id`` (without ``_id``), cached when possible."""
+        if self.metadata_cache is not None:
+            cached = self.metadata_cache.get(pdf_id, user_id)
+            if cached is not None:
+                return cached
+        with span("mongo.pdf_metadata.find_one"):
+            doc = await self.db.pdf_metadata.find_one({"pdf_id": pdf_id, "user_id": user_id})
+        if doc is None:
+            return None
+        doc.pop("_id", None)
+        if self.metadata_cache is not None:
+            self.metadata_cache.put(doc)
+        return doc
+
+    @traced("pdf.ownership_check")
     async def ensure_pdf_owned_by_user(self, pdf_id: str, user_id: int) -> PDFMetadata:
-        doc = await self.db.pdf_metadata.find_one({"pdf_id": pdf_id, "user_id": user_id})
+        doc = await self._get_metadata(pdf_id, user_id)
         if not doc:
             logger.warning("Ownership check failed pdf_id={} user_id={}", pdf_id, user_id)
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="PDF not found")
-        doc.pop("_id", None)
         logger.debug("Verified PDF ownership pdf_id={} user_id={}", pdf_id, user_id)
         return PDFMetadata(**doc)
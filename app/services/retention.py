@@ -0,0 +1,334 @@
+"""Retention and compaction for chat history, parsed texts and GridFS blobs.
+
+Run once from the command line (``--dry-run`` only reports)::
+
+    python -m app.services.retention [--dry-run]
+
+or set ``RETENTION_INTERVAL_MINUTES`` to run it inside the API process;
+a MongoDB lease ensures only one worker runs it per interval.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import os
+import socket
+from collections import Counter
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, Optional, Set
+
+import orjson
+from bson import ObjectId
+from loguru import logger
+from pymongo.errors import DuplicateKeyError
+from sqlalchemy import case
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.models.chat import ChatMessage, ChatSession
+from app.models.user import User
+from app.services.metadata_cache import get_metadata_cache
+from app.services.pdf_service import touch_list_state
+from app.services.text_cache import SharedTextCache, get_text_cache
+
+settings = get_settings()
+
+_LEASE_ID = "retention"
+
+
+@dataclass
+class RetentionReport:
+    """What a retention run removed (or would remove, for a dry run)."""
+
+    dry_run: bool = False
+    chat_messages_deleted: int = 0
+    chat_messages_archived: int = 0
+    chat_sessions_deleted: int = 0
+    chat_bytes: int = 0
+    texts_deleted: int = 0
+    text_bytes: int = 0
+    gridfs_files_deleted: int = 0
+    gridfs_bytes: int = 0
+
+    @property
+    def reclaimed_bytes(self) -> int:
+        return self.chat_bytes + self.text_bytes + self.gridfs_bytes
+
+    def as_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "reclaimed_bytes": self.reclaimed_bytes}
+
+
+class RetentionService:
+    """Apply the configured retention policies.
+
+    * chat messages older than ``retention_chat_days`` are archived (when
+      ``retention_archive_dir`` is set) and deleted, along with sessions
+      left empty;
+    * parsed texts whose PDF metadata is gone, or whose PDF has not been
+      selected for ``retention_text_idle_days`` and is not currently
+      selected by anyone, are dropped (the PDF can be parsed again);
+    * GridFS files without ``pdf_metadata`` that are older than the grace
+      period (so in-flight uploads are left alone) are deleted.
+
+    Work is done in batches of ``retention_batch_size`` so no single
+    statement holds locks or memory proportional to the backlog.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        mongo_db: Any,
+        grid_fs: Any,
+        text_cache: Optional[SharedTextCache] = None,
+        archive_dir: Optional[str] = None,
+        batch_size: Optional[int] = None,
+    ) -> None:
+        self.db = db
+        self.mongo_db = mongo_db
+        self.grid_fs = grid_fs
+        self.text_cache = text_cache if text_cache is not None else get_text_cache()
+        self.archive_dir = archive_dir if archive_dir is not None else settings.retention_archive_dir
+        self.batch_size = batch_size or settings.retention_batch_size
+
+    async def run(self, dry_run: bool = False, now: Optional[datetime] = None) -> RetentionReport:
+        now = now or datetime.now(timezone.utc)
+        report = RetentionReport(dry_run=dry_run)
+        if settings.retention_chat_days > 0:
+            cutoff = now - timedelta(days=settings.retention_chat_days)
+            await asyncio.to_thread(self._purge_chat_history, cutoff, report, now)
+        await self._purge_texts(now, report)
+        await self._collect_gridfs_orphans(now - timedelta(minutes=settings.retention_orphan_grace_minutes), report)
+
+        if not dry_run:
+            metrics.inc("retention_reclaimed_bytes_total", report.chat_bytes, kind="chat_messages")
+            metrics.inc("retention_reclaimed_bytes_total", report.text_bytes, kind="pdf_texts")
+            metrics.inc("retention_reclaimed_bytes_total", report.gridfs_bytes, kind="gridfs")
+        logger.info("Retention run finished {}", report.as_dict())
+        return report
+
+    def _purge_chat_history(self, cutoff: datetime, report: RetentionReport, now: datetime) -> None:
+        archive = None
+        if self.archive_dir and not report.dry_run:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            path = os.path.join(self.archive_dir, f"chat-messages-{now:%Y%m%dT%H%M%S}.ndjson.gz")
+            archive = gzip.open(path, "ab")
+        try:
+            last_id = 0
+            while True:
+                rows = (
+                    self.db.query(
+                        ChatMessage.id,
+                        ChatMessage.session_id,
+                        ChatMessage.user_id,
+                        ChatMessage.role,
+                        ChatMessage.content,
+                        ChatMessage.created_at,
+                    )
+                    .filter(ChatMessage.created_at < cutoff, ChatMessage.id > last_id)
+                    .order_by(ChatMessage.id.asc())
+                    .limit(self.batch_size)
+                    .all()
+                )
+                if not rows:
+                    break
+                last_id = rows[-1].id
+                report.chat_messages_deleted += len(rows)
+                report.chat_bytes += sum(len(row.content.encode("utf-8")) for row in rows)
+                if report.dry_run:
+                    continue
+                if archive is not None:
+                    archive.write(b"".join(orjson.dumps(row._asdict()) + b"\n" for row in rows))
+                    report.chat_messages_archived += len(rows)
+                self._delete_messages(rows)
+
+            sessions = self.db.query(ChatSession).filter(ChatSession.created_at < cutoff, ~ChatSession.messages.any())
+            if report.dry_run:
+                report.chat_sessions_deleted = sessions.count()
+            else:
+                report.chat_sessions_deleted = sessions.delete(synchronize_session=False)
+                self.db.commit()
+        finally:
+            if archive is not None:
+                archive.close()
+
+    def _delete_messages(self, rows: List[Any]) -> None:
+        self.db.query(ChatMessage).filter(ChatMessage.id.in_([row.id for row in rows])).delete(
+            synchronize_session=False
+        )
+        # Purged messages are the oldest of their session, i.e. the ones already
+        # folded into the summary; keep the memory window's offset pointing at
+        # the same surviving message.
+        for session_id, removed in Counter(row.session_id for row in rows).items():
+            self.db.query(ChatSession).filter(ChatSession.id == session_id).update(
+                {
+                    ChatSession.summarized_count: case(
+                        (ChatSession.summarized_count > removed, ChatSession.summarized_count - removed),
+                        else_=0,
+                    )
+                },
+                synchronize_session=False,
+            )
+        self.db.commit()
+
+    def _selected_pdf_ids(self) -> Set[str]:
+        selected: Set[str] = set()
+        for pdf_id, pdf_ids in self.db.query(User.selected_pdf_id, User.selected_pdf_ids).filter(
+            User.selected_pdf_id.isnot(None)
+        ):
+            selected.add(pdf_id)
+            selected.update(pdf_ids or [])
+        return selected
+
+    async def _purge_texts(self, now: datetime, report: RetentionReport) -> None:
+        victims: List[tuple[str, int]] = []
+
+        # Texts whose metadata no longer exists.
+        texts = self.mongo_db.pdf_texts.find({}, {"pdf_id": 1, "user_id": 1}).batch_size(self.batch_size)
+        page: List[dict[str, Any]] = []
+        async for doc in texts:
+            page.append(doc)
+            if len(page) >= self.batch_size:
+                victims.extend(await self._orphaned_texts(page))
+                page = []
+        if page:
+            victims.extend(await self._orphaned_texts(page))
+
+        # Texts of PDFs nobody has selected recently.
+        if settings.retention_text_idle_days > 0:
+            idle_cutoff = now - timedelta(days=settings.retention_text_idle_days)
+            selected = await asyncio.to_thread(self._selected_pdf_ids)
+            idle = self.mongo_db.pdf_metadata.find(
+                {
+                    "is_parsed": True,
+                    "$or": [
+                        {"last_selected_at": {"$lt": idle_cutoff}},
+                        {"last_selected_at": {"$exists": False}, "upload_date": {"$lt": idle_cutoff}},
+                    ],
+                },
+                {"pdf_id": 1, "user_id": 1},
+            ).batch_size(self.batch_size)
+            victims.extend([(doc["pdf_id"], doc["user_id"]) async for doc in idle if doc["pdf_id"] not in selected])
+
+        for pdf_id, user_id in victims:
+            # Let the server measure the text instead of shipping it here.
+            sizes = await self.mongo_db.pdf_texts.aggregate(
+                [
+                    {"$match": {"pdf_id": pdf_id, "user_id": user_id}},
+                    {"$limit": 1},
+                    {"$project": {"bytes": {"$strLenBytes": {"$ifNull": ["$text", ""]}}}},
+                ]
+            ).to_list(length=1)
+            if not sizes:
+                continue
+            report.texts_deleted += 1
+            report.text_bytes += sizes[0]["bytes"]
+            if report.dry_run:
+                continue
+            await self.mongo_db.pdf_texts.delete_one({"pdf_id": pdf_id, "user_id": user_id})
+            await self.mongo_db.pdf_metadata.update_one(
+                {"pdf_id": pdf_id, "user_id": user_id}, {"$set": {"is_parsed": False}}
+            )
+            await touch_list_state(self.mongo_db, user_id)
+            if self.text_cache is not None:
+                self.text_cache.invalidate(pdf_id, user_id)
+            metadata_cache = get_metadata_cache()
+            if metadata_cache is not None:
+                metadata_cache.invalidate(pdf_id, user_id)
+
+    async def _orphaned_texts(self, docs: List[dict[str, Any]]) -> List[tuple[str, int]]:
+        pdf_ids = [doc["pdf_id"] for doc in docs]
+        known = {
+            doc["pdf_id"]
+            async for doc in self.mongo_db.pdf_metadata.find({"pdf_id": {"$in": pdf_ids}}, {"pdf_id": 1})
+        }
+        return [(doc["pdf_id"], doc["user_id"]) for doc in docs if doc["pdf_id"] not in known]
+
+    async def _collect_gridfs_orphans(self, older_than: datetime, report: RetentionReport) -> None:
+        files = self.mongo_db.fs.files.find(
+            {"uploadDate": {"$lt": older_than}}, {"_id": 1, "length": 1}
+        ).batch_size(self.batch_size)
+        page: List[dict[str, Any]] = []
+        async for doc in files:
+            page.append(doc)
+            if len(page) >= self.batch_size:
+                await self._delete_gridfs_orphans(page, report)
+                page = []
+        if page:
+            await self._delete_gridfs_orphans(page, report)
+
+    async def _delete_gridfs_orphans(self, files: List[dict[str, Any]], report: RetentionReport) -> None:
+        pdf_ids = [str(doc["_id"]) for doc in files]
+        known = {
+            doc["pdf_id"]
+            async for doc in self.mongo_db.pdf_metadata.find({"pdf_id": {"$in": pdf_ids}}, {"pdf_id": 1})
+        }
+        for doc in files:
+            if str(doc["_id"]) in known:
+                continue
+            report.gridfs_files_deleted += 1
+            report.gridfs_bytes += doc.get("length", 0)
+            if not report.dry_run:
+                await self.grid_fs.delete(ObjectId(doc["_id"]))
+
+
+async def _acquire_lease(mongo_db: Any, ttl: timedelta) -> bool:
+    """Take the cluster-wide retention lease unless another worker holds it."""
+    now = datetime.now(timezone.utc)
+    try:
+        await mongo_db.job_leases.find_one_and_update(
+            {"_id": _LEASE_ID, "expires_at": {"$lt": now}},
+            {"$set": {"owner": f"{socket.gethostname()}:{os.getpid()}", "expires_at": now + ttl}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def run_periodically(interval_minutes: int) -> None:
+    """Run retention every ``interval_minutes`` for the lifetime of the process."""
+    from app.db.mongodb import get_database, get_grid_fs
+    from app.db.postgres import session_scope
+
+    interval = timedelta(minutes=interval_minutes)
+    while True:
+        await asyncio.sleep(interval.total_seconds())
+        try:
+            if not await _acquire_lease(get_database(), interval):
+                continue
+            with session_scope() as session:
+                await RetentionService(session, get_database(), get_grid_fs()).run()
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # pragma: no cover - keep the loop alive
+            logger.exception("Retention run failed")
+
+
+async def _run_once(dry_run: bool) -> RetentionReport:
+    from app.db.mongodb import close_mongo_connection, connect_to_mongo, get_database, get_grid_fs
+    from app.db.postgres import session_scope
+
+    await connect_to_mongo()
+    try:
+        with session_scope() as session:
+            return await RetentionService(session, get_database(), get_grid_fs()).run(dry_run=dry_run)
+    finally:
+        await close_mongo_connection()
+
+
+def main() -> None:
+    from app.core.logging import configure_logging
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be removed without deleting")
+    args = parser.parse_args()
+    configure_logging("DEBUG" if settings.debug else "INFO")
+    report = asyncio.run(_run_once(args.dry_run))
+    print(orjson.dumps(report.as_dict(), option=orjson.OPT_INDENT_2).decode("utf-8"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from app.core.config import get_settings
+from app.core.metrics import metrics
+from app.services.chunking import ChunkIndex
+
+settings = get_settings()
+
+# File layout: magic, chunk count, text length in characters, starts[n], ends[n],
+# pages[n] (int64, absolute file offsets for starts/ends), then the UTF-8 text.
+_MAGIC = b"CDTXT002"
+_HEADER = struct.Struct("<8sqq")
+_LAYOUT_VERSION = "c2000-o200-t200"
+# Invalidation counters remembered per entry; old ones are forgotten first.
+_MAX_GENERATIONS = 4096
+
+
+def _check_private_directory(directory: str) -> None:
+    """Refuse a cache directory another local user could plant or swap files in."""
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"text cache path is not a directory: {directory}")
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"text cache directory is owned by uid {info.st_uid}: {directory}")
+    if info.st_mode & 0o022:
+        raise PermissionError(f"text cache directory is writable by other users: {directory}")
+
+
+def _byte_offsets(text: str, positions: Sequence[int]) -> List[int]:
+    """Translate sorted character positions into UTF-8 byte positions in one pass."""
+    result: List[int] = []
+    previous_char = previous_byte = 0
+    for position in positions:
+        previous_byte += len(text[previous_char:position].encode("utf-8"))
+        previous_char = position
+        result.append(previous_byte)
+    return result
+
+
+class SharedTextCache:
+    """Read-mostly cache of parsed text and chunk offsets in memory-mapped files.
+
+    Entries live in a host-local directory, so every worker process maps the
+    same file and the kernel page cache holds one copy of each hot document.
+    Writers replace files atomically; readers validate the inode on each hit
+    so an entry rewritten or removed by another worker is never served stale.
+    The directory is trimmed to ``max_bytes`` by evicting the least recently
+    used files (recency is tracked through file mtimes). The directory must
+    be owned by the current user and not writable by others, and only
+    regular files owned by the current user are mapped, so another local
+    account cannot feed crafted offsets or text to the workers.
+
+    ``invalidate`` bumps a per-entry generation. A loader reads
+    ``generation()`` before fetching the text and passes it to ``put``,
+    which skips the write if the entry was invalidated meanwhile, so a load
+    racing a reparse in this process cannot cache the old text.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, max_open: int = 128) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_open = max_open
+        self._open: "OrderedDict[str, Tuple[int, ChunkIndex]]" = OrderedDict()
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        _check_private_directory(directory)
+
+    def _path(self, pdf_id: str, user_id: int) -> str:
+        name = hashlib.sha1(f"{user_id}:{pdf_id}:{_LAYOUT_VERSION}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.cdt")
+
+    def get(self, pdf_id: str, user_id: int) -> Optional[ChunkIndex]:
+        path = self._path(pdf_id, user_id)
+        try:
+            inode = os.stat(path).st_ino
+        except FileNotFoundError:
+            with self._lock:
+                self._open.pop(path, None)
+            metrics.inc("text_cache_total", result="miss")
+            return None
+
+        with self._lock:
+            entry = self._open.get(path)
+            if entry is not None and entry[0] == inode:
+                self._open.move_to_end(path)
+                metrics.inc("text_cache_total", result="hit")
+                return entry[1]
+
+        try:
+            index = self._map(path)
+        except (OSError, ValueError, struct.error) as exc:
+            logger.warning("Discarding unreadable text cache entry path={} error={}", path, exc)
+            metrics.inc("text_cache_total", result="miss")
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:  # pragma: no cover - evicted concurrently
+            pass
+        with self._lock:
+            self._open[path] = (inode, index)
+            self._open.move_to_end(path)
+            while len(self._open) > self.max_open:
+                # Dropping the reference unmaps the file once no chunk view uses it.
+                self._open.popitem(last=False)
+        metrics.inc("text_cache_total", result="hit")
+        return index
+
+    @staticmethod
+    def _map(path: str) -> ChunkIndex:
+        descriptor = os.open(path, os.O_RDONLY | os.O_NOFOLLOW)
+        with os.fdopen(descriptor, "rb") as handle:
+            info = os.fstat(handle.fileno())
+            if not stat.S_ISREG(info.st_mode) or info.st_uid != os.getuid():
+                raise ValueError("cache file is not a regular file owned by this user")
+            buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, chars = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC:
+            raise ValueError("unexpected cache file header")
+        offsets = memoryview(buffer)[_HEADER.size : _HEADER.size + 24 * count].cast("q")
+        return ChunkIndex.from_buffers(
+            buffer, offsets[:count], offsets[count : 2 * count], offsets[2 * count :], chars=chars
+        )
+
+    def generation(self, pdf_id: str, user_id: int) -> int:
+        with self._lock:
+            return self._generations.get(self._path(pdf_id, user_id), 0)
+
+    def put(self, pdf_id: str, user_id: int, index: ChunkIndex, generation: Optional[int] = None) -> bool:
+        """Persist a ``str``-backed index; blocking, so call it from a worker thread.
+
+        Returns False without writing when ``generation`` is given and the
+        entry has been invalidated since it was read.
+        """
+        text = index.text
+        if not isinstance(text, str) or not text:
+            return False
+        count = len(index)
+        spans = list(index)
+        boundaries = sorted({span.start for span in spans} | {span.end for span in spans})
+        byte_positions = dict(zip(boundaries, _byte_offsets(text, boundaries)))
+        base = _HEADER.size + 24 * count
+        offsets = array("q", [base + byte_positions[span.start] for span in spans])
+        offsets.extend(base + byte_positions[span.end] for span in spans)
+        offsets.extend(span.page for span in spans)
+
+        path = self._path(pdf_id, user_id)
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as handle:
+                handle.write(_HEADER.pack(_MAGIC, count, len(text)))
+                handle.write(offsets.tobytes())
+                handle.write(text.encode("utf-8"))
+            with self._lock:
+                stale = generation is not None and self._generations.get(path, 0) != generation
+                if not stale:
+                    os.replace(temp_path, path)
+            if stale:
+                os.unlink(temp_path)
+                metrics.inc("text_cache_stale_puts_total")
+                logger.debug("Skipped caching text invalidated during load pdf_id={} user_id={}", pdf_id, user_id)
+                return False
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        logger.debug("Cached parsed text pdf_id={} user_id={} chunks={} path={}", pdf_id, user_id, count, path)
+        self._evict()
+        return True
+
+    def invalidate(self, pdf_id: str, user_id: int) -> None:
+        path = self._path(pdf_id, user_id)
+        with self._lock:
+            self._generations[path] = self._generations.pop(path, 0) + 1
+            while len(self._generations) > _MAX_GENERATIONS:
+                self._generations.popitem(last=False)
+            self._open.pop(path, None)
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith(".cdt"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:  # pragma: no cover - removed concurrently
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total += stat.st_size
+        metrics.set_gauge("text_cache_bytes", total)
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:  # pragma: no cover - removed concurrently
+                pass
+            total -= size
+            with self._lock:
+                self._open.pop(path, None)
+            metrics.inc("text_cache_evictions_total")
+        metrics.set_gauge("text_cache_bytes", total)
+
+
+_text_cache: Optional[SharedTextCache] = None
+_text_cache_unusable = False
+
+
+def get_text_cache() -> Optional[SharedTextCache]:
+    """Return the process-wide shared text cache, or None when disabled or its directory is unsafe."""
+    global _text_cache, _text_cache_unusable
+    if _text_cache is None and settings.text_cache_enabled and not _text_cache_unusable:
+        # Per-user default, so workers of one service account share it while
+        # other accounts on the host cannot pre-create or write into it.
+        directory = settings.text_cache_dir or os.path.join(
+            tempfile.gettempdir(), f"chat-docs-text-cache-{os.getuid()}"
+        )
+        try:
+            _text_cache = SharedTextCache(directory, settings.text_cache_max_bytes)
+        except PermissionError as exc:
+            _text_cache_unusable = True
+            logger.error("Shared text cache disabled: {}", exc)
+    return _text_cache
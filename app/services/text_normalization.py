@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Set
+
+from app.services.llm_service import estimate_tokens
+
+# Headers and footers are looked for within this many non-empty lines of the
+# top and bottom of a page.
+_EDGE_LINES = 3
+# Key of a line that is only a number; too common in body text (years, table
+# cells) to ever count as repeated boilerplate.
+_NUMBER_KEY = "#"
+
+_PAGE_NUMBER = re.compile(r"^(?:page\s*)?[-–—\s]*\d+(?:\s*(?:of|/)\s*\d+)?[-–—\s]*$", re.IGNORECASE)
+_HYPHENATED_BREAK = re.compile(r"(?<=[A-Za-z])-\n(?=[a-z])")
+_INLINE_WHITESPACE = re.compile(r"[ \t\f\v\u00a0]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_EDGE_NUMBER = re.compile(r"^(?:page\s*)?\d+\b|\b(?:page\s*)?\d+(?:\s*(?:of|/)\s*\d+)?$")
+
+
+@dataclass
+class NormalizationStats:
+    """What normalization removed from one document."""
+
+    raw_bytes: int = 0
+    normalized_bytes: int = 0
+    raw_tokens: int = 0
+    normalized_tokens: int = 0
+    removed_lines: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.raw_bytes - self.normalized_bytes
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.raw_tokens - self.normalized_tokens
+
+    def as_dict(self) -> dict[str, int]:
+        return {
+            "raw_bytes": self.raw_bytes,
+            "normalized_bytes": self.normalized_bytes,
+            "bytes_saved": self.bytes_saved,
+            "tokens_saved": self.tokens_saved,
+            "removed_lines": self.removed_lines,
+        }
+
+
+@dataclass
+class NormalizedPages:
+    pages: List[str]
+    stats: NormalizationStats = field(default_factory=NormalizationStats)
+
+
+def _line_key(line: str) -> str:
+    # Running headers often start or end with the page number; mask just that part.
+    return _EDGE_NUMBER.sub("#", _INLINE_WHITESPACE.sub(" ", line).strip().lower())
+
+
+def _candidate_keys(lines: List[str]) -> Set[str]:
+    non_empty = [line for line in lines if line.strip()]
+    return {_line_key(line) for line in non_empty[:_EDGE_LINES] + non_empty[-_EDGE_LINES:]}
+
+
+def _edge_removals(lines: List[str], repeated: Set[str]) -> Set[int]:
+    """Indexes of header/footer lines, found by walking inward from each edge.
+
+    The walk stops at the first line that is neither repeated boilerplate
+    nor the page number (one per page, looked for at the bottom first), so
+    body lines are kept even when they repeat or are bare numbers.
+    """
+    non_empty = [index for index, line in enumerate(lines) if line.strip()]
+    removed: Set[int] = set()
+    page_number_seen = False
+    for ordered in (non_empty[::-1], non_empty):
+        for index in ordered[:_EDGE_LINES]:
+            if index in removed:
+                break
+            if _line_key(lines[index]) in repeated:
+                removed.add(index)
+            elif not page_number_seen and _is_page_number(lines[index]):
+                removed.add(index)
+                page_number_seen = True
+            else:
+                break
+    return removed
+
+
+def _is_page_number(line: str) -> bool:
+    stripped = line.strip()
+    return bool(stripped) and _PAGE_NUMBER.match(stripped) is not None
+
+
+def normalize_pages(pages: List[str], min_pages: int = 3, page_ratio: float = 0.5) -> NormalizedPages:
+    """Strip repeated headers/footers and page numbers, de-hyphenate and collapse whitespace.
+
+    A line is treated as boilerplate when (ignoring case, spacing and a
+    leading or trailing page number) it appears near the top or bottom of at
+    least ``min_pages`` pages and of at least ``page_ratio`` of all pages.
+    Boilerplate and page numbers are only removed from the edges of a page;
+    the same text in the body is kept. Page boundaries are kept so page
+    offsets can still be computed from the result.
+    """
+    split_pages = [page.splitlines() for page in pages]
+    counts: Counter[str] = Counter()
+    for lines in split_pages:
+        counts.update(_candidate_keys(lines))
+    threshold = max(min_pages, int(len(pages) * page_ratio + 0.999))
+    repeated = {key for key, count in counts.items() if key and key != _NUMBER_KEY and count >= threshold}
+
+    stats = NormalizationStats()
+    normalized: List[str] = []
+    for page, lines in zip(pages, split_pages):
+        removals = _edge_removals(lines, repeated)
+        kept = []
+        for index, line in enumerate(lines):
+            if index in removals:
+                stats.removed_lines += 1
+                continue
+            kept.append(_INLINE_WHITESPACE.sub(" ", line).strip())
+        text = _HYPHENATED_BREAK.sub("", "\n".join(kept))
+        normalized.append(_BLANK_LINES.sub("\n\n", text).strip())
+
+        stats.raw_bytes += len(page.encode("utf-8"))
+        stats.raw_tokens += estimate_tokens(page)
+        stats.normalized_bytes += len(normalized[-1].encode("utf-8"))
+        stats.normalized_tokens += estimate_tokens(normalized[-1])
+    return NormalizedPages(pages=normalized, stats=stats)
@@ -0,0 +1,54 @@
+"""Compare PDF text-extraction backends on generated fixture PDFs.
+
+Run from the project root::
+
+    python benchmarks/bench_extraction.py --documents 5 --pages 50
+
+Reports pages/sec, extracted characters and the quality score used by the
+fallback chain for every installed backend (``pypdfium2`` and
+``pdfminer.six`` are optional and listed as unavailable when missing).
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.services.pdf_extraction import BACKENDS, text_quality  # noqa: E402
+from benchmarks.pdf_fixtures import make_text_pdf  # noqa: E402
+
+
+def run(documents: int, pages: int, lines: int) -> None:
+    corpus = [make_text_pdf(pages, lines_per_page=lines, seed=seed) for seed in range(documents)]
+    total_pages = documents * pages
+    print(f"corpus: {documents} PDFs x {pages} pages, {sum(map(len, corpus)) / 1024:.0f} KiB")
+    print(f"{'backend':<12} {'pages/s':>10} {'chars':>10} {'quality':>8}")
+    for name, backend in BACKENDS.items():
+        if not backend.available():
+            print(f"{name:<12} {'not installed':>10}")
+            continue
+        started = time.perf_counter()
+        extracted = [backend.extract_pages(BytesIO(data)) for data in corpus]
+        elapsed = time.perf_counter() - started
+        chars = sum(len(page) for document in extracted for page in document)
+        quality = min(text_quality(document) for document in extracted)
+        print(f"{name:<12} {total_pages / elapsed:>10.1f} {chars:>10} {quality:>8.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--lines", type=int, default=40)
+    args = parser.parse_args()
+    run(args.documents, args.pages, args.lines)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Measure logging overhead per simulated chat request.
+
+Run from the project root::
+
+    python benchmarks/bench_logging.py --requests 20000
+
+Each simulated request emits the log lines of a typical ``/pdf-chat`` call.
+"caller" is the time spent in the request path; "total" also includes
+draining queued records, i.e. the work moved to the background thread.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from loguru import logger  # noqa: E402
+
+from app.core.logging import configure_logging, flush_logging  # noqa: E402
+
+SCENARIOS = [
+    ("text, sync", dict(json_logs=False, sample_rate=0.0)),
+    ("json, queued", dict(json_logs=True, sample_rate=0.0)),
+    ("json, queued, sampled", dict(json_logs=True, sample_rate=100.0)),
+]
+
+
+def simulate_request(index: int) -> None:
+    with logger.contextualize(request_id=f"req-{index}", route="/pdf-chat"):
+        logger.info("Chat request started session_id={} user_id={} pdf_id={}", 1, 2, "507f1f77bcf86cd799439011")
+        logger.debug("Retrieved parsed text for pdf_id={} user_id={}", "507f1f77bcf86cd799439011", 2)
+        logger.debug("Chunking text for LLM processing length={} chunk_size={} overlap={}", 120_000, 2000, 200)
+        logger.info("Sending prompt to Gemini model={} chunks={} question_length={}", "gemini", 60, 42)
+        logger.debug("Received direct text response from Gemini length={}", 512)
+        logger.info("Chat response stored session_id={} user_id={} user_msg_id={} bot_msg_id={}", 1, 2, 3, 4)
+
+
+def run(requests: int, level: str) -> None:
+    print(f"{'scenario':<24} {'caller us/req':>14} {'total us/req':>14}")
+    for name, options in SCENARIOS:
+        with open(os.devnull, "w") as devnull:
+            configure_logging(level, sink=devnull, **options)
+            started = time.perf_counter()
+            for index in range(requests):
+                simulate_request(index)
+            caller = time.perf_counter() - started
+            flush_logging()
+            total = time.perf_counter() - started
+        print(f"{name:<24} {caller / requests * 1e6:>14.1f} {total / requests * 1e6:>14.1f}")
+    configure_logging("INFO")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--level", default="DEBUG")
+    args = parser.parse_args()
+    run(args.requests, args.level)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Compare the old and fast serialization paths for list/history endpoints.
+
+Run from the project root::
+
+    python benchmarks/bench_serialization.py --items 5000
+
+"model path" mirrors the previous behaviour: one Pydantic model per row,
+FastAPI's response_model validation and ``jsonable_encoder`` followed by
+``json.dumps``. "fast path" renders the raw rows with ``ORJSONResponse``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import ORJSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from app.schemas import ChatHistoryResponse, ChatMessage, PDFMetadata  # noqa: E402
+
+
+def _pdf_rows(count: int) -> list[dict[str, Any]]:
+    now = datetime.now(timezone.utc)
+    return [
+        {"pdf_id": f"{index:024x}", "filename": f"contract-{index}.pdf", "upload_date": now, "is_parsed": index % 2 == 0}
+        for index in range(count)
+    ]
+
+
+def _history_rows(count: int) -> list[dict[str, Any]]:
+    now = datetime.now(timezone.utc)
+    return [
+        {"role": "user" if index % 2 == 0 else "assistant", "content": "lorem ipsum dolor sit amet " * 8, "created_at": now}
+        for index in range(count)
+    ]
+
+
+def _model_path(response_model: Any, build: Callable[[], Any]) -> bytes:
+    field = create_response_field(name="response", type_=response_model)
+    content = asyncio.run(serialize_response(field=field, response_content=build()))
+    return json.dumps(jsonable_encoder(content)).encode("utf-8")
+
+
+def _timeit(func: Callable[[], bytes], repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = func()
+        best = min(best, time.perf_counter() - started)
+        size = len(body)
+    return best, size
+
+
+def run(items: int, repeat: int) -> None:
+    pdf_rows = _pdf_rows(items)
+    history_rows = _history_rows(items)
+    cases = [
+        (
+            "pdf-list model path",
+            lambda: _model_path(list[PDFMetadata], lambda: [PDFMetadata(**row) for row in pdf_rows]),
+        ),
+        ("pdf-list fast path", lambda: ORJSONResponse(pdf_rows).body),
+        (
+            "history model path",
+            lambda: _model_path(
+                ChatHistoryResponse,
+                lambda: ChatHistoryResponse(messages=[ChatMessage(**row) for row in history_rows], total=items),
+            ),
+        ),
+        ("history fast path", lambda: ORJSONResponse({"messages": history_rows, "total": items}).body),
+    ]
+    print(f"{'case':<22} {'best ms':>10} {'bytes':>10} {'gzip bytes':>11}")
+    for name, func in cases:
+        seconds, size = _timeit(func, repeat)
+        compressed = len(gzip.compress(func()))
+        print(f"{name:<22} {seconds * 1000:>10.2f} {size:>10} {compressed:>11}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.items, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
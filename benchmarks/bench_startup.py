@@ -0,0 +1,104 @@
+"""Measure import time, startup time and time-to-first-request of the API.
+
+Run from the project root::
+
+    python benchmarks/bench_startup.py --runs 5
+
+Every run starts a fresh interpreter, imports ``app.main``, runs the startup
+handlers and serves ``GET /health`` through the ASGI interface, so no server
+or database needs to be listening. Track the medians per release.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+HEAVY_MODULES = ("google.generativeai", "PyPDF2")
+
+PROBE = r"""
+import asyncio, json, sys, time
+
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+
+async def first_request():
+    await app.main.app.router.startup()
+    booted = time.perf_counter()
+    messages = []
+    requested = asyncio.Event()
+
+    async def receive():
+        if requested.is_set():
+            await asyncio.Event().wait()  # no disconnect until the response is sent
+        requested.set()
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/health",
+        "raw_path": b"/health",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [],
+        "client": ("127.0.0.1", 1),
+        "server": ("127.0.0.1", 8000),
+    }
+    await app.main.app(scope, receive, send)
+    served = time.perf_counter()
+    await app.main.app.router.shutdown()
+    return booted, served, messages[0]["status"]
+
+
+booted, served, status = asyncio.run(first_request())
+print(json.dumps({
+    "import": imported - started,
+    "startup": booted - imported,
+    "first_request": served - booted,
+    "total": served - started,
+    "status": status,
+    "heavy_modules": [name for name in HEAVY if name in sys.modules],
+}))
+"""
+
+
+def run_once() -> dict:
+    code = f"HEAVY = {HEAVY_MODULES!r}\n{PROBE}"
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=PROJECT_ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    for phase in ("import", "startup", "first_request", "total"):
+        values = [result[phase] * 1000 for result in results]
+        print(f"{phase:<14} median={statistics.median(values):8.1f} ms  min={min(values):8.1f} ms")
+    print(f"heavy modules loaded at boot: {results[-1]['heavy_modules'] or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Generate text PDFs for extraction benchmarks without extra dependencies."""
+from __future__ import annotations
+
+import random
+from typing import List
+
+WORDS = (
+    "agreement party shall term payment invoice revenue quarter liability notice clause "
+    "schedule delivery warranty obligation report customer service period amount section"
+).split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_lines(page: int, lines: int, rng: random.Random) -> List[str]:
+    body = [" ".join(rng.choice(WORDS) for _ in range(12)).capitalize() + "." for _ in range(lines)]
+    return ["ACME Corp - Confidential"] + body + [f"Page {page + 1}"]
+
+
+def make_text_pdf(pages: int, lines_per_page: int = 40, seed: int = 0) -> bytes:
+    """Return a PDF with ``pages`` pages of Helvetica text, a running header and page numbers."""
+    rng = random.Random(seed)
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for page in range(pages):
+        commands = ["BT", "/F1 10 Tf", "12 TL", "50 770 Td"]
+        commands += [f"({_escape(line)}) Tj T*" for line in _page_lines(page, lines_per_page, rng)]
+        commands.append("ET")
+        stream = "\n".join(commands).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        page_refs.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % ref for ref in page_refs)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(output)
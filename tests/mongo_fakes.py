@@ -0,0 +1,201 @@
+"""In-memory stand-ins for the Motor collections and GridFS bucket used by services."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, BinaryIO
+
+from bson import ObjectId
+from gridfs.errors import NoFile
+
+
+@dataclass
+class FakeDownloadStream:
+    data: bytes
+    chunk_size: int = 255 * 1024
+    position: int = 0
+
+    async def read(self) -> bytes:
+        return self.data
+
+    @property
+    def length(self) -> int:
+        return len(self.data)
+
+    def seek(self, position: int) -> None:
+        self.position = position
+
+    async def readchunk(self) -> bytes:
+        # Like GridOut.readchunk: the rest of the stored chunk containing the position.
+        chunk_end = (self.position // self.chunk_size + 1) * self.chunk_size
+        chunk = self.data[self.position : chunk_end]
+        self.position += len(chunk)
+        return chunk
+
+
+class FakeAsyncCursor:
+    def __init__(self, documents: list[dict[str, Any]]) -> None:
+        self._documents = documents
+
+    def sort(self, keys: list[tuple[str, int]]) -> "FakeAsyncCursor":
+        for key, direction in reversed(keys):
+            self._documents.sort(key=lambda doc: doc[key], reverse=direction < 0)
+        return self
+
+    def limit(self, count: int) -> "FakeAsyncCursor":
+        self._documents = self._documents[:count]
+        return self
+
+    def batch_size(self, size: int) -> "FakeAsyncCursor":
+        return self
+
+    async def to_list(self, length: int | None = None) -> list[dict[str, Any]]:
+        return self._documents[:length]
+
+    def __aiter__(self):
+        self._iterator = iter(self._documents)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration as exc:  # pragma: no cover - standard async iteration ending
+            raise StopAsyncIteration from exc
+
+
+def _matches(doc: dict[str, Any], query: dict[str, Any]) -> bool:
+    for key, expected in query.items():
+        if key == "$or":
+            if not any(_matches(doc, clause) for clause in expected):
+                return False
+        elif isinstance(expected, dict) and "$lt" in expected:
+            if key not in doc or not doc[key] < expected["$lt"]:
+                return False
+        elif isinstance(expected, dict) and "$in" in expected:
+            if doc.get(key) not in expected["$in"]:
+                return False
+        elif isinstance(expected, dict) and "$exists" in expected:
+            if (key in doc) != expected["$exists"]:
+                return False
+        elif doc.get(key) != expected:
+            return False
+    return True
+
+
+def _project(doc: dict[str, Any], projection: dict[str, int] | None) -> dict[str, Any]:
+    if projection is None:
+        return doc.copy()
+    included = {key for key, flag in projection.items() if flag}
+    return {key: value for key, value in doc.items() if key in included}
+
+
+def _evaluate(doc: dict[str, Any], expression: Any) -> Any:
+    if isinstance(expression, str) and expression.startswith("$"):
+        return doc.get(expression[1:])
+    if isinstance(expression, dict) and "$ifNull" in expression:
+        value, fallback = (_evaluate(doc, item) for item in expression["$ifNull"])
+        return fallback if value is None else value
+    if isinstance(expression, dict) and "$strLenBytes" in expression:
+        return len(_evaluate(doc, expression["$strLenBytes"]).encode("utf-8"))
+    return expression
+
+
+class FakeCollection:
+    def __init__(self) -> None:
+        self.docs: list[dict[str, Any]] = []
+
+    async def insert_one(self, doc: dict[str, Any]) -> None:
+        self.docs.append(doc.copy())
+
+    async def insert_many(self, docs: list[dict[str, Any]], ordered: bool = True) -> None:
+        self.docs.extend(doc.copy() for doc in docs)
+
+    def find(self, query: dict[str, Any], projection: dict[str, int] | None = None) -> FakeAsyncCursor:
+        return FakeAsyncCursor([_project(doc, projection) for doc in self.docs if _matches(doc, query)])
+
+    def aggregate(self, pipeline: list[dict[str, Any]]) -> FakeAsyncCursor:
+        docs = list(self.docs)
+        for stage in pipeline:
+            if "$match" in stage:
+                docs = [doc for doc in docs if _matches(doc, stage["$match"])]
+            elif "$limit" in stage:
+                docs = docs[: stage["$limit"]]
+            elif "$project" in stage:
+                docs = [
+                    {key: doc.get(key) if spec == 1 else _evaluate(doc, spec) for key, spec in stage["$project"].items()}
+                    for doc in docs
+                ]
+        return FakeAsyncCursor(docs)
+
+    async def find_one(self, query: dict[str, Any], projection: dict[str, int] | None = None) -> dict[str, Any] | None:
+        for doc in self.docs:
+            if _matches(doc, query):
+                return _project(doc, projection)
+        return None
+
+    async def update_one(self, query: dict[str, Any], update: dict[str, Any], upsert: bool = False) -> None:
+        for doc in self.docs:
+            if _matches(doc, query):
+                self._apply(doc, update)
+                return
+        if upsert:
+            new_doc = query.copy()
+            new_doc.update(update.get("$setOnInsert", {}))
+            self._apply(new_doc, update)
+            self.docs.append(new_doc)
+
+    async def update_many(self, query: dict[str, Any], update: dict[str, Any]) -> None:
+        for doc in self.docs:
+            if _matches(doc, query):
+                self._apply(doc, update)
+
+    async def delete_one(self, query: dict[str, Any]) -> None:
+        for index, doc in enumerate(self.docs):
+            if _matches(doc, query):
+                del self.docs[index]
+                return
+
+    @staticmethod
+    def _apply(doc: dict[str, Any], update: dict[str, Any]) -> None:
+        doc.update(update.get("$set", {}))
+        for key in update.get("$unset", {}):
+            doc.pop(key, None)
+        for key, amount in update.get("$inc", {}).items():
+            doc[key] = doc.get(key, 0) + amount
+
+
+class FakeGridFSBucket:
+    def __init__(self, files: FakeCollection | None = None) -> None:
+        self._storage: dict[ObjectId, bytes] = {}
+        self.files = files if files is not None else FakeCollection()
+
+    async def upload_from_stream(self, filename: str, stream: BinaryIO, metadata: dict[str, Any]) -> ObjectId:
+        data = stream.read()
+        file_id = ObjectId()
+        self._storage[file_id] = data
+        self.files.docs.append(
+            {"_id": file_id, "filename": filename, "length": len(data), "uploadDate": datetime.now(timezone.utc)}
+        )
+        return file_id
+
+    async def open_download_stream(self, file_id: ObjectId) -> FakeDownloadStream:
+        if file_id not in self._storage:
+            raise NoFile(f"no file with id {file_id}")
+        return FakeDownloadStream(self._storage[file_id])
+
+    async def delete(self, file_id: ObjectId) -> None:
+        del self._storage[file_id]
+        self.files.docs = [doc for doc in self.files.docs if doc["_id"] != file_id]
+
+
+class FakeGridFSNamespace:
+    def __init__(self) -> None:
+        self.files = FakeCollection()
+
+
+class FakeDatabase:
+    def __init__(self) -> None:
+        self.pdf_metadata = FakeCollection()
+        self.pdf_texts = FakeCollection()
+        self.pdf_list_state = FakeCollection()
+        self.fs = FakeGridFSNamespace()
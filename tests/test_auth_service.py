@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import asyncio
+import threading
+
 import pytest
 from fastapi import HTTPException
 
 from app.core import security
+from app.core.concurrency import BoundedExecutor
 from app.schemas.user import UserCreate
 from app.services.auth_service import AuthService
 
@@ -18,8 +22,8 @@ def fake_password_hash(monkeypatch):
 
     monkeypatch.setattr(security, "get_password_hash", _hash)
     monkeypatch.setattr(security, "verify_password", _verify)
-    monkeypatch.setattr("app.services.auth_service.get_password_hash", _hash)
-    monkeypatch.setattr("app.services.auth_service.verify_password", _verify)
+    monkeypatch.setattr(security, "password_needs_rehash", lambda hashed: False)
+    monkeypatch.setattr("app.services.auth_service.password_needs_rehash", lambda hashed: False)
 
 
 @pytest.fixture(name="auth_service")
@@ -27,44 +31,100 @@ def fixture_auth_service(db_session):
     return AuthService(db_session)
 
 
-def test_register_user_creates_account(auth_service):
+@pytest.mark.asyncio
+async def test_register_user_creates_account(auth_service):
     user_in = UserCreate(email="user@example.com", password="securepass")
 
-    user = auth_service.register_user(user_in)
+    user = await auth_service.register_user(user_in)
 
     assert user.id is not None
     assert user.email == user_in.email
     assert user.password_hash != user_in.password
 
 
-def test_register_user_duplicate_email_raises(auth_service):
+@pytest.mark.asyncio
+async def test_register_user_duplicate_email_raises(auth_service):
     user_in = UserCreate(email="duplicate@example.com", password="password")
-    auth_service.register_user(user_in)
+    await auth_service.register_user(user_in)
 
     with pytest.raises(HTTPException) as exc:
-        auth_service.register_user(user_in)
+        await auth_service.register_user(user_in)
 
     assert exc.value.status_code == 400
     assert "Email already registered" in exc.value.detail
 
 
-def test_authenticate_with_valid_credentials(auth_service):
+@pytest.mark.asyncio
+async def test_authenticate_with_valid_credentials(auth_service):
     email = "login@example.com"
     password = "password"
-    auth_service.register_user(UserCreate(email=email, password=password))
+    await auth_service.register_user(UserCreate(email=email, password=password))
 
-    user = auth_service.authenticate(email, password)
+    user = await auth_service.authenticate(email, password)
 
     assert user.email == email
 
 
-def test_authenticate_with_invalid_credentials_raises(auth_service):
+@pytest.mark.asyncio
+async def test_authenticate_with_invalid_credentials_raises(auth_service):
     email = "invalid@example.com"
     password = "password"
-    auth_service.register_user(UserCreate(email=email, password=password))
+    await auth_service.register_user(UserCreate(email=email, password=password))
 
     with pytest.raises(HTTPException) as exc:
-        auth_service.authenticate(email, "wrong-password")
+        await auth_service.authenticate(email, "wrong-password")
 
     assert exc.value.status_code == 401
     assert "Invalid credentials" in exc.value.detail
+
+
+@pytest.mark.asyncio
+async def test_authenticate_rehashes_when_cost_changes(db_session, monkeypatch):
+    monkeypatch.undo()
+    service = AuthService(db_session)
+    monkeypatch.setattr(security.settings, "bcrypt_rounds", 4)
+    user = await service.register_user(UserCreate(email="cost@example.com", password="password"))
+    old_hash = user.password_hash
+
+    monkeypatch.setattr(security.settings, "bcrypt_rounds", 5)
+    authenticated = await service.authenticate("cost@example.com", "password")
+
+    assert authenticated.password_hash != old_hash
+    assert authenticated.password_hash.startswith("$2b$05$")
+    assert security.verify_password("password", authenticated.password_hash)
+
+
+@pytest.mark.asyncio
+async def test_failed_rehash_still_logs_in_with_old_hash(db_session, monkeypatch):
+    service = AuthService(db_session)
+    user = await service.register_user(UserCreate(email="busy@example.com", password="password"))
+    old_hash = user.password_hash
+
+    async def busy(password: str) -> str:
+        raise HTTPException(status_code=503, detail="Server is busy, retry later")
+
+    monkeypatch.setattr("app.services.auth_service.password_needs_rehash", lambda hashed: True)
+    monkeypatch.setattr("app.services.auth_service.get_password_hash_async", busy)
+    authenticated = await service.authenticate("busy@example.com", "password")
+
+    assert authenticated.id == user.id
+    assert authenticated.password_hash == old_hash
+
+
+@pytest.mark.asyncio
+async def test_password_executor_rejects_when_saturated():
+    executor = BoundedExecutor("test-bcrypt", max_workers=1, max_pending=1)
+    release = threading.Event()
+    try:
+        blocked = asyncio.create_task(executor.run(release.wait))
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as exc:
+            await executor.run(lambda: None)
+
+        assert exc.value.status_code == 503
+        assert exc.value.headers == {"Retry-After": "1"}
+    finally:
+        release.set()
+        await blocked
+        executor.shutdown()
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.caching import etag_matches, parse_range
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        (None, None),
+        ("bytes=0-99", (0, 99)),
+        ("bytes=100-", (100, 999)),
+        ("bytes=-200", (800, 999)),
+        ("bytes=900-5000", (900, 999)),
+        ("bytes=5-1", None),
+        ("bytes=0-1,5-6", None),
+        ("items=0-1", None),
+        ("bytes=abc", None),
+    ],
+)
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=-0"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(HTTPException) as exc:
+        parse_range(header, 1000)
+
+    assert exc.value.status_code == 416
+    assert exc.value.headers == {"Content-Range": "bytes */1000"}
+
+
+def test_etag_matches_uses_weak_comparison():
+    assert etag_matches('"a", W/"b"', '"b"')
+    assert etag_matches("*", '"x"')
+    assert not etag_matches('"a"', '"b"')
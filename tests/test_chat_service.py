@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.models.chat import ChatMessage as ChatMessageModel, ChatSession
+from app.models.user import User
+from app.services.chat_service import ChatService, _merge_contexts
+from app.services.chat_writer import ChatMessageWriter
+from app.services.chunking import ChunkIndex, TextSpan
+from app.services.llm_scheduler import LLMScheduler
+from app.services.map_reduce import PartialAnswerCache, group_chunks
+
+
+class FakePDFService:
+    def __init__(self, texts: dict[str, str]) -> None:
+        self.texts = texts
+
+    async def get_chunk_index(self, pdf_id: str, user_id: int) -> ChunkIndex:
+        return ChunkIndex.build(self.texts[pdf_id])
+
+
+@pytest.fixture()
+def chat_setup(db_session, monkeypatch):
+    prompts: list[dict[str, str]] = []
+    summaries: list[str] = []
+
+    def fake_ask(context_chunks, question, history=""):
+        prompts.append({"question": question, "history": history})
+        return f"answer to {question}"
+
+    def fake_summarize(summary, transcript, max_chars):
+        summaries.append(transcript)
+        return f"{summary}|folded {transcript.count('User:')} turns"[:max_chars]
+
+    monkeypatch.setattr("app.services.chat_service.ask_gemini", fake_ask)
+    monkeypatch.setattr("app.services.chat_service.summarize_conversation", fake_summarize)
+
+    user = User(email="chat@example.com", password_hash="hashed", selected_pdf_id="pdf-1")
+    db_session.add(user)
+    db_session.commit()
+    scheduler = LLMScheduler(max_concurrency=2, max_queue_depth=10, requests_per_minute=6000, tokens_per_minute=10**9)
+    service = ChatService(db_session, FakePDFService({"pdf-1": "document text"}), scheduler=scheduler)
+    return service, user, prompts, summaries
+
+
+@pytest.mark.asyncio
+async def test_chat_includes_previous_turns(chat_setup):
+    service, user, prompts, _ = chat_setup
+
+    await service.chat(user, "first question")
+    await service.chat(user, "follow up")
+
+    assert prompts[0]["history"] == ""
+    assert "User: first question" in prompts[1]["history"]
+    assert "Assistant: answer to first question" in prompts[1]["history"]
+
+
+@pytest.mark.asyncio
+async def test_chat_memory_stays_bounded(chat_setup, monkeypatch):
+    service, user, prompts, summaries = chat_setup
+    monkeypatch.setattr("app.services.chat_service.settings.chat_memory_turns", 2)
+    monkeypatch.setattr("app.services.chat_service.settings.chat_memory_summary_batch_turns", 2)
+
+    for index in range(12):
+        await service.chat(user, f"question {index}")
+
+    session = service.db.query(ChatSession).filter(ChatSession.user_id == user.id).one()
+    assert summaries, "older turns should have been summarised"
+    assert session.summary
+    assert session.summarized_count > 0
+    # At most memory + batch turns are ever replayed verbatim.
+    assert all(prompt["history"].count("User:") <= 4 for prompt in prompts)
+    assert "question 10" in prompts[-1]["history"]
+    assert "User: question 0" not in prompts[-1]["history"]
+
+
+@pytest.mark.asyncio
+async def test_chat_over_multiple_pdfs_loads_documents_concurrently(db_session, monkeypatch):
+    contexts: list[list[str]] = []
+
+    def fake_ask(context_chunks, question, history=""):
+        contexts.append(context_chunks)
+        return "combined answer"
+
+    monkeypatch.setattr("app.services.chat_service.ask_gemini", fake_ask)
+
+    class SlowPDFService(FakePDFService):
+        async def get_chunk_index(self, pdf_id: str, user_id: int) -> ChunkIndex:
+            await asyncio.sleep(0.2)
+            return ChunkIndex.build(self.texts[pdf_id])
+
+    user = User(
+        email="multi@example.com",
+        password_hash="hashed",
+        selected_pdf_id="pdf-a",
+        selected_pdf_ids=["pdf-a", "pdf-b", "pdf-c"],
+    )
+    db_session.add(user)
+    db_session.commit()
+    scheduler = LLMScheduler(max_concurrency=2, max_queue_depth=10, requests_per_minute=6000, tokens_per_minute=10**9)
+    texts = {"pdf-a": "contract terms", "pdf-b": "spec details", "pdf-c": "pricing annex"}
+    service = ChatService(db_session, SlowPDFService(texts), scheduler=scheduler)
+
+    started = time.monotonic()
+    response = await service.chat(user, "compare the contract and spec")
+
+    assert time.monotonic() - started < 0.5
+    assert response.content == "combined answer"
+    assert [section.splitlines()[0] for section in contexts[0]] == [
+        "[Document pdf-a]",
+        "[Document pdf-b]",
+        "[Document pdf-c]",
+    ]
+    session = service.db.query(ChatSession).filter(ChatSession.user_id == user.id).one()
+    assert session.pdf_id == "pdf-a,pdf-b,pdf-c"
+
+
+def test_merge_contexts_respects_budget_and_balances_documents():
+    text_a = "a0" * 10 + "a1" * 10 + "a2" * 10
+    text_b = "b0" * 10 + "b1" * 10
+    documents = [
+        ("a", ChunkIndex(text_a, [TextSpan(0, 20), TextSpan(20, 40), TextSpan(40, 60)]), [2, 0, 1]),
+        ("b", ChunkIndex(text_b, [TextSpan(0, 20), TextSpan(20, 40)]), [1, 0]),
+    ]
+
+    sections = _merge_contexts(documents, max_chars=60)
+
+    assert sections == ["[Document a]\n" + "a0" * 10 + "\n\n" + "a2" * 10, "[Document b]\n" + "b1" * 10]
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_caches_partial_answers(db_session, monkeypatch):
+    map_calls: list[list[str]] = []
+    reduce_calls: list[list[str]] = []
+
+    def fake_map(chunks, question):
+        map_calls.append(chunks)
+        return f"partial from {len(chunks)} chunks"
+
+    def fake_reduce(partials, question, history=""):
+        reduce_calls.append(partials)
+        return "final answer"
+
+    monkeypatch.setattr("app.services.chat_service.answer_chunk_group", fake_map)
+    monkeypatch.setattr("app.services.chat_service.combine_answers", fake_reduce)
+    monkeypatch.setattr("app.services.chat_service.settings.chat_context_max_chars", 5000)
+    monkeypatch.setattr("app.services.chat_service.settings.chat_map_group_chars", 4000)
+
+    user = User(email="huge@example.com", password_hash="hashed", selected_pdf_id="huge")
+    db_session.add(user)
+    db_session.commit()
+    scheduler = LLMScheduler(max_concurrency=4, max_queue_depth=50, requests_per_minute=6000, tokens_per_minute=10**9)
+    service = ChatService(
+        db_session,
+        FakePDFService({"huge": "lorem ipsum " * 2000}),
+        scheduler=scheduler,
+        partial_cache=PartialAnswerCache(max_entries=100),
+    )
+
+    first = await service.chat(user, "What is this about?")
+    groups = len(map_calls)
+    second = await service.chat(user, "what is  this about?")
+
+    assert first.content == second.content == "final answer"
+    assert groups > 1
+    assert len(map_calls) == groups
+    assert len(reduce_calls) == 2
+
+
+def test_group_chunks_packs_consecutive_chunks():
+    assert group_chunks(["aa", "bb", "cc", "dddddd"], max_chars=4) == [["aa", "bb"], ["cc"], ["dddddd"]]
+
+
+@pytest.mark.asyncio
+async def test_history_payload_matches_model_path(chat_setup):
+    service, user, _, _ = chat_setup
+    await service.chat(user, "first question")
+    await service.chat(user, "second question")
+
+    payload = service.history_payload(user)
+    response = service.history(user)
+
+    assert payload["total"] == response.total == 4
+    assert [message["content"] for message in payload["messages"]] == [
+        message.content for message in response.messages
+    ]
+    assert payload["messages"][0] == {
+        "role": "user",
+        "content": "first question",
+        "created_at": response.messages[0].created_at,
+    }
+
+
+@pytest.mark.asyncio
+async def test_export_ndjson_streams_filtered_batches(chat_setup, db_session):
+    service, user, _, _ = chat_setup
+    await service.chat(user, "first question")
+    await service.chat(user, "second question")
+    other = ChatSession(user_id=user.id, pdf_id="other-pdf,pdf-1")
+    db_session.add(other)
+    db_session.commit()
+    db_session.add(ChatMessageModel(session_id=other.id, user_id=user.id, role="user", content="multi"))
+    db_session.add(ChatMessageModel(session_id=other.id, user_id=user.id, role="user", content="only other"))
+    db_session.commit()
+
+    batches = list(service.export_ndjson(user, batch_size=2))
+    lines = [json.loads(line) for batch in batches for line in batch.splitlines()]
+
+    assert len(batches) == 3
+    assert [line["content"] for line in lines][:2] == ["first question", "answer to first question"]
+    assert set(lines[0]) == {"id", "session_id", "pdf_id", "role", "content", "created_at"}
+
+    unrelated = list(service.export_ndjson(user, pdf_id="other"))
+    assert unrelated == []
+    filtered = [json.loads(line) for batch in service.export_ndjson(user, pdf_id="other-pdf") for line in batch.splitlines()]
+    assert [line["content"] for line in filtered] == ["multi", "only other"]
+    future = datetime.now(timezone.utc) + timedelta(days=1)
+    assert list(service.export_ndjson(user, since=future)) == []
+
+
+@pytest.mark.asyncio
+async def test_write_behind_defers_inserts_but_keeps_memory(chat_setup, db_session):
+    service, user, prompts, _ = chat_setup
+    writer = ChatMessageWriter(
+        sessionmaker(bind=db_session.get_bind()), flush_interval=60, max_batch=3, max_pending=100
+    )
+    service.writer = writer
+
+    answer = await service.chat(user, "first question")
+    assert answer.content == "answer to first question"
+    assert db_session.query(ChatMessageModel).count() == 0
+    assert writer.pending == 2
+
+    await service.chat(user, "follow up")
+    assert "User: first question" in prompts[1]["history"]
+
+    await writer.close()
+    contents = [message.content for message in db_session.query(ChatMessageModel).order_by(ChatMessageModel.id)]
+    assert contents == ["first question", "answer to first question", "follow up", "answer to follow up"]
+    assert writer.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_write_behind_dead_letters_rows_the_database_rejects(chat_setup, db_session):
+    service, user, _, _ = chat_setup
+    writer = ChatMessageWriter(
+        sessionmaker(bind=db_session.get_bind()), flush_interval=60, max_batch=10, max_pending=100, max_retries=1
+    )
+    await service.chat(user, "first question")
+    session_id = db_session.query(ChatSession).one().id
+    rows = [
+        {"session_id": session_id, "user_id": user.id, "role": "user", "content": "kept"},
+        {"session_id": session_id, "user_id": user.id, "role": "user", "content": None},
+        {"session_id": session_id, "user_id": user.id, "role": "assistant", "content": "also kept"},
+    ]
+    await writer.write(rows)
+
+    await writer.flush()
+    assert writer.pending == 3
+    await writer.flush()
+
+    assert writer.pending == 0
+    assert list(writer.dead_letters) == [rows[1]]
+    contents = [message.content for message in db_session.query(ChatMessageModel).order_by(ChatMessageModel.id)]
+    assert contents[-2:] == ["kept", "also kept"]
+
+
+@pytest.mark.asyncio
+async def test_write_behind_waits_for_a_flush_when_full(chat_setup, db_session):
+    service, user, _, _ = chat_setup
+    writer = ChatMessageWriter(sessionmaker(bind=db_session.get_bind()), flush_interval=60, max_batch=10, max_pending=2)
+    service.writer = writer
+
+    await service.chat(user, "first question")
+    assert writer.pending == 2
+    await service.chat(user, "follow up")
+
+    assert writer.pending == 2
+    assert db_session.query(ChatMessageModel).count() == 2
+    await writer.close()
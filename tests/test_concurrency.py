@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.concurrency import BoundedExecutor, ByteBudget, gather_or_cancel
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_waits_for_room():
+    budget = ByteBudget("test", capacity=100, wait_timeout=1.0)
+    order = []
+
+    async def hold(name: str, nbytes: int, seconds: float) -> None:
+        async with budget.reserve(nbytes):
+            order.append(name)
+            await asyncio.sleep(seconds)
+
+    first = asyncio.create_task(hold("first", 80, 0.05))
+    await asyncio.sleep(0)
+    await hold("second", 50, 0)
+    await first
+
+    assert order == ["first", "second"]
+    assert budget.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_rejects_with_retry_after_when_full():
+    budget = ByteBudget("test", capacity=100, wait_timeout=0.01)
+
+    async with budget.reserve(100):
+        with pytest.raises(HTTPException) as exc:
+            async with budget.reserve(1):
+                pass
+
+    assert exc.value.status_code == 503
+    assert exc.value.headers == {"Retry-After": "1"}
+    assert budget.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_releases_on_cancel_and_clamps_large_requests():
+    budget = ByteBudget("test", capacity=100, wait_timeout=1.0)
+    entered = asyncio.Event()
+
+    async def hold() -> None:
+        async with budget.reserve(10_000) as granted:
+            assert granted == 100
+            entered.set()
+            await asyncio.sleep(10)
+
+    task = asyncio.create_task(hold())
+    await entered.wait()
+    assert budget.in_use == 100
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert budget.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_executor_timeout_excludes_queue_time_and_holds_slot_until_thread_returns():
+    executor = BoundedExecutor("test", max_workers=1, max_pending=4)
+    release = threading.Event()
+    try:
+        blocker = asyncio.create_task(executor.run(time.sleep, 0.1))
+        await asyncio.sleep(0)
+        # Queued behind the blocker for longer than its timeout, but runs well within it.
+        await executor.run(time.sleep, 0.01, timeout=0.05)
+        await blocker
+
+        with pytest.raises(asyncio.TimeoutError):
+            await executor.run(release.wait, timeout=0.01)
+        assert executor.pending == 1
+
+        release.set()
+        for _ in range(100):
+            if executor.pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert executor.pending == 0
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_gather_or_cancel_stops_siblings_of_a_failed_job():
+    finished = []
+
+    async def slow() -> None:
+        await asyncio.sleep(1)
+        finished.append("slow")
+
+    async def failing() -> None:
+        await asyncio.sleep(0)
+        raise HTTPException(status_code=429, detail="rate limited")
+
+    sibling = asyncio.ensure_future(slow())
+    with pytest.raises(HTTPException):
+        await gather_or_cancel([sibling, failing()])
+
+    assert sibling.cancelled()
+    assert finished == []
+    assert await gather_or_cancel([asyncio.sleep(0, result=1), asyncio.sleep(0, result=2)]) == [1, 2]
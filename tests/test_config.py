@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import pytest
+from pydantic import ValidationError
+
+from app.core.config import SESSION_KEY_MAX_LENGTH, Settings
+from app.models.chat import ChatSession
+
+
+def test_session_key_limit_matches_chat_session_column():
+    assert ChatSession.__table__.c.pdf_id.type.length == SESSION_KEY_MAX_LENGTH
+
+
+def test_max_selected_pdfs_must_fit_the_session_key():
+    assert Settings(max_selected_pdfs=10).max_selected_pdfs == 10
+    with pytest.raises(ValidationError, match="at most 10 PDFs"):
+        Settings(max_selected_pdfs=11)
+    with pytest.raises(ValidationError):
+        Settings(max_selected_pdfs=0)
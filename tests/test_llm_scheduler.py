@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.metrics import metrics
+from app.services.llm_scheduler import LLMScheduler
+
+
+def _scheduler(**overrides) -> LLMScheduler:
+    options = dict(
+        max_concurrency=1,
+        max_queue_depth=10,
+        requests_per_minute=6000,
+        tokens_per_minute=1_000_000,
+    )
+    options.update(overrides)
+    return LLMScheduler(**options)
+
+
+@pytest.mark.asyncio
+async def test_scheduler_limits_concurrency():
+    scheduler = _scheduler(max_concurrency=2)
+    running = 0
+    peak = 0
+
+    async def call(user_id: int) -> None:
+        nonlocal running, peak
+        async with scheduler.slot(user_id, 10):
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*(call(i) for i in range(6)))
+
+    assert peak == 2
+    assert scheduler.active == 0
+    assert scheduler.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_interleaves_users_fairly():
+    scheduler = _scheduler()
+    order: list[int] = []
+    gate = asyncio.Event()
+
+    async def hold() -> None:
+        async with scheduler.slot(99, 1):
+            await gate.wait()
+
+    async def call(user_id: int) -> None:
+        async with scheduler.slot(user_id, 10):
+            order.append(user_id)
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    tasks = [asyncio.create_task(call(1)) for _ in range(4)]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(call(2)))
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(holder, *tasks)
+
+    # The heavy user's backlog must not push the second user to the very end.
+    assert order.index(2) <= 1
+
+
+@pytest.mark.asyncio
+async def test_scheduler_rejects_when_queue_full():
+    scheduler = _scheduler(max_queue_depth=1)
+    gate = asyncio.Event()
+
+    async def hold() -> None:
+        async with scheduler.slot(1, 1):
+            await gate.wait()
+
+    async def queued() -> None:
+        async with scheduler.slot(1, 1):
+            pass
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(queued())
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as exc:
+        async with scheduler.slot(2, 1):
+            pass
+
+    assert exc.value.status_code == 429
+    assert metrics.get("llm_queue_depth") == 1
+    gate.set()
+    await asyncio.gather(holder, waiting)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_queue():
+    scheduler = _scheduler()
+    gate = asyncio.Event()
+
+    async def hold() -> None:
+        async with scheduler.slot(1, 1):
+            await gate.wait()
+
+    async def queued() -> None:
+        async with scheduler.slot(2, 1):
+            pass
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(queued())
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+
+    assert scheduler.queue_depth == 0
+    gate.set()
+    await holder
+    assert scheduler.active == 0
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_delays_large_prompts():
+    scheduler = _scheduler(max_concurrency=4, tokens_per_minute=600)
+    loop = asyncio.get_running_loop()
+
+    async with scheduler.slot(1, 600):
+        pass
+    started = loop.time()
+    async with scheduler.slot(1, 5):
+        pass
+
+    # 600 tokens/minute refills at 10 tokens per second, so 5 tokens take ~0.5s.
+    assert loop.time() - started >= 0.4
+
+
+@pytest.mark.asyncio
+async def test_finish_tags_are_pruned_once_virtual_time_passes_them():
+    scheduler = _scheduler(max_concurrency=4)
+
+    for user_id in range(100):
+        async with scheduler.slot(user_id, 10):
+            pass
+
+    assert len(scheduler._last_finish) <= 1
+    assert len(scheduler._finish_heap) <= 1
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
-from app.services.llm_service import build_prompt, chunk_text
+from app.services.chunking import ChunkIndex, TextSpan, iter_chunk_spans
+from app.services.llm_service import build_prompt, chunk_text, rank_chunks
 
 
 def test_chunk_text_handles_short_text():
@@ -21,3 +22,32 @@ def test_build_prompt_contains_context_and_question():
     assert "context" in prompt
     assert "question?" in prompt
     assert "Document context" in prompt
+
+
+def test_rank_chunks_orders_by_question_overlap():
+    text = "nothing relevant here|payment terms and payment dates|the payment schedule"
+    index = ChunkIndex(text, [TextSpan(0, 21), TextSpan(22, 53), TextSpan(54, 74)])
+
+    assert rank_chunks(index, "What are the PAYMENT terms?") == [1, 2, 0]
+
+
+def test_chunk_spans_cut_at_sentence_boundaries():
+    text = "First sentence here. Second sentence follows. " * 20
+
+    spans = list(iter_chunk_spans(text, chunk_size=100, overlap=10, tolerance=40))
+
+    assert len(spans) > 1
+    assert all(text[span.end - 2 : span.end] == ". " for span in spans[:-1])
+    assert spans[-1].end == len(text)
+    assert all(later.start == earlier.end - 10 for earlier, later in zip(spans, spans[1:]))
+
+
+def test_chunk_spans_report_pages_and_index_is_compact():
+    text = "page one text\npage two text"
+
+    index = ChunkIndex.build(text, chunk_size=10, overlap=2, tolerance=5, page_starts=[0, 14])
+
+    assert [span.page for span in index][0] == 0
+    assert index[len(index) - 1].page == 1
+    assert index.chunk(0) == text[index[0].start : index[0].end]
+    assert not hasattr(index[0], "__dict__")
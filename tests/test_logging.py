@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import io
+import json
+
+import pytest
+from fastapi import FastAPI
+from loguru import logger
+
+from app.core.logging import RateSampler, RequestContextMiddleware, configure_logging, flush_logging
+from app.core.metrics import metrics
+from app.core.tracing import UNMATCHED_ROUTE, route_template
+
+
+def test_json_logs_are_written_from_queue_with_request_context():
+    stream = io.StringIO()
+    configure_logging("INFO", json_logs=True, sink=stream)
+    try:
+        with logger.contextualize(request_id="req-1", route="/pdf-chat"):
+            logger.info("Chat request started user_id={}", 7)
+        flush_logging()
+    finally:
+        configure_logging("INFO")
+
+    record = json.loads(stream.getvalue().splitlines()[0])
+    assert record["message"] == "Chat request started user_id=7"
+    assert record["level"] == "INFO"
+    assert record["request_id"] == "req-1"
+    assert record["route"] == "/pdf-chat"
+
+
+def test_rate_sampler_drops_info_but_keeps_warnings():
+    stream = io.StringIO()
+    configure_logging("DEBUG", sample_rate=1, sink=stream)
+    try:
+        with logger.contextualize(route="/sampled"):
+            for index in range(5):
+                logger.info("noisy line {}", index)
+            logger.warning("important line")
+    finally:
+        configure_logging("INFO")
+
+    output = stream.getvalue()
+    assert output.count("noisy line") == 1
+    assert "important line" in output
+    assert metrics.get("log_records_sampled_out_total", logger=__name__, route="/sampled") == 4
+
+
+def test_rate_sampler_disabled_with_zero_rate():
+    sampler = RateSampler(0)
+
+    class Level:
+        no = 20
+
+    assert all(sampler({"level": Level(), "name": "x", "extra": {}}) for _ in range(100))
+
+
+@pytest.mark.asyncio
+async def test_request_context_uses_route_template():
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int) -> dict[str, int]:
+        logger.info("reading item")
+        return {"item_id": item_id}
+
+    stream = io.StringIO()
+    configure_logging("INFO", json_logs=True, sink=stream)
+    try:
+        scope, receive, send = _request("/items/3")
+        await app({**scope, "headers": [(b"x-request-id", b"req-42")]}, receive, send)
+        flush_logging()
+    finally:
+        configure_logging("INFO")
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(record["route"], record["request_id"]) for record in records if record["message"] == "reading item"] == [
+        ("/items/{item_id}", "req-42")
+    ]
+    assert (b"x-request-id", b"req-42") in send.sent[0]["headers"]
+    scope, _, _ = _request("/wp-login.php")
+    assert route_template({**scope, "app": app}) == UNMATCHED_ROUTE
+
+
+def _request(path: str) -> tuple:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive() -> dict:
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        send.sent.append(message)
+
+    send.sent = []
+    return scope, receive, send
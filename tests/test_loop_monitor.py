@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI
+
+from app.core.loop_monitor import LoopMonitor, LoopMonitorMiddleware
+
+
+def _build_app(monitor: LoopMonitor) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(LoopMonitorMiddleware, monitor=monitor)
+
+    @app.get("/items/{item_id}")
+    async def blocking_handler(item_id: int) -> dict[str, int]:
+        time.sleep(0.3)
+        return {"item_id": item_id}
+
+    @app.get("/ok")
+    async def awaiting_handler() -> dict[str, bool]:
+        await asyncio.sleep(0.2)
+        return {"ok": True}
+
+    return app
+
+
+async def _get(app: FastAPI, path: str) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+    messages = []
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages[0]["status"]
+
+
+@pytest.mark.asyncio
+async def test_blocking_handler_is_reported_with_route_and_stack():
+    monitor = LoopMonitor(threshold=0.1, interval=0.02)
+    app = _build_app(monitor)
+
+    with pytest.raises(AssertionError) as exc:
+        async with monitor.guard():
+            assert await _get(app, "/items/7") == 200
+
+    block = monitor.violations[0]
+    assert block.route == "/items/{item_id}"
+    assert "blocking_handler" in block.stack
+    assert block.seconds >= 0.1
+    assert "/items/{item_id}" in str(exc.value)
+
+
+@pytest.mark.asyncio
+async def test_awaiting_handler_passes_guard():
+    monitor = LoopMonitor(threshold=0.1, interval=0.02)
+    app = _build_app(monitor)
+
+    async with monitor.guard():
+        assert await _get(app, "/ok") == 200
+
+    assert not monitor.violations
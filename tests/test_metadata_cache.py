@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.metadata_cache import MetadataCache
+from app.services.pdf_service import PDFService
+
+from mongo_fakes import FakeDatabase, FakeGridFSBucket
+from test_pdf_service import DummyUploadFile, _make_pdf_bytes
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _doc(pdf_id: str, user_id: int = 1, **fields) -> dict:
+    return {"_id": object(), "pdf_id": pdf_id, "user_id": user_id, "filename": f"{pdf_id}.pdf", **fields}
+
+
+def test_entries_expire_after_ttl_and_evict_least_recently_used():
+    clock = FakeClock()
+    cache = MetadataCache(max_entries=2, ttl=10, clock=clock)
+    cache.put(_doc("a"))
+    cache.put(_doc("b"))
+    assert cache.get("a", 1)["filename"] == "a.pdf"
+    assert "_id" not in cache.get("a", 1)
+
+    cache.put(_doc("c"))
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 2) is None
+
+    clock.now = 10
+    assert cache.get("a", 1) is None
+    assert len(cache) == 1
+
+
+def test_returned_documents_are_copies():
+    cache = MetadataCache(max_entries=4, ttl=10)
+    cache.put(_doc("a", is_parsed=False))
+    cache.get("a", 1)["is_parsed"] = True
+
+    assert cache.get("a", 1)["is_parsed"] is False
+
+
+@pytest.mark.asyncio
+async def test_service_serves_ownership_checks_from_cache_and_invalidates_on_parse(monkeypatch):
+    fake_db = FakeDatabase()
+    service = PDFService(fake_db, FakeGridFSBucket(fake_db.fs.files), metadata_cache=MetadataCache(16, ttl=60))
+    metadata = await service.upload_pdf(DummyUploadFile("a.pdf", "application/pdf", _make_pdf_bytes()), user_id=1)
+    lookups = []
+    original_find_one = fake_db.pdf_metadata.find_one
+
+    async def counting_find_one(query, projection=None):
+        lookups.append(query)
+        return await original_find_one(query, projection)
+
+    monkeypatch.setattr(fake_db.pdf_metadata, "find_one", counting_find_one)
+
+    # The upload primed the cache, and unknown owners are never cached.
+    assert (await service.ensure_pdf_owned_by_user(metadata.pdf_id, 1)).is_parsed is False
+    await service.parse_pdf(metadata.pdf_id, user_id=1)
+    assert lookups == []
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            await service.ensure_pdf_owned_by_user(metadata.pdf_id, 2)
+    assert len(lookups) == 2
+
+    # Parsing dropped the stale entry; the next check reloads it once.
+    assert (await service.ensure_pdf_owned_by_user(metadata.pdf_id, 1)).is_parsed is True
+    assert (await service.ensure_pdf_owned_by_user(metadata.pdf_id, 1)).is_parsed is True
+    assert len(lookups) == 3
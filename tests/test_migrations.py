@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app.db.migrations import MIGRATIONS, applied_versions, upgrade, v0001_initial
+from app.db.postgres import Base
+from app.models.chat import ChatMessage, ChatSession
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}", future=True)
+    yield engine
+    engine.dispose()
+
+
+def _schema(engine) -> dict[str, tuple[set[str], set[tuple[str, tuple[str, ...]]]]]:
+    inspector = inspect(engine)
+    return {
+        table: (
+            {column["name"] for column in inspector.get_columns(table)},
+            {(index["name"], tuple(index["column_names"])) for index in inspector.get_indexes(table)},
+        )
+        for table in inspector.get_table_names()
+        if table != "schema_migrations"
+    }
+
+
+def _plan(session: Session, query) -> str:
+    compiled = query.statement.compile(dialect=session.get_bind().dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def test_migrations_match_models(engine, tmp_path):
+    upgrade(engine)
+    reference = create_engine(f"sqlite:///{tmp_path / 'reference.db'}", future=True)
+    Base.metadata.create_all(reference)
+
+    assert _schema(engine) == _schema(reference)
+    reference.dispose()
+
+
+def test_upgrade_is_idempotent_and_adopts_legacy_databases(engine):
+    # A database created by the old create_all path, before migrations existed.
+    v0001_initial.metadata.create_all(engine)
+
+    assert upgrade(engine) == [module.VERSION for module in MIGRATIONS]
+    assert upgrade(engine) == []
+    with engine.connect() as connection:
+        assert applied_versions(connection) == {module.VERSION for module in MIGRATIONS}
+        columns = {column["name"] for column in inspect(connection).get_columns("chat_sessions")}
+    assert {"summary", "summarized_count"} <= columns
+
+
+def test_chat_queries_use_composite_indexes(engine):
+    upgrade(engine)
+    with Session(engine) as session:
+        session.execute(
+            text("INSERT INTO users (id, email, password_hash, is_active, created_at) VALUES (1, 'a@b.c', 'x', 1, :now)"),
+            {"now": datetime.now(timezone.utc)},
+        )
+        session.execute(text("ANALYZE"))
+
+        latest_session = (
+            session.query(ChatSession)
+            .filter(ChatSession.user_id == 1, ChatSession.pdf_id == "pdf-1")
+            .order_by(ChatSession.created_at.desc())
+            .limit(1)
+        )
+        session_messages = (
+            session.query(ChatMessage)
+            .filter(ChatMessage.session_id == 1)
+            .order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc())
+        )
+
+        session_plan = _plan(session, latest_session)
+        message_plan = _plan(session, session_messages)
+
+    assert "USING INDEX ix_chat_sessions_user_pdf_created (user_id=? AND pdf_id=?)" in session_plan
+    assert "TEMP B-TREE" not in session_plan
+    assert "USING INDEX ix_chat_messages_session_created_id (session_id=?)" in message_plan
+    assert "TEMP B-TREE" not in message_plan
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import time
+from io import BytesIO
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import pdf_extraction
+from app.services.pdf_extraction import ExtractionBackend, extract_pages, spooled_source
+
+from mongo_fakes import FakeDownloadStream
+
+GOOD_PAGE = "This page has plenty of readable contract text. " * 5
+
+
+class FakeBackend(ExtractionBackend):
+    def __init__(self, name: str, pages=None, delay: float = 0.0, error: Exception | None = None, installed=True):
+        self.name = name
+        self.pages = pages or [GOOD_PAGE]
+        self.delay = delay
+        self.error = error
+        self.installed = installed
+        self.calls = 0
+
+    def available(self) -> bool:
+        return self.installed
+
+    def extract_pages(self, source):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.pages
+
+
+@pytest.fixture()
+def backends(monkeypatch):
+    registry: dict[str, FakeBackend] = {}
+    monkeypatch.setattr(pdf_extraction, "BACKENDS", registry)
+    return registry
+
+
+@pytest.mark.asyncio
+async def test_falls_back_past_missing_failing_and_slow_backends(backends):
+    backends["missing"] = FakeBackend("missing", installed=False)
+    backends["broken"] = FakeBackend("broken", error=ValueError("bad xref"))
+    backends["slow"] = FakeBackend("slow", delay=0.5)
+    backends["good"] = FakeBackend("good")
+
+    result = await extract_pages(lambda: BytesIO(b"%PDF"), ["missing", "broken", "slow", "good"], timeout=0.05)
+
+    assert result.backend == "good"
+    assert result.pages == [GOOD_PAGE]
+    assert backends["missing"].calls == 0
+
+
+@pytest.mark.asyncio
+async def test_low_quality_output_tries_next_and_keeps_best(backends):
+    backends["garbled"] = FakeBackend("garbled", pages=["���" * 50])
+    backends["sparse"] = FakeBackend("sparse", pages=["Only a few words here"])
+
+    result = await extract_pages(lambda: BytesIO(b"%PDF"), ["garbled", "sparse"], timeout=1, min_quality=0.9)
+
+    assert result.backend == "sparse"
+    assert backends["garbled"].calls == backends["sparse"].calls == 1
+
+
+@pytest.mark.asyncio
+async def test_raises_when_every_backend_fails(backends):
+    backends["broken"] = FakeBackend("broken", error=RuntimeError("boom"))
+
+    with pytest.raises(HTTPException) as exc:
+        await extract_pages(lambda: BytesIO(b"%PDF"), ["broken"], timeout=1)
+
+    assert exc.value.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_spooled_source_maps_download_for_independent_readers(tmp_path):
+    data = bytes(range(256)) * 40
+    download = FakeDownloadStream(data, chunk_size=1000)
+
+    async with spooled_source(download, str(tmp_path)) as open_source:
+        first, second = open_source(), open_source()
+        assert first.read(10) == data[:10]
+        second.seek(-5, 2)
+        assert second.read() == data[-5:]
+        assert first.read(5) == data[10:15]
+        first.close()
+        second.close()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_spooled_source_rejects_empty_download(tmp_path):
+    with pytest.raises(HTTPException) as exc:
+        async with spooled_source(FakeDownloadStream(b""), str(tmp_path)):
+            pass
+
+    assert exc.value.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_spooled_source_closes_mapping_after_extraction_and_abandoned_readers(tmp_path, backends):
+    backends["good"] = FakeBackend("good")
+    download = FakeDownloadStream(b"%PDF-1.4 " * 100, chunk_size=100)
+
+    async with spooled_source(download, str(tmp_path)) as open_source:
+        await extract_pages(open_source, ["good"], timeout=1)
+    with pytest.raises(ValueError):
+        open_source()
+
+    async with spooled_source(FakeDownloadStream(b"%PDF-1.4 " * 100), str(tmp_path)) as open_source:
+        abandoned = open_source()
+    assert abandoned.read(4) == b"%PDF"
+    abandoned.close()
+    with pytest.raises(ValueError):
+        open_source()
@@ -1,89 +1,20 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import asyncio
+import zipfile
 from datetime import datetime, timezone
 from io import BytesIO
-from typing import Any
 
 import pytest
 from bson import ObjectId
 from fastapi import HTTPException
 from PyPDF2 import PdfWriter
 
+from app.core.concurrency import ByteBudget
 from app.services.pdf_service import PDFService
+from app.services.text_cache import SharedTextCache
 
-
-@dataclass
-class FakeDownloadStream:
-    data: bytes
-
-    async def read(self) -> bytes:
-        return self.data
-
-
-class FakeGridFSBucket:
-    def __init__(self) -> None:
-        self._storage: dict[ObjectId, bytes] = {}
-
-    async def upload_from_stream(self, filename: str, stream: BytesIO, metadata: dict[str, Any]) -> ObjectId:
-        data = stream.read()
-        file_id = ObjectId()
-        self._storage[file_id] = data
-        return file_id
-
-    async def open_download_stream(self, file_id: ObjectId) -> FakeDownloadStream:
-        if file_id not in self._storage:
-            raise KeyError("Unknown file id")
-        return FakeDownloadStream(self._storage[file_id])
-
-
-class FakeAsyncCursor:
-    def __init__(self, documents: list[dict[str, Any]]) -> None:
-        self._documents = documents
-
-    def __aiter__(self):
-        self._iterator = iter(self._documents)
-        return self
-
-    async def __anext__(self):
-        try:
-            return next(self._iterator)
-        except StopIteration as exc:  # pragma: no cover - standard async iteration ending
-            raise StopAsyncIteration from exc
-
-
-class FakeCollection:
-    def __init__(self) -> None:
-        self.docs: list[dict[str, Any]] = []
-
-    async def insert_one(self, doc: dict[str, Any]) -> None:
-        self.docs.append(doc.copy())
-
-    def find(self, query: dict[str, Any]) -> FakeAsyncCursor:
-        matched = [doc.copy() for doc in self.docs if all(doc.get(k) == v for k, v in query.items())]
-        return FakeAsyncCursor(matched)
-
-    async def find_one(self, query: dict[str, Any]) -> dict[str, Any] | None:
-        for doc in self.docs:
-            if all(doc.get(k) == v for k, v in query.items()):
-                return doc.copy()
-        return None
-
-    async def update_one(self, query: dict[str, Any], update: dict[str, Any], upsert: bool = False) -> None:
-        for doc in self.docs:
-            if all(doc.get(k) == v for k, v in query.items()):
-                doc.update(update.get("$set", {}))
-                return
-        if upsert:
-            new_doc = query.copy()
-            new_doc.update(update.get("$set", {}))
-            self.docs.append(new_doc)
-
-
-class FakeDatabase:
-    def __init__(self) -> None:
-        self.pdf_metadata = FakeCollection()
-        self.pdf_texts = FakeCollection()
+from mongo_fakes import FakeDatabase, FakeGridFSBucket
 
 
 class DummyUploadFile:
@@ -91,15 +22,17 @@ class DummyUploadFile:
         self.filename = filename
         self.content_type = content_type
         self._data = data
+        self.file = BytesIO(data)
+        self.size = len(data)
 
-    async def read(self) -> bytes:
-        return self._data
+    async def read(self, size: int = -1) -> bytes:
+        return self._data if size < 0 else self._data[:size]
 
 
 @pytest.fixture()
 def pdf_service_setup():
     fake_db = FakeDatabase()
-    fake_grid = FakeGridFSBucket()
+    fake_grid = FakeGridFSBucket(fake_db.fs.files)
     service = PDFService(fake_db, fake_grid)
     return service, fake_db, fake_grid
 
@@ -137,7 +70,7 @@ async def test_upload_and_parse_pdf(pdf_service_setup):
     assert metadata.is_parsed is False
     assert metadata.upload_date <= datetime.now(timezone.utc)
 
-    text = await service.parse_pdf(metadata.pdf_id, user_id=1)
+    text = (await service.parse_pdf(metadata.pdf_id, user_id=1)).text
 
     assert isinstance(text, str)
     stored_metadata = await fake_db.pdf_metadata.find_one({"pdf_id": metadata.pdf_id, "user_id": 1})
@@ -147,3 +80,216 @@ async def test_upload_and_parse_pdf(pdf_service_setup):
     stored_text = await fake_db.pdf_texts.find_one({"pdf_id": metadata.pdf_id, "user_id": 1})
     assert stored_text is not None
     assert stored_text.get("text") == text
+
+
+@pytest.mark.asyncio
+async def test_list_pdf_page_returns_projected_dicts(pdf_service_setup):
+    service, fake_db, _ = pdf_service_setup
+    pdf_bytes = _make_pdf_bytes()
+    await service.upload_pdf(DummyUploadFile("a.pdf", "application/pdf", pdf_bytes), user_id=1)
+    await service.upload_pdf(DummyUploadFile("b.pdf", "application/pdf", pdf_bytes), user_id=2)
+    fake_db.pdf_metadata.docs[0]["_id"] = ObjectId()
+
+    documents, next_cursor = await service.list_pdf_page(user_id=1, limit=10)
+
+    assert len(documents) == 1
+    assert next_cursor is None
+    assert set(documents[0]) == {"pdf_id", "filename", "upload_date", "is_parsed"}
+    assert documents[0]["filename"] == "a.pdf"
+
+
+@pytest.mark.asyncio
+async def test_list_pdf_page_walks_cursor_newest_first(pdf_service_setup):
+    service, fake_db, _ = pdf_service_setup
+    pdf_bytes = _make_pdf_bytes()
+    for name in ("a.pdf", "b.pdf", "c.pdf"):
+        await service.upload_pdf(DummyUploadFile(name, "application/pdf", pdf_bytes), user_id=1)
+    # Two uploads in the same instant must still be ordered and paged without gaps.
+    same_instant = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for doc in fake_db.pdf_metadata.docs:
+        doc["upload_date"] = same_instant if doc["filename"] != "c.pdf" else datetime(2024, 2, 1, tzinfo=timezone.utc)
+
+    first, cursor = await service.list_pdf_page(user_id=1, limit=2)
+    assert first[0]["filename"] == "c.pdf"
+    assert cursor is not None
+    second, final_cursor = await service.list_pdf_page(user_id=1, limit=2, cursor=cursor)
+
+    assert final_cursor is None
+    assert sorted(doc["filename"] for doc in first + second) == ["a.pdf", "b.pdf", "c.pdf"]
+
+
+@pytest.mark.asyncio
+async def test_list_pdf_page_rejects_malformed_cursor(pdf_service_setup):
+    service, _, _ = pdf_service_setup
+
+    with pytest.raises(HTTPException) as exc:
+        await service.list_pdf_page(user_id=1, limit=10, cursor="not-a-cursor")
+
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_list_state_version_bumps_on_upload_and_parse(pdf_service_setup):
+    service, _, _ = pdf_service_setup
+    initial = await service.get_list_state(user_id=1)
+    assert initial["version"] == 0
+
+    metadata = await service.upload_pdf(
+        DummyUploadFile("a.pdf", "application/pdf", _make_pdf_bytes()), user_id=1
+    )
+    await service.parse_pdf(metadata.pdf_id, user_id=1)
+
+    state = await service.get_list_state(user_id=1)
+    assert state["version"] == 2
+    assert state["updated_at"] >= initial["updated_at"]
+
+
+@pytest.mark.asyncio
+async def test_open_pdf_file_streams_requested_range_by_chunk(pdf_service_setup):
+    service, _, fake_grid = pdf_service_setup
+    pdf_bytes = _make_pdf_bytes()
+    metadata = await service.upload_pdf(DummyUploadFile("a.pdf", "application/pdf", pdf_bytes), user_id=1)
+
+    _, grid_out = await service.open_pdf_file(metadata.pdf_id, user_id=1)
+    grid_out.chunk_size = 64
+    parts = [part async for part in service.iter_file_range(grid_out, 100, 299)]
+
+    assert b"".join(parts) == pdf_bytes[100:300]
+    assert max(len(part) for part in parts) <= 64
+    with pytest.raises(HTTPException) as exc:
+        await service.open_pdf_file(metadata.pdf_id, user_id=2)
+    assert exc.value.status_code == 404
+
+
+def _make_zip(entries: dict[str, bytes]) -> bytes:
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_bulk_upload_stores_files_and_zip_entries(pdf_service_setup):
+    service, fake_db, fake_grid = pdf_service_setup
+    pdf_bytes = _make_pdf_bytes()
+    archive = _make_zip(
+        {
+            "reports/q1.pdf": pdf_bytes,
+            "reports/readme.txt": b"not a pdf",
+            "reports/fake.pdf": b"plain text",
+            "__MACOSX/reports/._q1.pdf": b"resource fork",
+        }
+    )
+    files = [
+        DummyUploadFile("a.pdf", "application/pdf", pdf_bytes),
+        DummyUploadFile("notes.txt", "text/plain", b"hello"),
+        DummyUploadFile("batch.zip", "application/zip", archive),
+    ]
+
+    results = await service.bulk_upload(files, user_id=1)
+
+    outcome = {result["filename"]: result["status"] for result in results}
+    assert outcome == {
+        "a.pdf": "stored",
+        "notes.txt": "rejected",
+        "q1.pdf": "stored",
+        "readme.txt": "rejected",
+        "fake.pdf": "rejected",
+    }
+    assert {doc["filename"] for doc in fake_db.pdf_metadata.docs} == {"a.pdf", "q1.pdf"}
+    stored_ids = {result["pdf_id"] for result in results if result["status"] == "stored"}
+    assert stored_ids == {doc["pdf_id"] for doc in fake_db.pdf_metadata.docs}
+    assert all(fake_grid._storage[ObjectId(pdf_id)] == pdf_bytes for pdf_id in stored_ids)
+    assert (await service.get_list_state(user_id=1))["version"] == 1
+
+
+@pytest.mark.asyncio
+async def test_bulk_upload_rejects_too_many_files(pdf_service_setup, monkeypatch):
+    service, fake_db, _ = pdf_service_setup
+    monkeypatch.setattr("app.services.pdf_service.settings.bulk_upload_max_files", 1)
+    files = [DummyUploadFile(f"{index}.pdf", "application/pdf", _make_pdf_bytes()) for index in range(2)]
+
+    with pytest.raises(HTTPException) as exc:
+        await service.bulk_upload(files, user_id=1)
+
+    assert exc.value.status_code == 400
+    assert fake_db.pdf_metadata.docs == []
+
+
+@pytest.mark.asyncio
+async def test_upload_releases_budget_on_error(pdf_service_setup, monkeypatch):
+    service, fake_db, fake_grid = pdf_service_setup
+    budget = ByteBudget("test-upload", capacity=1024 * 1024, wait_timeout=0.1)
+    monkeypatch.setattr("app.services.pdf_service.upload_budget", budget)
+
+    async def failing_upload(*args, **kwargs):
+        raise RuntimeError("gridfs down")
+
+    monkeypatch.setattr(fake_grid, "upload_from_stream", failing_upload)
+    with pytest.raises(RuntimeError):
+        await service.upload_pdf(DummyUploadFile("a.pdf", "application/pdf", _make_pdf_bytes()), user_id=1)
+
+    assert budget.in_use == 0
+    assert fake_db.pdf_metadata.docs == []
+
+
+@pytest.mark.asyncio
+async def test_warm_documents_serves_first_chat_from_cache(tmp_path):
+    fake_db = FakeDatabase()
+    service = PDFService(fake_db, FakeGridFSBucket(fake_db.fs.files), SharedTextCache(str(tmp_path), 10**6))
+    await fake_db.pdf_texts.insert_one({"pdf_id": "p1", "user_id": 1, "text": "warm text " * 50, "page_offsets": [0]})
+
+    await service.warm_documents(["p1", "unparsed"], user_id=1)
+    fake_db.pdf_texts.docs.clear()
+
+    index = await service.get_chunk_index("p1", user_id=1)
+    assert str(index.chunk(0)).startswith("warm text")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_chunk_index_requests_share_one_load(tmp_path, monkeypatch):
+    fake_db = FakeDatabase()
+    service = PDFService(fake_db, FakeGridFSBucket(fake_db.fs.files), SharedTextCache(str(tmp_path), 10**6))
+    await fake_db.pdf_texts.insert_one({"pdf_id": "p1", "user_id": 1, "text": "shared text " * 50, "page_offsets": [0]})
+    original = service.get_parsed_document
+    calls = []
+
+    async def counting_get_parsed_document(pdf_id: str, user_id: int):
+        calls.append(pdf_id)
+        await asyncio.sleep(0.01)
+        return await original(pdf_id, user_id)
+
+    monkeypatch.setattr(service, "get_parsed_document", counting_get_parsed_document)
+    first, second = await asyncio.gather(service.get_chunk_index("p1", 1), service.get_chunk_index("p1", 1))
+
+    assert calls == ["p1"]
+    assert len(first) == len(second)
+
+
+@pytest.mark.asyncio
+async def test_load_racing_a_reparse_does_not_cache_old_text(tmp_path, monkeypatch):
+    fake_db = FakeDatabase()
+    cache = SharedTextCache(str(tmp_path), 10**6)
+    service = PDFService(fake_db, FakeGridFSBucket(fake_db.fs.files), cache)
+    await fake_db.pdf_texts.insert_one({"pdf_id": "p1", "user_id": 1, "text": "OLD text " * 50, "page_offsets": [0]})
+    original = service.get_parsed_document
+    fetched, resume = asyncio.Event(), asyncio.Event()
+
+    async def paused_get_parsed_document(pdf_id: str, user_id: int):
+        document = await original(pdf_id, user_id)
+        fetched.set()
+        await resume.wait()
+        return document
+
+    monkeypatch.setattr(service, "get_parsed_document", paused_get_parsed_document)
+    load = asyncio.ensure_future(service.get_chunk_index("p1", 1))
+    await fetched.wait()
+    await fake_db.pdf_texts.update_one({"pdf_id": "p1", "user_id": 1}, {"$set": {"text": "NEW text " * 50}})
+    cache.invalidate("p1", 1)
+    resume.set()
+    await load
+
+    assert cache.get("p1", 1) is None
+    monkeypatch.setattr(service, "get_parsed_document", original)
+    assert (await service.get_chunk_index("p1", 1)).chunk(0).startswith("NEW text")
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+import pytest
+
+from app.models.chat import ChatMessage, ChatSession
+from app.models.user import User
+from app.services.retention import RetentionService
+
+from mongo_fakes import FakeDatabase, FakeGridFSBucket
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture()
+def retention_setup(db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr("app.services.retention.settings.retention_chat_days", 30)
+    monkeypatch.setattr("app.services.retention.settings.retention_text_idle_days", 90)
+    monkeypatch.setattr("app.services.retention.settings.retention_orphan_grace_minutes", 60)
+    mongo_db = FakeDatabase()
+    grid_fs = FakeGridFSBucket(mongo_db.fs.files)
+    service = RetentionService(
+        db_session, mongo_db, grid_fs, text_cache=None, archive_dir=str(tmp_path), batch_size=2
+    )
+    return service, db_session, mongo_db, grid_fs, tmp_path
+
+
+def _add_session(db_session, user: User, created_at: datetime, contents: list[tuple[str, datetime]]) -> ChatSession:
+    session = ChatSession(user_id=user.id, pdf_id="pdf-1", created_at=created_at, summarized_count=2)
+    db_session.add(session)
+    db_session.commit()
+    for content, timestamp in contents:
+        db_session.add(
+            ChatMessage(session_id=session.id, user_id=user.id, role="user", content=content, created_at=timestamp)
+        )
+    db_session.commit()
+    return session
+
+
+@pytest.mark.asyncio
+async def test_purges_and_archives_old_chat_history(retention_setup):
+    service, db_session, _, _, archive_dir = retention_setup
+    user = User(email="retention@example.com", password_hash="hashed")
+    db_session.add(user)
+    db_session.commit()
+    old = NOW - timedelta(days=60)
+    stale = _add_session(db_session, user, old, [("a", old), ("bb", old)])
+    mixed = _add_session(db_session, user, old, [("ccc", old), ("recent", NOW - timedelta(days=1))])
+    stale_id, mixed_id = stale.id, mixed.id
+
+    report = await service.run(now=NOW)
+
+    assert report.chat_messages_deleted == report.chat_messages_archived == 3
+    assert report.chat_bytes == 6
+    assert report.chat_sessions_deleted == 1
+    db_session.expire_all()
+    assert db_session.get(ChatSession, stale_id) is None
+    assert db_session.get(ChatSession, mixed_id).summarized_count == 1
+    assert [message.content for message in db_session.query(ChatMessage)] == ["recent"]
+    (archive,) = archive_dir.glob("chat-messages-*.ndjson.gz")
+    with gzip.open(archive) as handle:
+        assert [json.loads(line)["content"] for line in handle] == ["a", "bb", "ccc"]
+
+
+@pytest.mark.asyncio
+async def test_dry_run_reports_without_deleting(retention_setup):
+    service, db_session, _, _, archive_dir = retention_setup
+    user = User(email="dry@example.com", password_hash="hashed")
+    db_session.add(user)
+    db_session.commit()
+    old = NOW - timedelta(days=60)
+    _add_session(db_session, user, old, [("a", old)])
+
+    report = await service.run(dry_run=True, now=NOW)
+
+    assert report.chat_messages_deleted == 1
+    assert report.chat_sessions_deleted == 0
+    assert db_session.query(ChatMessage).count() == 1
+    assert list(archive_dir.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_collects_orphaned_texts_idle_texts_and_gridfs_files(retention_setup):
+    service, db_session, mongo_db, grid_fs, _ = retention_setup
+    selected = User(email="selected@example.com", password_hash="hashed", selected_pdf_id="kept-selected")
+    db_session.add(selected)
+    db_session.commit()
+    long_ago = NOW - timedelta(days=200)
+    for pdf_id in ("idle", "kept-selected", "fresh"):
+        mongo_db.pdf_metadata.docs.append(
+            {"pdf_id": pdf_id, "user_id": 1, "upload_date": long_ago, "is_parsed": True}
+        )
+        mongo_db.pdf_texts.docs.append({"pdf_id": pdf_id, "user_id": 1, "text": "x" * 10})
+    mongo_db.pdf_metadata.docs[-1]["last_selected_at"] = NOW - timedelta(days=1)
+    mongo_db.pdf_texts.docs.append({"pdf_id": "deleted-pdf", "user_id": 1, "text": "y" * 5})
+
+    orphan_id = await grid_fs.upload_from_stream("orphan.pdf", BytesIO(b"1234"), metadata={})
+    in_flight_id = await grid_fs.upload_from_stream("in-flight.pdf", BytesIO(b"12"), metadata={})
+    owned_id = await grid_fs.upload_from_stream("owned.pdf", BytesIO(b"123"), metadata={})
+    for doc in mongo_db.fs.files.docs:
+        if doc["_id"] != in_flight_id:
+            doc["uploadDate"] = long_ago
+    mongo_db.pdf_metadata.docs.append({"pdf_id": str(owned_id), "user_id": 1, "upload_date": NOW})
+
+    report = await service.run(now=NOW)
+
+    assert report.texts_deleted == 2
+    assert report.text_bytes == 15
+    assert sorted(doc["pdf_id"] for doc in mongo_db.pdf_texts.docs) == ["fresh", "kept-selected"]
+    idle = await mongo_db.pdf_metadata.find_one({"pdf_id": "idle"})
+    assert idle["is_parsed"] is False
+    assert (await mongo_db.pdf_list_state.find_one({"user_id": 1}))["version"] == 2
+    assert report.gridfs_files_deleted == 1
+    assert report.gridfs_bytes == 4
+    assert {doc["_id"] for doc in mongo_db.fs.files.docs} == {in_flight_id, owned_id}
+    assert orphan_id not in {doc["_id"] for doc in mongo_db.fs.files.docs}
+    assert report.reclaimed_bytes == report.chat_bytes + 15 + 4
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from app.services.chunking import ChunkIndex
+from app.services.text_cache import SharedTextCache
+
+
+def _index(text: str) -> ChunkIndex:
+    return ChunkIndex.build(text, chunk_size=40, overlap=5, tolerance=10, page_starts=[0, len(text) // 2])
+
+
+def test_cached_index_round_trips_through_mmap(tmp_path):
+    text = "Çalışma şartları ve ödeme koşulları. " * 10 + "Second page with more words here."
+    original = _index(text)
+    cache = SharedTextCache(str(tmp_path), max_bytes=10**6)
+
+    cache.put("pdf-1", 1, original)
+    cached = cache.get("pdf-1", 1)
+
+    assert cached is not None
+    assert not isinstance(cached.text, str)
+    assert len(cached) == len(original)
+    assert [cached.chunk(i) for i in range(len(cached))] == [original.chunk(i) for i in range(len(original))]
+    assert [span.page for span in cached] == [span.page for span in original]
+    assert original.total_chars == cached.total_chars == len(text)
+    assert cache.get("pdf-1", 2) is None
+
+
+def test_workers_share_entries_and_see_invalidation(tmp_path):
+    worker_a = SharedTextCache(str(tmp_path), max_bytes=10**6)
+    worker_b = SharedTextCache(str(tmp_path), max_bytes=10**6)
+
+    worker_a.put("pdf-1", 1, _index("old text " * 20))
+    assert worker_b.get("pdf-1", 1).chunk(0).startswith("old text")
+
+    worker_a.invalidate("pdf-1", 1)
+    assert worker_b.get("pdf-1", 1) is None
+
+    worker_a.put("pdf-1", 1, _index("new text " * 20))
+    assert worker_b.get("pdf-1", 1).chunk(0).startswith("new text")
+
+
+def test_eviction_keeps_directory_under_budget(tmp_path):
+    cache = SharedTextCache(str(tmp_path), max_bytes=2500)
+
+    for number in range(5):
+        cache.put(f"pdf-{number}", 1, _index(f"document {number} " * 80))
+        # Distinct mtimes make the LRU order deterministic on coarse filesystems.
+        path = cache._path(f"pdf-{number}", 1)
+        if os.path.exists(path):
+            os.utime(path, ns=(number * 10**9, number * 10**9))
+
+    total = sum(entry.stat().st_size for entry in os.scandir(tmp_path))
+    assert total <= 2500
+    assert cache.get("pdf-4", 1) is not None
+    assert cache.get("pdf-0", 1) is None
+
+
+def test_refuses_shared_directories_and_foreign_entries(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(PermissionError):
+        SharedTextCache(str(shared), max_bytes=10**6)
+
+    elsewhere = SharedTextCache(str(tmp_path / "elsewhere"), max_bytes=10**6)
+    elsewhere.put("pdf-1", 1, _index("planted text " * 20))
+    cache = SharedTextCache(str(tmp_path / "cache"), max_bytes=10**6)
+    os.symlink(elsewhere._path("pdf-1", 1), cache._path("pdf-1", 1))
+
+    assert cache.get("pdf-1", 1) is None
+    assert oct(os.stat(tmp_path / "cache").st_mode & 0o777) == "0o700"
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from app.services.text_normalization import normalize_pages
+
+
+def _page(number: int, body: str) -> str:
+    return (
+        "ACME Corp   Confidential  Annual Report 2023\n"
+        f"{body}\n"
+        "This document is proprietary and may not be distributed without consent.\n"
+        f"Page {number} of 4"
+    )
+
+
+def test_strips_repeated_headers_footers_and_page_numbers():
+    pages = [_page(number, f"Section {number} discusses revenue in region {number}.") for number in range(1, 5)]
+
+    result = normalize_pages(pages)
+
+    assert result.pages == [f"Section {number} discusses revenue in region {number}." for number in range(1, 5)]
+    assert result.stats.removed_lines == 12
+    assert result.stats.bytes_saved > 0
+    assert result.stats.tokens_saved > 0
+
+
+def test_dehyphenates_and_collapses_whitespace():
+    result = normalize_pages(["The  agree-\nment   was\tsigned.\n\n\n\nNext para-\nGraph"])
+
+    assert result.pages == ["The agreement was signed.\n\nNext para-\nGraph"]
+
+
+def test_keeps_lines_repeated_on_too_few_pages():
+    pages = ["Summary\nfirst", "Summary\nsecond", "other\nthird", "other\nfourth", "other\nfifth"]
+
+    result = normalize_pages(pages, min_pages=3, page_ratio=0.5)
+
+    assert result.pages[0] == "Summary\nfirst"
+    assert result.pages[2] == "third"
+
+
+def test_keeps_bare_numbers_and_repeated_text_in_the_body():
+    pages = [
+        f"ACME Corp Annual Report\nRevenue for {region}:\n17\n2024\n{region} shipped the most units\n{number}"
+        for number, region in enumerate(["north", "south", "east", "west"], start=1)
+    ]
+
+    result = normalize_pages(pages)
+
+    assert result.pages == [
+        f"Revenue for {region}:\n17\n2024\n{region} shipped the most units"
+        for region in ["north", "south", "east", "west"]
+    ]
+    short_pages = [f"Header\n2024\n{number}" for number in range(1, 4)]
+    assert normalize_pages(short_pages).pages == ["2024", "2024", "2024"]
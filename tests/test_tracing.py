@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import List
+
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+
+from app.core.tracing import FileSpanExporter, Span, SpanExporter, TracingMiddleware, current_span, span, tracer
+from app.db.postgres import trace_queries
+from app.services.pdf_service import PDFService
+
+from mongo_fakes import FakeDatabase, FakeGridFSBucket
+from test_pdf_service import DummyUploadFile, _make_pdf_bytes
+
+
+class MemoryExporter(SpanExporter):
+    def __init__(self) -> None:
+        self.spans: List[Span] = []
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def by_name(self, name: str) -> Span:
+        return next(item for item in self.spans if item.name == name)
+
+
+@pytest.fixture()
+def exporter(monkeypatch) -> MemoryExporter:
+    memory = MemoryExporter()
+    monkeypatch.setattr(tracer, "exporter", memory)
+    monkeypatch.setattr(tracer, "sample_rate", 1.0)
+    return memory
+
+
+@pytest.mark.asyncio
+async def test_spans_nest_across_gather_and_threads(exporter):
+    def blocking_work() -> None:
+        with span("thread.work"):
+            current_span().set_attribute("rows", 3)
+
+    async def child(index: int) -> None:
+        with span("child", index=index):
+            await asyncio.to_thread(blocking_work)
+
+    with span("root") as root:
+        await asyncio.gather(child(0), child(1))
+
+    children = [item for item in exporter.spans if item.name == "child"]
+    assert {item.parent_id for item in children} == {root.span_id}
+    work = [item for item in exporter.spans if item.name == "thread.work"]
+    assert {item.parent_id for item in work} == {item.span_id for item in children}
+    assert all(item.trace_id == root.trace_id for item in exporter.spans)
+    assert work[0].attributes == {"rows": 3}
+
+
+@pytest.mark.asyncio
+async def test_failed_span_records_error_and_unsampled_traces_are_dropped(exporter, monkeypatch):
+    with pytest.raises(ValueError):
+        with span("failing"):
+            raise ValueError("boom")
+    assert exporter.by_name("failing").status == "error"
+    assert exporter.by_name("failing").error == "ValueError: boom"
+
+    monkeypatch.setattr(tracer, "sample_rate", 0.0)
+    with span("unsampled"):
+        with span("unsampled.child"):
+            current_span().set_attribute("ignored", True)
+    assert [item.name for item in exporter.spans] == ["failing"]
+
+
+@pytest.mark.asyncio
+async def test_middleware_names_root_span_after_route_and_continues_traceparent(exporter):
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int) -> dict[str, int]:
+        with span("handler.work"):
+            return {"item_id": item_id}
+
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    await app(*_request("/items/3", [(b"traceparent", f"00-{trace_id}-00f067aa0ba902b7-01".encode())]))
+
+    root = exporter.by_name("HTTP GET /items/{item_id}")
+    assert root.trace_id == trace_id
+    assert root.parent_id == "00f067aa0ba902b7"
+    assert root.attributes["http.status_code"] == 200
+    assert exporter.by_name("handler.work").parent_id == root.span_id
+
+
+@pytest.mark.asyncio
+async def test_parse_pdf_emits_nested_spans_with_attributes(exporter):
+    fake_db = FakeDatabase()
+    service = PDFService(fake_db, FakeGridFSBucket(fake_db.fs.files))
+    metadata = await service.upload_pdf(DummyUploadFile("a.pdf", "application/pdf", _make_pdf_bytes()), user_id=1)
+
+    await service.parse_pdf(metadata.pdf_id, user_id=1)
+
+    parse = exporter.by_name("pdf.parse")
+    assert parse.attributes["pages"] == 1
+    assert exporter.by_name("gridfs.download").parent_id == parse.span_id
+    assert exporter.by_name("gridfs.download").attributes["bytes"] > 0
+    assert exporter.by_name("pdf.extract").attributes["backend"] == "pypdf2"
+    assert exporter.by_name("gridfs.upload").parent_id == exporter.by_name("pdf.upload").span_id
+
+
+def test_sql_statements_become_child_spans(exporter):
+    engine = create_engine("sqlite://")
+    trace_queries(engine)
+
+    with span("request") as root, engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    query = exporter.by_name("postgres.query")
+    assert query.parent_id == root.span_id
+    assert query.attributes["statement"] == "SELECT 1"
+
+
+def test_file_exporter_writes_json_lines(tmp_path):
+    path = tmp_path / "traces" / "spans.jsonl"
+    file_exporter = FileSpanExporter(str(path))
+    file_exporter.export(Span(name="one", trace_id="a" * 32, span_id="b" * 16, attributes={"bytes": 10}))
+    file_exporter.shutdown()
+
+    record = json.loads(path.read_text().strip())
+    assert record["name"] == "one"
+    assert record["attributes"] == {"bytes": 10}
+
+
+def _request(path: str, headers: list) -> tuple:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": headers,
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        pass
+
+    return scope, receive, send